@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for the per-request LLM setup in query_rag().
+
+Compares building a new ChatBedrock client and re-parsing the prompt template on
+every request (the old behaviour) against the pooled get_chat_model() registry
+plus the precompiled PROMPT. No Bedrock calls are made.
+
+    cd image && python benchmarks/bench_chat_model.py --iterations 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_aws import ChatBedrock
+
+from lib.constants import BEDROCK_MODEL_ID
+from rag_app.get_chat_model import get_chat_model
+from rag_app.query_rag import PROMPT, PROMPT_TEMPLATE
+
+from loguru import logger as LOGGER
+
+CONTEXT = "Landing Page for Small Businesses ($4,820)\n\n---\n\n" * 3
+QUESTION = "how much does a landing page cost?"
+
+
+def per_request_setup():
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE).format(context=CONTEXT, question=QUESTION)
+    model = ChatBedrock(model_id=BEDROCK_MODEL_ID)
+    return model, prompt
+
+
+def pooled_setup():
+    prompt = PROMPT.format(context=CONTEXT, question=QUESTION)
+    model = get_chat_model(BEDROCK_MODEL_ID)
+    return model, prompt
+
+
+def time_per_call(fn, iterations):
+    fn()  # Warm up (imports, first client creation).
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    before = time_per_call(per_request_setup, args.iterations)
+    after = time_per_call(pooled_setup, args.iterations)
+    LOGGER.info(f"per-request ChatBedrock + template: {before * 1000:.3f} ms/request")
+    LOGGER.info(f"pooled get_chat_model + PROMPT:     {after * 1000:.3f} ms/request")
+    LOGGER.info(f"overhead removed: {(before - after) * 1000:.3f} ms/request ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cold-start benchmark for opening the persisted ChromaDB.
+
+Each run happens in a fresh interpreter (like a new Lambda container) and times
+either the old path (copytree to a temp dir, then open) or the read-only path
+(open the image copy in place as an immutable SQLite DB), up to the first query.
+
+    cd image && python benchmarks/bench_chroma_cold_start.py --chroma-path src/data/chroma --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from loguru import logger as LOGGER
+
+
+def run_child(mode: str, chroma_path: str):
+    from langchain_community.vectorstores import Chroma
+    from rag_app import get_chroma_db
+
+    start = time.perf_counter()
+    if mode == "copy":
+        tmp_dir = tempfile.mkdtemp()
+        runtime_path = os.path.join(tmp_dir, "chroma")
+        shutil.copytree(chroma_path, runtime_path)
+        db = Chroma(persist_directory=runtime_path, embedding_function=get_chroma_db.get_embedding_function())
+    else:
+        db = get_chroma_db.open_chroma_read_only(chroma_path)
+    opened = time.perf_counter()
+
+    # First query, by vector so no embedding call is made.
+    dimension = len(db.get(limit=1, include=["embeddings"])["embeddings"][0])
+    db.similarity_search_by_vector_with_relevance_scores([0.01] * dimension, k=3)
+    first_query = time.perf_counter()
+
+    if mode == "copy":
+        shutil.rmtree(tmp_dir)
+    print(json.dumps({"open_s": opened - start, "first_query_s": first_query - start}))
+
+
+def measure(mode: str, chroma_path: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--chroma-path", chroma_path],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "open_s": statistics.median(s["open_s"] for s in samples),
+        "first_query_s": statistics.median(s["first_query_s"] for s in samples),
+    }
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chroma-path", default="src/data/chroma")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=["copy", "readonly"])
+    args = parser.parse_args()
+
+    if args.child:
+        LOGGER.remove()
+        run_child(args.child, args.chroma_path)
+        return
+
+    LOGGER.info(f"Index size: {directory_size(args.chroma_path) / 1e6:.1f} MB at {args.chroma_path}")
+    for mode in ("copy", "readonly"):
+        result = measure(mode, args.chroma_path, args.runs)
+        LOGGER.info(
+            f"{mode:>8}: open {result['open_s'] * 1000:.1f} ms - "
+            f"first query {result['first_query_s'] * 1000:.1f} ms (median of {args.runs})"
+        )
+
+
+if __name__ == "__main__":
+    main()
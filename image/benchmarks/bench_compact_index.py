@@ -0,0 +1,95 @@
+"""
+Size and recall report for the compact index formats against the Chroma store.
+
+Exports int8 and float16 compact indexes from the persisted collection into a
+temp dir, then compares on-disk size, load time and recall@k. Ground truth is
+exact float32 search over the stored embeddings. Queries are stored embeddings
+with Gaussian noise added, so each has real near neighbours.
+
+    cd image && python benchmarks/bench_compact_index.py --chroma-path src/data/chroma --queries 200 --k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from loguru import logger as LOGGER
+
+from rag_app.compact_index import COMPACT_DTYPES, CompactVectorStore, export_compact_index
+from rag_app.get_embedding_function import get_embedding_function
+from rag_app.vector_store import ChromaVectorStore
+
+
+def chroma_size(path: str) -> int:
+    # Only what Chroma itself needs: the SQLite file and the HNSW segment directories.
+    size = os.path.getsize(os.path.join(path, "chroma.sqlite3"))
+    for entry in os.scandir(path):
+        if entry.is_dir() and len(entry.name) == 36:  # Segment directories are named by UUID.
+            size += sum(os.path.getsize(os.path.join(entry.path, f)) for f in os.listdir(entry.path))
+    return size
+
+
+def exact_top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    distances = (
+        np.einsum("ij,ij->i", matrix, matrix)[np.newaxis, :]
+        - 2 * queries @ matrix.T
+        + np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+    )
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def recall_at_k(store, ids, queries: np.ndarray, truth: np.ndarray, k: int) -> float:
+    results = store.search_batch(queries.tolist(), k)
+    hits = 0
+    for result, expected in zip(results, truth):
+        hits += len({doc.metadata.get("id") for doc, _ in result} & {ids[i] for i in expected})
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chroma-path", default="src/data/chroma")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.3, help="Query noise, relative to the vector norm.")
+    args = parser.parse_args()
+
+    db = Chroma(persist_directory=args.chroma_path, embedding_function=get_embedding_function())
+    items = db.get(include=["embeddings", "documents", "metadatas"])
+    ids = items["ids"]
+    matrix = np.asarray(items["embeddings"], dtype=np.float32)
+    k = min(args.k, len(ids))
+
+    rng = np.random.default_rng(0)
+    base = matrix[rng.integers(0, len(ids), args.queries)]
+    noise = rng.normal(size=base.shape).astype(np.float32)
+    noise *= args.noise * np.linalg.norm(base, axis=1, keepdims=True) / np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = base + noise
+    truth = exact_top_k(matrix, queries, k)
+
+    LOGGER.info(f"{len(ids)} chunks, dimension {matrix.shape[1]}, {args.queries} queries, recall@{k}")
+    LOGGER.info(
+        f"{'chroma':>8}: {chroma_size(args.chroma_path) / 1e6:8.2f} MB - "
+        f"recall {recall_at_k(ChromaVectorStore(db), ids, queries, truth, k):.3f}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for dtype in COMPACT_DTYPES:
+            path = os.path.join(tmp_dir, f"compact-{dtype}.idx")
+            export_compact_index(path, ids, matrix, items["documents"], items["metadatas"], dtype=dtype)
+            start = time.perf_counter()
+            store = CompactVectorStore(path)
+            load_ms = (time.perf_counter() - start) * 1000
+            LOGGER.info(
+                f"{dtype:>8}: {os.path.getsize(path) / 1e6:8.2f} MB - "
+                f"recall {recall_at_k(store, ids, queries, truth, k):.3f} - load {load_ms:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Import-time report for the two Lambda entry points, from `python -X importtime`.
+
+Each profile imports its handler in a fresh interpreter and reports the total
+import time and the packages (self time summed over their modules) that cost most:
+
+    api-worker  app_api_handler with WORKER_LAMBDA_NAME set (RAG stack not imported)
+    api-sync    app_api_handler, then rag_app.query_rag as the first synchronous query does
+    worker      app_work_handler without preloading (imports only)
+
+    cd image && python benchmarks/bench_import_time.py --runs 3
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+PROFILES = {
+    "api-worker": ("import app_api_handler", {"WORKER_LAMBDA_NAME": "worker"}),
+    "api-sync": ("import app_api_handler, rag_app.query_rag", {}),
+    "worker": ("import app_work_handler", {"WORKER_PRELOAD": "false"}),
+}
+
+# "import time: self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)")
+
+
+def import_times(statement: str, env: dict) -> dict:
+    """Self-time microseconds per top-level package for one fresh interpreter."""
+    child_env = {**os.environ, "AWS_DEFAULT_REGION": "us-east-1", **env}
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SRC_DIR,
+        env=child_env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            package = match.group(2).split(".")[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    for name, (statement, env) in PROFILES.items():
+        runs = [import_times(statement, env) for _ in range(args.runs)]
+        total_ms = statistics.median(sum(run.values()) for run in runs) / 1000
+        print(f"{name:<12} {total_ms:>8.0f} ms  ({statement})")
+        slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[: args.top]
+        for package, micros in slowest:
+            print(f"    {package:<28} {micros / 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark of the per-operation client-side cost of QueryModel persistence, before
+and after the pooled DynamoDB client and the precomputed serializer. No requests
+are sent; this measures what each put_item/get_item spends before the network.
+
+    cd image && python benchmarks/bench_query_model.py --seconds 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("TABLE_NAME", "bench-table")
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from lib.common import get_dynamodb_client
+from query_model import TABLE_NAME, QueryModel
+
+from loguru import logger as LOGGER
+
+SERIALIZER = TypeSerializer()
+DESERIALIZER = TypeDeserializer()
+QUERY = QueryModel(
+    query_text="how much does a landing page cost?",
+    answer_text="Based on the context provided, the cost for a landing page is $4,820. " * 4,
+    sources=[f"src/data/source/galaxy-design-client-guide.pdf:{i}:0" for i in range(3)],
+    is_complete=True,
+)
+LOW_LEVEL_ITEM = QUERY.to_ddb_attributes()
+
+
+def before_table():
+    # What QueryModel.get_table() cost per call: a new session, resource and Table.
+    return boto3.session.Session().resource("dynamodb").Table(TABLE_NAME)
+
+
+def before_serialize():
+    # Resource put_item: pydantic dict() then boto3's TypeSerializer per attribute.
+    item = {k: v for k, v in QUERY.model_dump().items() if v is not None}
+    return {k: SERIALIZER.serialize(v) for k, v in item.items()}
+
+
+def before_deserialize():
+    item = {k: DESERIALIZER.deserialize(v) for k, v in LOW_LEVEL_ITEM.items()}
+    return QueryModel(**item)
+
+
+def ops_per_second(fn, seconds: float) -> float:
+    fn()
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    cases = [
+        ("table/client acquisition", before_table, get_dynamodb_client),
+        ("serialize", before_serialize, QUERY.to_ddb_attributes),
+        ("deserialize", before_deserialize, lambda: QueryModel.from_ddb_attributes(LOW_LEVEL_ITEM)),
+    ]
+    for name, before, after in cases:
+        before_ops = ops_per_second(before, args.seconds)
+        after_ops = ops_per_second(after, args.seconds)
+        LOGGER.info(
+            f"{name:>25}: before {before_ops:>12,.0f} ops/sec - after {after_ops:>12,.0f} ops/sec "
+            f"({after_ops / before_ops:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compares the vector backends: load time, query latency (p50/p99) for single
+queries and for a batch, and peak RSS. Each backend runs in a fresh interpreter
+so load time and RSS are not shared between them. Random query vectors are
+used, so no embedding calls are made.
+
+    cd image && python populate_database.py --numpy-store
+    cd image && python benchmarks/bench_vector_store.py --chroma-path src/data/chroma --queries 500
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import numpy as np
+from loguru import logger as LOGGER
+
+BACKENDS = ("chroma", "numpy")
+
+
+def run_child(backend: str, chroma_path: str, queries: int, k: int, batch_size: int):
+    from rag_app import vector_store
+
+    start = time.perf_counter()
+    if backend == "numpy":
+        store = vector_store.NumpyVectorStore(os.path.join(chroma_path, vector_store.NUMPY_STORE_DIR))
+    else:
+        from langchain_community.vectorstores import Chroma
+        from rag_app.get_embedding_function import get_embedding_function
+
+        store = vector_store.ChromaVectorStore(
+            Chroma(persist_directory=chroma_path, embedding_function=get_embedding_function())
+        )
+        # Chroma loads its HNSW segment lazily; include that in the load time.
+        store.db._collection.count()
+    loaded = time.perf_counter()
+
+    dimension = len(next(iter(store.get_embeddings([first_chunk_id(store)]).values())))
+    vectors = np.random.default_rng(0).normal(size=(queries, dimension)).astype(np.float32).tolist()
+
+    latencies = []
+    for vector in vectors:
+        query_start = time.perf_counter()
+        store.search(vector, k)
+        latencies.append(time.perf_counter() - query_start)
+
+    batch_start = time.perf_counter()
+    for i in range(0, queries, batch_size):
+        store.search_batch(vectors[i:i + batch_size], k)
+    batch_seconds = time.perf_counter() - batch_start
+
+    print(json.dumps({
+        "load_ms": (loaded - start) * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "batch_qps": queries / batch_seconds,
+        # ru_maxrss is in KB on Linux.
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def first_chunk_id(store) -> str:
+    if hasattr(store, "ids"):
+        return store.ids[0]
+    return store.db.get(limit=1, include=[])["ids"][0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chroma-path", default="src/data/chroma")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--child", choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.child:
+        LOGGER.remove()
+        run_child(args.child, args.chroma_path, args.queries, args.k, args.batch_size)
+        return
+
+    for backend in BACKENDS:
+        output = subprocess.run(
+            [
+                sys.executable, __file__, "--child", backend, "--chroma-path", args.chroma_path,
+                "--queries", str(args.queries), "--k", str(args.k), "--batch-size", str(args.batch_size),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        LOGGER.info(
+            f"{backend:>6}: load {result['load_ms']:.1f} ms - p50 {result['p50_ms']:.2f} ms - "
+            f"p99 {result['p99_ms']:.2f} ms - batch {result['batch_qps']:.0f} q/s - "
+            f"max RSS {result['max_rss_mb']:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
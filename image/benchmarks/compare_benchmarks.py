@@ -0,0 +1,69 @@
+"""
+Compares two run_benchmarks.py result files and flags regressions.
+
+Metrics ending in _ms or _s are better when lower; metrics ending in _per_s or
+_rps are better when higher; anything else (counts, settings) is informational.
+Exits with status 1 if any metric regressed by more than --threshold.
+
+    python image/benchmarks/compare_benchmarks.py base.json new.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+
+def direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if the metric is not scored."""
+    if metric.endswith(("_per_s", "_rps")):
+        return 1
+    if metric.endswith(("_ms", "_s")):
+        return -1
+    return 0
+
+
+def compare(base: dict, new: dict, threshold: float):
+    rows, regressions = [], []
+    for suite, base_metrics in base["results"].items():
+        new_metrics = new["results"].get(suite, {})
+        for metric, base_value in base_metrics.items():
+            if metric not in new_metrics or not isinstance(base_value, (int, float)):
+                continue
+            new_value = new_metrics[metric]
+            change = (new_value - base_value) / base_value if base_value else 0.0
+            sign = direction(metric)
+            regressed = sign != 0 and -sign * change > threshold
+            rows.append((f"{suite}.{metric}", base_value, new_value, change, regressed))
+            if regressed:
+                regressions.append(f"{suite}.{metric}")
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change counted as a regression.")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    if base["meta"].get("latencies") != new["meta"].get("latencies"):
+        print("warning: runs used different injected latencies", file=sys.stderr)
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{base['meta'].get('commit') or args.base} -> {new['meta'].get('commit') or args.new}")
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, base_value, new_value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {base_value:>12.3f}  {new_value:>12.3f}  {change:>+8.1%}{flag}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Benchmark suite for the ingestion and query paths, run against the local
+stand-ins (RAG_PROVIDER=local), so no AWS account is needed and results are
+comparable across machines and commits.
+
+Suites:
+    ingest  populate_database stages: PDF load+split, embed, Chroma write,
+            search index build, and the end-to-end add_to_chroma().
+    chroma  get_chroma_db() cold start (fresh interpreters, copy vs read-only)
+            and in-process init, warm re-use and first query.
+    query   query_rag() per-stage latency from QueryResponse.timings.
+    api     app_api_handler endpoints under concurrent load (in-process ASGI).
+
+Results are written as JSON; compare two runs with compare_benchmarks.py.
+Injected latencies default to small values and can be overridden with the
+usual LOCAL_* environment variables; they are recorded in the output.
+
+    python image/benchmarks/run_benchmarks.py --output base.json
+    python image/benchmarks/run_benchmarks.py --suites query api --output new.json
+    python image/benchmarks/compare_benchmarks.py base.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(IMAGE_DIR, "src"))
+sys.path.insert(0, IMAGE_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+WORK_DIR = tempfile.mkdtemp(prefix="rag-bench-")
+CHROMA_DIR = os.path.join(WORK_DIR, "chroma")
+
+# Must be set before any rag_app import reads them.
+os.environ.update(
+    RAG_PROVIDER="local",
+    CHROMA_PATH=CHROMA_DIR,
+    EMBEDDING_CACHE_PATH="",
+    ANSWER_CACHE_SIZE="0",
+    TABLE_NAME="bench-queries",
+)
+os.environ.pop("WORKER_LAMBDA_NAME", None)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+BENCH_LATENCIES = {
+    "LOCAL_EMBEDDING_LATENCY_MS": "5",
+    "LOCAL_CHAT_FIRST_TOKEN_MS": "50",
+    "LOCAL_CHAT_INPUT_TOKEN_MS": "0.05",
+    "LOCAL_CHAT_TOKEN_DELAY_MS": "2",
+    "LOCAL_DYNAMODB_LATENCY_MS": "2",
+}
+for name, value in BENCH_LATENCIES.items():
+    os.environ.setdefault(name, value)
+
+import numpy as np
+from loguru import logger as LOGGER
+
+SUITES = ("ingest", "chroma", "query", "api")
+SAMPLE_QUESTIONS = [
+    "How much does a landing page for a small business cost?",
+    "How long does an e-commerce system take to build?",
+    "How much money does each player start with in Monopoly?",
+    "What happens when you land on Free Parking?",
+    "How many train cars does each player get in Ticket to Ride?",
+    "How are destination tickets scored at the end of the game?",
+]
+
+
+def percentiles(samples, prefix: str, unit_scale: float = 1000.0) -> dict:
+    values = np.asarray(samples, dtype=np.float64) * unit_scale
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(values, 50)),
+        f"{prefix}_p95_ms": float(np.percentile(values, 95)),
+        f"{prefix}_p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def questions(count: int):
+    # Distinct texts, so the embedding cache never serves a repeat.
+    return [f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (#{i})" for i in range(count)]
+
+
+def bench_ingest(source_dir: str) -> dict:
+    import populate_database
+    from langchain_community.vectorstores import Chroma
+    from src.rag_app.embedding_pipeline import (
+        EMBED_BATCH_SIZE,
+        EMBED_MAX_WORKERS,
+        WRITE_BATCH_SIZE,
+        batched,
+        embed_with_retry,
+    )
+    from src.rag_app.index_manifest import IndexManifest, file_sha256
+    from src.rag_app.local_providers import HashingEmbeddings
+    from src.rag_app.pdf_pipeline import iter_pdf_chunks
+
+    populate_database.DATA_SOURCE_PATH = source_dir
+    paths = populate_database.list_source_files()
+    results = {"files": len(paths)}
+
+    start = time.perf_counter()
+    chunks = list(iter_pdf_chunks(paths))
+    results["load_split_s"] = time.perf_counter() - start
+    results["chunks"] = len(chunks)
+
+    embeddings = HashingEmbeddings()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as executor:
+        batches = list(batched(chunks, EMBED_BATCH_SIZE))
+        vectors = [
+            vector
+            for batch_vectors in executor.map(
+                lambda batch: embed_with_retry(embeddings, [chunk.page_content for chunk in batch]), batches
+            )
+            for vector in batch_vectors
+        ]
+    results["embed_s"] = time.perf_counter() - start
+
+    scratch_dir = os.path.join(WORK_DIR, "scratch-chroma")
+    db = Chroma(persist_directory=scratch_dir, embedding_function=embeddings)
+    start = time.perf_counter()
+    for offset in range(0, len(chunks), WRITE_BATCH_SIZE):
+        batch = chunks[offset:offset + WRITE_BATCH_SIZE]
+        db._collection.upsert(
+            ids=[chunk.metadata["id"] for chunk in batch],
+            embeddings=vectors[offset:offset + WRITE_BATCH_SIZE],
+            metadatas=[chunk.metadata for chunk in batch],
+            documents=[chunk.page_content for chunk in batch],
+        )
+    results["write_s"] = time.perf_counter() - start
+
+    populate_database.CHROMA_PATH = scratch_dir
+    start = time.perf_counter()
+    populate_database.write_search_indexes(db, numpy_store=True)
+    results["index_build_s"] = time.perf_counter() - start
+
+    # End to end into the directory the other suites query.
+    populate_database.CHROMA_PATH = CHROMA_DIR
+    start = time.perf_counter()
+    populate_database.add_to_chroma(chunks, IndexManifest(), {path: file_sha256(path) for path in paths})
+    results["populate_total_s"] = time.perf_counter() - start
+    results["populate_chunks_per_s"] = len(chunks) / results["populate_total_s"]
+    return results
+
+
+def bench_chroma(runs: int) -> dict:
+    import bench_chroma_cold_start
+    from rag_app import get_chroma_db
+    from rag_app.get_embedding_function import get_embedding_function
+
+    results = {}
+    for mode in ("copy", "readonly"):
+        measured = bench_chroma_cold_start.measure(mode, CHROMA_DIR, runs)
+        results[f"cold_{mode}_open_ms"] = measured["open_s"] * 1000
+        results[f"cold_{mode}_first_query_ms"] = measured["first_query_s"] * 1000
+
+    start = time.perf_counter()
+    db = get_chroma_db.get_chroma_db()
+    results["init_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    get_chroma_db.get_chroma_db()
+    results["warm_init_ms"] = (time.perf_counter() - start) * 1000
+    query_embedding = get_embedding_function().embed_query(SAMPLE_QUESTIONS[0])
+    start = time.perf_counter()
+    db.similarity_search_by_vector_with_relevance_scores(query_embedding, k=3)
+    results["first_query_ms"] = (time.perf_counter() - start) * 1000
+    return results
+
+
+def bench_query(count: int) -> dict:
+    from rag_app.query_rag import query_rag
+
+    query_rag(SAMPLE_QUESTIONS[0])  # Warm-up: opens the store and indexes.
+    timings = [query_rag(text).timings for text in questions(count)]
+    results = {"queries": count}
+    for stage in timings[0]:
+        results.update(percentiles([t.get(stage, 0.0) for t in timings], stage, unit_scale=1.0))
+    return results
+
+
+def bench_api(count: int, concurrency: int) -> dict:
+    import httpx
+    import app_api_handler
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_api_handler.app)
+        async with app_api_handler.lifespan(app_api_handler.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await client.post("/submit_query", json={"query_text": SAMPLE_QUESTIONS[0]})  # Warm-up.
+                submit = await load(client, concurrency, [
+                    ("POST", "/submit_query", {"json": {"query_text": text}}) for text in questions(count)
+                ])
+                query_ids = [response.json()["query_id"] for response in submit["responses"]]
+                get = await load(client, concurrency, [
+                    ("GET", "/get_query", {"params": {"query_id": query_id}}) for query_id in query_ids
+                ])
+        return submit, get
+
+    submit, get = asyncio.run(run())
+    results = {"requests": count, "concurrency": concurrency}
+    for name, measured in (("submit_query", submit), ("get_query", get)):
+        results.update(percentiles(measured["latencies"], name))
+        results[f"{name}_rps"] = count / measured["seconds"]
+        results[f"{name}_errors"] = sum(response.status_code >= 400 for response in measured["responses"])
+    return results
+
+
+async def load(client, concurrency: int, requests: list) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def send(method, url, kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(send(*request) for request in requests))
+    return {"responses": responses, "latencies": latencies, "seconds": time.perf_counter() - start}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=IMAGE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--source-dir", default=os.path.join(IMAGE_DIR, "src", "data", "source"))
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="JSON results file (printed to stdout if omitted).")
+    args = parser.parse_args()
+
+    # Per-request application logs would dominate the output (and the timings).
+    LOGGER.remove()
+    LOGGER.add(sys.stderr, filter=lambda record: record["name"] == "__main__" or record["level"].no >= 30)
+
+    # Everything queries the index that the ingest suite builds.
+    suites = ["ingest"] + [suite for suite in args.suites if suite != "ingest"]
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "latencies": {name: float(os.environ[name]) for name in BENCH_LATENCIES},
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    try:
+        for suite in suites:
+            LOGGER.info(f"Running benchmark suite: {suite}")
+            if suite == "ingest":
+                result = bench_ingest(args.source_dir)
+            elif suite == "chroma":
+                result = bench_chroma(args.cold_runs)
+            elif suite == "query":
+                result = bench_query(args.queries)
+            else:
+                result = bench_api(args.requests, args.concurrency)
+            report["results"][suite] = result
+            LOGGER.info(f"{suite}: {json.dumps(result)}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        LOGGER.info(f"Wrote benchmark results to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
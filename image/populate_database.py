@@ -2,12 +2,38 @@ import argparse
 import os
 import sys
 import shutil
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator
 from langchain.schema.document import Document
 from langchain_community.vectorstores import Chroma
 
+from src.rag_app.bm25_index import BM25_INDEX_FILE, build_bm25_index
+from src.rag_app.compact_index import COMPACT_DTYPES, COMPACT_INDEX_FILE, export_compact_index, read_compact_dtype
+from src.rag_app.embedding_pipeline import (
+    EMBED_BATCH_SIZE,
+    EMBED_MAX_WORKERS,
+    WRITE_BATCH_SIZE,
+    embed_and_write,
+)
 from src.rag_app.get_embedding_function import get_embedding_function
+from src.rag_app.index_manifest import FileEntry, IndexManifest, file_sha256, text_sha256
+from src.rag_app.index_version import bump_index_version
+from src.rag_app.pdf_pipeline import (
+    PDF_MAX_WORKERS,
+    PDF_PAGES_PER_TASK,
+    calculate_chunk_ids,
+    iter_pdf_chunks,
+)
+from src.rag_app.shards import (
+    SHARD_BY_CHOICES,
+    read_shard_map,
+    shard_collection_name,
+    shard_dir,
+    shard_name,
+    write_shard_map,
+)
+from src.rag_app.vector_store import NUMPY_STORE_DIR, VECTOR_BACKEND, export_numpy_store
 
 from loguru import logger as LOGGER
 
@@ -19,89 +45,291 @@ def main():
     # Check if the database should be cleared (using the --clear flag).
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="Reset the database.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding task.")
+    parser.add_argument("--workers", type=int, default=EMBED_MAX_WORKERS, help="Concurrent embedding tasks.")
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE, help="Chunks per Chroma write.")
+    parser.add_argument("--pdf-workers", type=int, default=PDF_MAX_WORKERS, help="Processes parsing PDFs.")
+    parser.add_argument("--pages-per-task", type=int, default=PDF_PAGES_PER_TASK, help="PDF pages per parse task.")
+    parser.add_argument("--compact-index", choices=COMPACT_DTYPES, help="Also export a quantized compact index.")
+    parser.add_argument(
+        "--numpy-store",
+        action="store_true",
+        default=VECTOR_BACKEND == "numpy",
+        help="Also export the NumPy vector store (default when VECTOR_BACKEND=numpy).",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_BY_CHOICES,
+        help="Index each source file, or each top-level source directory, as its own shard.",
+    )
+    parser.add_argument(
+        "--rebuild-shard",
+        action="append",
+        default=[],
+        metavar="SHARD",
+        help="Drop and re-index only this shard (repeatable); the other shards are left as they are.",
+    )
     args = parser.parse_args()
     if args.reset:
         LOGGER.info("Clearing Database")
         clear_database()
 
-    # Create (or update) the data store.
-    documents = load_documents()
-    chunks = split_documents(documents)
-    add_to_chroma(chunks)
+    # Once sharded, the index stays sharded the same way until it is reset.
+    shard_map = read_shard_map(CHROMA_PATH)
+    shard_by = shard_map["shard_by"] if shard_map else args.shard_by
+    if args.shard_by and args.shard_by != shard_by:
+        parser.error(f"The index is sharded by {shard_by}; use --reset to change it")
+    if args.shard_by and not shard_map and IndexManifest.load(CHROMA_PATH).files:
+        parser.error("The index is not sharded; use --reset to shard it")
+    if args.rebuild_shard and not shard_by:
+        parser.error("--rebuild-shard needs a sharded index (--shard-by)")
 
+    if shard_by:
+        update_shards(args, shard_by, shard_map)
+    else:
+        update_index(args, list_source_files())
 
-def load_documents():
-    document_loader = PyPDFDirectoryLoader(DATA_SOURCE_PATH)
-    return document_loader.load()
 
+def update_index(args, source_paths: list[str], shard: str = None):
+    """Brings the index, or one shard of it, up to date with source_paths."""
+    # Only re-parse the source files whose content changed since the last run.
+    manifest = IndexManifest.load(shard_dir(CHROMA_PATH, shard) if shard else CHROMA_PATH)
+    source_hashes = {path: file_sha256(path) for path in source_paths}
+    changed_files = {
+        path: sha256
+        for path, sha256 in source_hashes.items()
+        if path not in manifest.files or manifest.files[path].sha256 != sha256
+    }
+    removed_files = [path for path in manifest.files if path not in source_hashes]
+    LOGGER.info(
+        f"{f'Shard {shard} - s' if shard else 'S'}ource files: {len(source_hashes)} - "
+        f"changed: {len(changed_files)} - removed: {len(removed_files)}"
+    )
 
-def split_documents(documents: list[Document]):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=600,
-        chunk_overlap=120,
-        length_function=len,
-        is_separator_regex=False,
+    # Create (or update) the data store. Chunks stream from the PDF parsers into the embedder.
+    chunks = iter_pdf_chunks(
+        list(changed_files), max_workers=args.pdf_workers, pages_per_task=args.pages_per_task
+    )
+    add_to_chroma(
+        chunks,
+        manifest,
+        changed_files,
+        removed_files=removed_files,
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+        write_batch_size=args.write_batch_size,
+        compact_dtype=args.compact_index,
+        numpy_store=args.numpy_store,
+        shard=shard,
     )
-    return text_splitter.split_documents(documents)
 
 
-def add_to_chroma(chunks: list[Document]):
+def update_shards(args, shard_by: str, shard_map: dict = None):
+    """
+    Indexes every shard into its own Chroma collection, with its own manifest
+    and search indexes under shards/<name>/, so that one shard can be updated,
+    rebuilt or dropped without touching the others. The shard map (shards.json)
+    is what tells the query side the index is sharded.
+    """
+    shards: dict[str, list[str]] = {}
+    for path in list_source_files():
+        shards.setdefault(shard_name(path, shard_by, DATA_SOURCE_PATH), []).append(path)
+    indexed_shards = dict(shard_map["shards"]) if shard_map else {}
+
+    if args.rebuild_shard:
+        for shard in args.rebuild_shard:
+            drop_shard(shard)
+            indexed_shards.pop(shard, None)
+            if shard in shards:
+                update_index(args, shards[shard], shard)
+                indexed_shards[shard] = shards[shard]
+            else:
+                LOGGER.warning(f"Shard {shard} has no source files; dropped it")
+    else:
+        for shard in sorted(indexed_shards.keys() - shards.keys()):
+            LOGGER.info(f"Shard {shard} has no source files left")
+            drop_shard(shard)
+        for shard, paths in sorted(shards.items()):
+            update_index(args, paths, shard)
+        indexed_shards = shards
+
+    # The default collection stays empty, but the image opens it read-only at start-up,
+    # and read-only it could not be created then.
+    Chroma(persist_directory=CHROMA_PATH, embedding_function=get_embedding_function())
+    write_shard_map(CHROMA_PATH, shard_by, indexed_shards)
+    LOGGER.info(f"Index sharded by {shard_by}: {len(indexed_shards)} shards")
+
+
+def drop_shard(shard: str):
+    Chroma(
+        persist_directory=CHROMA_PATH,
+        collection_name=shard_collection_name(shard),
+        embedding_function=get_embedding_function(),
+    ).delete_collection()
+    shutil.rmtree(shard_dir(CHROMA_PATH, shard), ignore_errors=True)
+    bump_index_version(CHROMA_PATH)
+    LOGGER.info(f"Dropped shard {shard}")
+
+
+def list_source_files() -> list[str]:
+    # Same file selection as PyPDFDirectoryLoader, so chunk "source" metadata is unchanged.
+    return sorted(str(path) for path in Path(DATA_SOURCE_PATH).glob("**/[!.]*.pdf"))
+
+
+def add_to_chroma(
+    chunks: Iterable[Document],
+    manifest: IndexManifest,
+    file_hashes: dict[str, str],
+    removed_files: list[str] = (),
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_MAX_WORKERS,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    compact_dtype: str = None,
+    numpy_store: bool = False,
+    shard: str = None,
+):
+    """
+    chunks may be a list or a stream, but each file's chunks must be contiguous.
+    Chunks without metadata["id"] get positional IDs from calculate_chunk_ids().
+    compact_dtype ("int8" or "float16") also exports the compact index; once
+    exported, it is kept up to date with the dtype it was written with.
+    numpy_store also exports the NumPy vector store, which is likewise kept up
+    to date once it exists; only VECTOR_BACKEND=numpy reads it.
+    With shard, the chunks go to that shard's collection and index directory.
+    """
     # Load the existing database.
+    embedding_function = get_embedding_function()
+    collection_kwargs = {"collection_name": shard_collection_name(shard)} if shard else {}
     db = Chroma(
-        persist_directory=CHROMA_PATH, embedding_function=get_embedding_function()
+        persist_directory=CHROMA_PATH, embedding_function=embedding_function, **collection_kwargs
     )
+    index_dir = shard_dir(CHROMA_PATH, shard) if shard else CHROMA_PATH
 
-    # Calculate Page IDs.
-    chunks_with_ids = calculate_chunk_ids(chunks)
-    for chunk in chunks:
-        LOGGER.info(f"Chunk Page Sample: {chunk.metadata['id']}\n{chunk.page_content}\n\n")
-
-    # Add or Update the documents.
-    existing_items = db.get(include=[])  # IDs are always included by default
-    existing_ids = set(existing_items["ids"])
-    LOGGER.info(f"Number of existing documents in DB: {len(existing_ids)}")
-
-    # Only add documents that don't exist in the DB.
-    new_chunks = []
-    for chunk in chunks_with_ids:
-        if chunk.metadata["id"] not in existing_ids:
-            new_chunks.append(chunk)
-
-    if len(new_chunks):
-        LOGGER.info(f"Adding new documents: {len(new_chunks)}")
-        new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-        db.add_documents(new_chunks, ids=new_chunk_ids)
-    else:
+    orphan_ids = []
+    new_chunks = iter_changed_chunks(db, manifest, chunks, file_hashes, orphan_ids)
+    stats = embed_and_write(
+        db,
+        new_chunks,
+        embedding_function,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        write_batch_size=write_batch_size,
+    )
+    if not stats.chunks:
         LOGGER.info("No new documents to add")
 
+    for source in removed_files:
+        orphan_ids.extend(get_known_chunk_hashes(db, manifest, source))
+        manifest.files.pop(source, None)
+
+    if orphan_ids:
+        LOGGER.info(f"Deleting orphaned documents: {len(orphan_ids)}")
+        for start in range(0, len(orphan_ids), write_batch_size):
+            db.delete(ids=orphan_ids[start:start + write_batch_size])
+
+    manifest.save(index_dir)
+    index_changed = bool(stats.chunks or orphan_ids)
+    compact_path = os.path.join(index_dir, COMPACT_INDEX_FILE)
+    existing_compact_dtype = read_compact_dtype(compact_path)
+    compact_dtype = compact_dtype or existing_compact_dtype
+    numpy_store = numpy_store or os.path.exists(os.path.join(index_dir, NUMPY_STORE_DIR))
+    index_files = [os.path.join(index_dir, BM25_INDEX_FILE)]
+    if numpy_store:
+        index_files.append(os.path.join(index_dir, NUMPY_STORE_DIR))
+    if (
+        index_changed
+        or not all(os.path.exists(path) for path in index_files)
+        or compact_dtype != existing_compact_dtype
+    ):
+        write_search_indexes(db, compact_dtype, index_dir, numpy_store=numpy_store)
+    if index_changed:
+        # Invalidates cached answers in any running query process.
+        bump_index_version(CHROMA_PATH)
+
+
+def write_search_indexes(
+    db: Chroma, compact_dtype: str = None, index_dir: str = None, numpy_store: bool = False
+):
+    # Kept inside the Chroma directory so they ship with it into the image.
+    index_dir = index_dir or CHROMA_PATH
+    items = db.get(include=["embeddings", "documents", "metadatas"])
+    build_bm25_index(os.path.join(index_dir, BM25_INDEX_FILE), items["ids"], items["documents"])
+    LOGGER.info(f"Wrote BM25 index: {len(items['ids'])} chunks")
+    if numpy_store:
+        export_numpy_store(
+            os.path.join(index_dir, NUMPY_STORE_DIR),
+            items["ids"],
+            items["embeddings"],
+            items["documents"],
+            items["metadatas"],
+        )
+        LOGGER.info(f"Wrote NumPy vector store: {len(items['ids'])} chunks")
+    if compact_dtype:
+        compact_path = os.path.join(index_dir, COMPACT_INDEX_FILE)
+        export_compact_index(
+            compact_path,
+            items["ids"],
+            items["embeddings"],
+            items["documents"],
+            items["metadatas"],
+            dtype=compact_dtype,
+        )
+        LOGGER.info(f"Wrote {compact_dtype} compact index: {os.path.getsize(compact_path) / 1e6:.2f} MB")
 
-def calculate_chunk_ids(chunks):
 
-    # This will create IDs like "data/monopoly.pdf:6:2"
-    # Page Source : Page Number : Chunk Index
+def iter_changed_chunks(
+    db: Chroma,
+    manifest: IndexManifest,
+    chunks: Iterable[Document],
+    file_hashes: dict[str, str],
+    orphan_ids: list[str],
+) -> Iterator[Document]:
+    """
+    Yields only chunks whose text changed, one source file at a time, while
+    updating the manifest and collecting IDs the new parse no longer produces.
+    """
+    seen_files = set()
+    grouped = groupby(chunks, key=lambda chunk: chunk.metadata["source"])
+    for source, file_chunks in grouped:
+        file_chunks = list(file_chunks)
+        if "id" not in file_chunks[0].metadata:
+            calculate_chunk_ids(file_chunks)
+        seen_files.add(source)
 
-    last_page_id = None
-    current_chunk_index = 0
+        LOGGER.info(f"Parsed {source}: {len(file_chunks)} chunks")
+        for chunk in file_chunks:
+            chunk.metadata["content_hash"] = text_sha256(chunk.page_content)
 
-    for chunk in chunks:
-        source = chunk.metadata.get("source")
-        page = chunk.metadata.get("page")
-        current_page_id = f"{source}:{page}"
+        # Only embed chunks whose text changed, and drop IDs the new parse no longer produces.
+        known_hashes = get_known_chunk_hashes(db, manifest, source)
+        current_ids = {chunk.metadata["id"] for chunk in file_chunks}
+        orphan_ids.extend(chunk_id for chunk_id in known_hashes if chunk_id not in current_ids)
+        manifest.files[source] = FileEntry(
+            sha256=file_hashes.get(source, ""),
+            chunks={chunk.metadata["id"]: chunk.metadata["content_hash"] for chunk in file_chunks},
+        )
+        yield from (
+            chunk
+            for chunk in file_chunks
+            if known_hashes.get(chunk.metadata["id"]) != chunk.metadata["content_hash"]
+        )
 
-        # If the page ID is the same as the last one, increment the index.
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
+    # Changed files that produced no chunks at all.
+    for source in file_hashes.keys() - seen_files:
+        orphan_ids.extend(get_known_chunk_hashes(db, manifest, source))
+        manifest.files[source] = FileEntry(sha256=file_hashes[source])
 
-        # Calculate the chunk ID.
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
 
-        # Add it to the chunk meta-data.
-        chunk.metadata["id"] = chunk_id
+def get_known_chunk_hashes(db: Chroma, manifest: IndexManifest, source: str) -> dict[str, str]:
+    if source in manifest.files:
+        return manifest.files[source].chunks
 
-    return chunks
+    # No manifest entry yet (first incremental run over an existing DB): hash what is stored.
+    existing_items = db.get(where={"source": source}, include=["documents"])
+    return {
+        chunk_id: text_sha256(document)
+        for chunk_id, document in zip(existing_items["ids"], existing_items["documents"])
+    }
 
 
 def clear_database():
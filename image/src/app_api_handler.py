@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Optional
 import uvicorn
 import json
@@ -6,23 +11,51 @@ import logging
 
 import sys
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from mangum import Mangum
 from pydantic import BaseModel
-from query_model import QueryModel
-from rag_app.query_rag import query_rag
+from query_model import QueryModel, QuerySummary
 
 
-from lib.common import get_lambda_client
+from lib.job_queue import BULK, INTERACTIVE, JOB_QUEUE_BACKEND, QueueFullError, get_job_queue
+from lib.lru_cache import LRUCache
+from lib.metrics import METRICS, MetricsMiddleware
+from rag_app.shards import ShardFilterError, check_source_filter, read_shard_map
 
 from loguru import logger as LOGGER
 
+# With a worker (a Lambda, or a job queue, see lib/job_queue.py) the API never runs RAG
+# itself, so rag_app (langchain, langchain_aws, chromadb) is imported only in the synchronous code paths.
+# rag_app.shards is the exception: it has no dependencies, and checks source_filter against the index.
 WORKER_LAMBDA_NAME = os.environ.get("WORKER_LAMBDA_NAME", None)
+USE_WORKER = bool(WORKER_LAMBDA_NAME) or JOB_QUEUE_BACKEND != "lambda"
 CHARACTER_LIMIT = 2000
+BATCH_LIMIT = 25  # Max queries per /submit_queries request (also DynamoDB's BatchWriteItem size).
+# Threads for blocking work (boto3, Chroma) offloaded from the event loop; mostly waiting on I/O.
+ASYNC_MAX_THREADS = int(os.environ.get("ASYNC_MAX_THREADS", 256))
+# Completed queries never change again, so polls for them can be served from memory.
+COMPLETED_QUERY_CACHE = LRUCache(
+    max_size=int(os.environ.get("COMPLETED_QUERY_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.environ.get("COMPLETED_QUERY_CACHE_TTL_SECONDS", 600)),
+)
+LONG_POLL_MAX_SECONDS = 20  # Stays under API Gateway's 29s integration timeout.
+# The index the worker searches; it ships in this image too (see rag_app/get_chroma_db.py).
+CHROMA_PATH = os.environ.get("CHROMA_PATH", "data/chroma")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # asyncio.to_thread() and langchain's ainvoke() fallbacks use the loop's default executor.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_MAX_THREADS, thread_name_prefix="rag")
+    )
+    yield
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS so that the frontend can access this API.
 app.add_middleware(
@@ -31,94 +64,280 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["ETag", "X-Next-Cursor"],  # Poll revalidation and list pagination.
 )
+app.add_middleware(MetricsMiddleware)
 
 handler = Mangum(app)  # Entry point for AWS Lambda.
 
 class SubmitQueryRequest(BaseModel):
     query_text: str
     user_id: Optional[str] = None
+    # Index shards to search (see populate_database.py --shard-by); all of them by default.
+    source_filter: Optional[list[str]] = None
+
+
+class SubmitQueriesRequest(BaseModel):
+    queries: list[SubmitQueryRequest]
 
 
 @app.get("/")
-def index():
+async def index():
     LOGGER.info("index invoked")
     
     return {"Hello": "World"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> str:
+    """
+    This process's metrics in the Prometheus text format: request and pipeline
+    stage latency histograms, token counts and cache hit rates. With a worker
+    Lambda the pipeline runs there, and its metrics reach CloudWatch as EMF logs.
+    """
+    return METRICS.render()
+
+
 @app.get("/get_query")
-def get_query_endpoint(query_id: str) -> QueryModel:
+async def get_query_endpoint(request: Request, query_id: str, wait_seconds: float = 0) -> QueryModel:
+    """
+    Returns the query with an ETag; a matching If-None-Match gets a bodyless 304.
+    With wait_seconds, an incomplete query is re-read until it completes or the
+    wait (capped at LONG_POLL_MAX_SECONDS) runs out, replacing client-side polling.
+    """
     LOGGER.info(
-        f"get_query_endpoint invoked. query_id - {query_id}")
+        f"get_query_endpoint invoked. query_id - {query_id} - wait_seconds - {wait_seconds}")
     
-    query = QueryModel.get_item(query_id)
-    if query:
-        return query
-    else:
+    query = await get_query_item(query_id)
+    if query and not query.is_complete and wait_seconds > 0:
+        deadline = time.monotonic() + min(wait_seconds, LONG_POLL_MAX_SECONDS)
+        interval = 0.25
+        while not query.is_complete and time.monotonic() + interval < deadline:
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 2.0)
+            # A failed re-read returns None; keep the last state read and try again.
+            query = await get_query_item(query_id) or query
+
+    if not query:
         raise HTTPException(status_code=404, detail=f"Query Not Found: {query_id}")
 
-@app.get("/list_query")
-def list_query_endpoint(user_id: str) -> list[QueryModel]:
-    ITEM_COUNT = 25
-    LOGGER.info(f"Listing queries for user: {user_id}")
-    query_items = QueryModel.list_items(user_id=user_id, count=ITEM_COUNT)
-    return query_items
+    body = query.model_dump_json()
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def get_query_item(query_id: str) -> Optional[QueryModel]:
+    # Read-through: only completed queries are cached, since they can no longer change.
+    query = COMPLETED_QUERY_CACHE.get(query_id)
+    METRICS.increment("completed_query_cache_lookups_total", result="miss" if query is None else "hit")
+    if query is None:
+        with METRICS.span("api.get_item"):
+            query = await asyncio.to_thread(QueryModel.get_item, query_id)
+        cache_completed_query(query)
+    return query
+
+
+def cache_completed_query(query: Optional[QueryModel]):
+    if query and query.is_complete:
+        COMPLETED_QUERY_CACHE.put(query.query_id, query)
+
+@app.get("/list_query", responses={200: {"model": list[QuerySummary], "description": "With summary=true."}})
+async def list_query_endpoint(
+    user_id: str,
+    limit: int = Query(default=25, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+) -> list[QueryModel]:
+    """
+    Lists the user's queries, newest first. When more remain, the X-Next-Cursor
+    response header holds the cursor for the next page. summary=true returns only
+    query_id, create_time, query_text and is_complete for each query.
+    """
+    LOGGER.info(f"Listing queries for user: {user_id} - limit: {limit} - summary: {summary}")
+    try:
+        query_items, next_cursor = await asyncio.to_thread(
+            QueryModel.list_page, user_id=user_id, count=limit, cursor=cursor, summary=summary
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    body = json.dumps([query_item.model_dump() for query_item in query_items])
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/submit_query")
-def submit_query_endpoint(request: SubmitQueryRequest) -> QueryModel:
+async def submit_query_endpoint(request: SubmitQueryRequest) -> QueryModel:
+    LOGGER.info(
+        f"submit_query_endpoint invoked. JOB_QUEUE_BACKEND - {JOB_QUEUE_BACKEND} - request - {request}")
+
+    new_query = new_query_from_request(request)
+
+    if USE_WORKER:
+        LOGGER.info(f"submit_query_endpoint - Queueing for the worker. JOB_QUEUE_BACKEND - {JOB_QUEUE_BACKEND}.")
+        # Make an async call to the worker (the RAG/AI app).
+        delay_seconds = await admit_jobs(INTERACTIVE, 1)
+        with METRICS.span("api.put_item"):
+            await asyncio.to_thread(new_query.put_item)
+        with METRICS.span("api.invoke_worker"):
+            await asyncio.to_thread(invoke_worker, new_query, delay_seconds)
+    else:
+        LOGGER.info("submit_query_endpoint - No worker lambda name provided. Running synchronously.")
+        # Make a synchronous call to the worker (the RAG/AI app).
+        from rag_app.query_rag import query_rag_async
+
+        query_response = await query_rag_async(request.query_text, request.source_filter)
+        new_query.answer_text = query_response.response_text
+        new_query.sources = query_response.sources
+        new_query.is_complete = True
+        await asyncio.to_thread(new_query.put_item)
+        cache_completed_query(new_query)
+
+    return new_query
+
+
+@app.post("/submit_queries")
+async def submit_queries_endpoint(request: SubmitQueriesRequest) -> list[QueryModel]:
     LOGGER.info(
-        f"submit_query_endpoint invoked. WORKER_LAMBDA_NAME - {WORKER_LAMBDA_NAME} - request - {request}")
+        f"submit_queries_endpoint invoked. JOB_QUEUE_BACKEND - {JOB_QUEUE_BACKEND} - count - {len(request.queries)}")
+
+    if len(request.queries) > BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries. Max batch size is {BATCH_LIMIT}",
+        )
+    new_queries = [new_query_from_request(query_request) for query_request in request.queries]
+
+    if USE_WORKER:
+        # Bulk priority: runs after interactive queries, and is deferred first when the queue backs up.
+        delay_seconds = await admit_jobs(BULK, len(new_queries))
+        await asyncio.to_thread(QueryModel.put_items, new_queries)
+        await asyncio.to_thread(invoke_worker_batch, new_queries, delay_seconds)
+    else:
+        from rag_app.query_rag import query_rag_batch
+
+        query_responses = await asyncio.to_thread(
+            query_rag_batch,
+            [new_query.query_text for new_query in new_queries],
+            source_filters=[new_query.source_filter for new_query in new_queries],
+        )
+        for new_query, query_response in zip(new_queries, query_responses):
+            new_query.answer_text = query_response.response_text
+            new_query.sources = query_response.sources
+            new_query.is_complete = True
+        await asyncio.to_thread(QueryModel.put_items, new_queries)
+        for new_query in new_queries:
+            cache_completed_query(new_query)
+
+    return new_queries
+
+
+@app.post("/submit_query_stream")
+async def submit_query_stream_endpoint(request: SubmitQueryRequest) -> StreamingResponse:
+    """
+    Runs the query synchronously and streams the answer as server-sent events:
+    a "query" event with the new QueryModel, "token" events as the model generates
+    text, then a "done" event with the completed QueryModel once it is stored.
+    The pending query is stored before streaming starts, and updated at the end;
+    if the pipeline fails, it is stored as complete with the error, and an
+    "error" event is sent instead of "done".
+    The pipeline runs in the API process, so this is for running the API with
+    uvicorn: the deployed Lambda has no Bedrock access, and Mangum buffers the response.
+    """
+    LOGGER.info(f"submit_query_stream_endpoint invoked. request - {request}")
+    from rag_app.query_rag import QueryResponse, query_rag_stream
+
+    new_query = new_query_from_request(request)
+    # Stored pending before the first event, as /submit_query does: the query_id the client
+    # gets can be polled at once, and the query is kept even if the client disconnects.
+    with METRICS.span("api.put_item"):
+        await asyncio.to_thread(new_query.put_item)
+
+    async def event_stream():
+        yield format_sse("query", new_query.model_dump_json())
+        try:
+            async for item in query_rag_stream(request.query_text, request.source_filter):
+                if isinstance(item, QueryResponse):
+                    new_query.answer_text = item.response_text
+                    new_query.sources = item.sources
+                    new_query.is_complete = True
+                    await asyncio.to_thread(new_query.put_item)
+                    cache_completed_query(new_query)
+                    yield format_sse("done", new_query.model_dump_json())
+                else:
+                    yield format_sse("token", json.dumps({"text": item}))
+        except Exception as e:
+            LOGGER.exception(f"submit_query_stream_endpoint failed: {e}")
+            # Otherwise pollers of the pending query would wait for it forever.
+            new_query.error = str(e)
+            new_query.is_complete = True
+            try:
+                await asyncio.to_thread(new_query.put_item)
+            except Exception as put_error:
+                LOGGER.error(f"submit_query_stream_endpoint - could not store the failed query: {put_error}")
+            yield format_sse("error", json.dumps({"detail": str(e)}))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
+
+def new_query_from_request(request: SubmitQueryRequest) -> QueryModel:
     # Check if the query is too long.
     if len(request.query_text) > CHARACTER_LIMIT:
         raise HTTPException(
             status_code=400,
             detail=f"Query is too long. Max character limit is {CHARACTER_LIMIT}",
         )
+    # Checked here rather than left to the worker, where it would fail on every retry.
+    if request.source_filter:
+        shard_map = read_shard_map(CHROMA_PATH)
+        try:
+            check_source_filter(request.source_filter, list(shard_map["shards"]) if shard_map else None)
+        except ShardFilterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     # Create the query item, and put it into the data-base.
     user_id = request.user_id if request.user_id else "nobody"
-    new_query = QueryModel(query_text=request.query_text, user_id=user_id)
+    new_query = QueryModel(query_text=request.query_text, user_id=user_id, source_filter=request.source_filter)
 
     LOGGER.info(
         f"submit_query_endpoint new_query: {new_query} - request: {request}")
+    return new_query
 
-    if WORKER_LAMBDA_NAME:
-        LOGGER.info(f"submit_query_endpoint - Worker lambda name provided. WORKER_LAMBDA_NAME - {WORKER_LAMBDA_NAME}. Running asynchronously.")
-        # Make an async call to the worker (the RAG/AI app).
-        new_query.put_item()
-        invoke_worker(new_query)
-    else:
-        LOGGER.info("submit_query_endpoint - No worker lambda name provided. Running synchronously.")
-        # Make a synchronous call to the worker (the RAG/AI app).
-        query_response = query_rag(request.query_text)
-        new_query.answer_text = query_response.response_text
-        new_query.sources = query_response.sources
-        new_query.is_complete = True
-        new_query.put_item()
 
-    return new_query
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
 
 
-def invoke_worker(query: QueryModel):
-    LOGGER.info(
-        f"lambda_handler invoked. query - {query}")
+async def admit_jobs(priority: str, count: int) -> int:
+    """Backpressure check before anything is stored: returns the submit delay, or a 503 when saturated."""
+    try:
+        return await asyncio.to_thread(get_job_queue().admit, priority, count)
+    except QueueFullError as e:
+        LOGGER.warning(f"Rejecting {count} {priority} queries: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many queries in progress. Try again later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
 
-    # Initialize the Lambda client
-    lambda_client = get_lambda_client()
+def invoke_worker(query: QueryModel, delay_seconds: int = 0):
+    LOGGER.info(
+        f"invoke_worker invoked. query - {query}")
 
     # Get the QueryModel as a dictionary.
-    payload = query.model_dump()
+    get_job_queue().submit([query.model_dump()], INTERACTIVE, delay_seconds)
 
-    # Invoke another Lambda function asynchronously
-    response = lambda_client.invoke(
-        FunctionName=WORKER_LAMBDA_NAME,
-        InvocationType="Event",
-        Payload=json.dumps(payload),
-    )
 
-    LOGGER.info(f"Worker Lambda invoked: {response}")
+def invoke_worker_batch(queries: list[QueryModel], delay_seconds: int = 0):
+    LOGGER.info(f"invoke_worker_batch invoked. count - {len(queries)} - delay_seconds - {delay_seconds}")
+    get_job_queue().submit([query.model_dump() for query in queries], BULK, delay_seconds)
 
 
 if __name__ == "__main__":
@@ -1,31 +1,155 @@
+import json
 import logging
+import os
+import time
+from lib.common import get_dynamodb_client
+from lib.job_queue import schedule_sqs_retries
+from lib.metrics import METRICS
 from query_model import QueryModel
-from rag_app.query_rag import query_rag
+from rag_app.get_chat_model import get_chat_model
+from rag_app.get_embedding_function import get_embedding_function
+from rag_app.query_rag import query_rag, query_rag_batch
+from rag_app.retrieval import RETRIEVAL_MODE, get_bm25_index
+from rag_app.shards import ShardFilterError
+from rag_app.vector_store import get_vector_store
 
 from loguru import logger as LOGGER
 
+# Open the vector store and create the model and DynamoDB clients at import,
+# i.e. in the Lambda init phase, rather than inside the first request.
+WORKER_PRELOAD = os.environ.get("WORKER_PRELOAD", "true").lower() == "true"
+
+
+def init():
+    """
+    Preloads everything query_rag() needs. A failure is logged, not raised:
+    the same singletons are created lazily on the first request instead.
+    """
+    start = time.perf_counter()
+    try:
+        get_vector_store()
+        if RETRIEVAL_MODE == "hybrid":
+            get_bm25_index()
+        get_embedding_function()
+        get_chat_model()
+        get_dynamodb_client()
+    except Exception as e:
+        LOGGER.warning(f"init - preload failed, falling back to lazy initialization: {e}")
+        return
+    LOGGER.info(f"init - worker preloaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def is_warmup_event(event) -> bool:
+    # Explicit pings, serverless-plugin-warmup, and EventBridge schedules.
+    return bool(
+        event.get("warmup")
+        or event.get("source") == "serverless-plugin-warmup"
+        or event.get("detail-type") == "Scheduled Event"
+    )
+
 
 def handler(event, context):
+    if is_warmup_event(event):
+        LOGGER.debug("handler - warm-up ping, nothing to do")
+        return {"warmup": True}
+
     LOGGER.info(
         f"handler invoked. event - {event}, context - {context}")
 
+    # SQS event source: a batch of records, each body a QueryModel.
+    if "Records" in event:
+        return handle_sqs_records(event["Records"])
+
+    # Batch payload from the /submit_queries endpoint.
+    if "queries" in event:
+        query_items = [QueryModel(**query) for query in event["queries"]]
+        invoke_rag_batch(query_items)
+        return
+
     query_item = QueryModel(**event)
     invoke_rag(query_item)
 
 
+def handle_sqs_records(records: list[dict]) -> dict:
+    """
+    Processes an SQS batch in one invoke_rag_batch() call. Failed records are
+    reported back so that only they are retried (ReportBatchItemFailures), after
+    a jittered backoff rather than all at once (e.g. when Bedrock throttles).
+    Also used by the local job queue, whose records carry the same fields.
+    """
+    query_items = [QueryModel(**json.loads(record["body"])) for record in records]
+    failed_items = invoke_rag_batch(query_items, return_exceptions=True)
+    failed_ids = {query_item.query_id for query_item in failed_items}
+    failed_records = [
+        record for record, query_item in zip(records, query_items) if query_item.query_id in failed_ids
+    ]
+    schedule_sqs_retries(failed_records)
+    return {"batchItemFailures": [{"itemIdentifier": record["messageId"]} for record in failed_records]}
+
+
 def invoke_rag(query_item: QueryModel):
     LOGGER.info(
         f"invoke_rag invoked. query_item - {query_item}")
-    
-    rag_response = query_rag(query_item.query_text)
-    query_item.answer_text = rag_response.response_text
-    query_item.sources = rag_response.sources
-    query_item.is_complete = True
-    query_item.put_item()
+
+    with METRICS.span("worker.invoke_rag"):
+        try:
+            rag_response = query_rag(query_item.query_text, query_item.source_filter)
+        except ShardFilterError as e:
+            # Fails the same way on every retry, so the query is completed with the error instead.
+            LOGGER.error(f"invoke_rag - query {query_item.query_id} failed: {e}")
+            query_item.error = str(e)
+        else:
+            query_item.answer_text = rag_response.response_text
+            query_item.sources = rag_response.sources
+        query_item.is_complete = True
+        with METRICS.span("worker.put_item"):
+            query_item.put_item()
     LOGGER.info(f"Item is updated: {query_item}")
     return query_item
 
 
+def invoke_rag_batch(query_items: list[QueryModel], return_exceptions: bool = False) -> list[QueryModel]:
+    """
+    Answers all query_items with one query_rag_batch() call and writes the
+    completed items with a single batch write. Returns the items that failed
+    (only possible with return_exceptions=True); those are left unwritten, to
+    be retried. A ShardFilterError can never succeed, so those items are
+    written as complete with the error instead.
+    """
+    LOGGER.info(
+        f"invoke_rag_batch invoked. count - {len(query_items)}")
+
+    rag_responses = query_rag_batch(
+        [query_item.query_text for query_item in query_items],
+        return_exceptions=return_exceptions,
+        source_filters=[query_item.source_filter for query_item in query_items],
+    )
+
+    completed_items = []
+    failed_items = []
+    for query_item, rag_response in zip(query_items, rag_responses):
+        if isinstance(rag_response, ShardFilterError):
+            LOGGER.error(f"invoke_rag_batch - query {query_item.query_id} failed for good: {rag_response}")
+            query_item.error = str(rag_response)
+            query_item.is_complete = True
+            completed_items.append(query_item)
+            continue
+        if isinstance(rag_response, Exception):
+            LOGGER.error(f"invoke_rag_batch - query {query_item.query_id} failed: {rag_response}")
+            failed_items.append(query_item)
+            continue
+        query_item.answer_text = rag_response.response_text
+        query_item.sources = rag_response.sources
+        query_item.is_complete = True
+        completed_items.append(query_item)
+
+    if completed_items:
+        with METRICS.span("worker.put_items"):
+            QueryModel.put_items(completed_items)
+    LOGGER.info(f"Items are updated: {len(completed_items)} - failed: {len(failed_items)}")
+    return failed_items
+
+
 def main():
     LOGGER.info("main - Running example RAG call.")
     query_item = QueryModel(
@@ -35,6 +159,10 @@ def main():
     LOGGER.info(f"Received: {response}")
 
 
+if WORKER_PRELOAD:
+    init()
+
+
 if __name__ == "__main__":
     # For local testing.
     main()
@@ -8,13 +8,22 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import boto3
-from lib.constants import aws_region, ACCESS_KEY, SECRET_KEY
+from botocore.config import Config
+from lib.constants import aws_region, ACCESS_KEY, SECRET_KEY, RAG_PROVIDER
+from lib.local_aws import LocalDynamoDBClient, LocalLambdaClient
 
 from loguru import logger as LOGGER
 
 # Configuration Values
 SQS_ACCOUNT_INFO = os.environ.get('SQS_ACCOUNT_INFO')
 S3_ACCOUNT_INFO= os.environ.get('S3_ACCOUNT_INFO')
+DYNAMODB_MAX_POOL_CONNECTIONS = int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', 50))
+
+_THREAD_LOCAL = threading.local()
+_CLIENT_LOCK = threading.Lock()
+DYNAMODB_CLIENT_INSTANCE = None  # Reference to singleton instance of the DynamoDB client
+LOCAL_LAMBDA_CLIENT_INSTANCE = None  # Reference to singleton instance of the local Lambda stand-in
+SQS_CLIENT_INSTANCE = None  # Reference to singleton instance of the SQS client
 
 def get_secret(key):
     client = get_boto3_session().client('ssm',
@@ -31,15 +40,31 @@ def get_secret(key):
 
 
 def get_lambda_client():
+    global LOCAL_LAMBDA_CLIENT_INSTANCE
+    if RAG_PROVIDER == 'local':
+        with _CLIENT_LOCK:
+            if LOCAL_LAMBDA_CLIENT_INSTANCE is None:
+                LOCAL_LAMBDA_CLIENT_INSTANCE = LocalLambdaClient()
+        return LOCAL_LAMBDA_CLIENT_INSTANCE
     if os.getenv('IS_OFFLINE'):
         return get_boto3_session().client('lambda', region_name='localhost', endpoint_url='http://localhost:3000')
     else:
         return get_boto3_session().client('lambda')
 
 
+def get_sqs_client():
+    # Thread-safe, like the DynamoDB client, so one is shared process-wide.
+    global SQS_CLIENT_INSTANCE
+    if SQS_CLIENT_INSTANCE is None:
+        with _CLIENT_LOCK:
+            if SQS_CLIENT_INSTANCE is None:
+                SQS_CLIENT_INSTANCE = get_boto3_session().client('sqs')
+    return SQS_CLIENT_INSTANCE
+
+
 def get_boto3_session():
-    # boto3 is not thread-safe
-    d = threading.local()
+    # boto3 sessions are not thread-safe, so keep one per thread.
+    d = _THREAD_LOCAL
     if not hasattr(d, 'boto3_session'):
         if os.getenv('IS_OFFLINE') == 'true':
             LOGGER.info("Using offline dynamo endpoint")
@@ -49,6 +74,34 @@ def get_boto3_session():
     return d.boto3_session
 
 
+def get_dynamodb_client():
+    """
+    Process-wide low-level DynamoDB client. Unlike sessions and resources, boto3
+    clients are thread-safe, so all threads share one connection pool.
+    """
+    global DYNAMODB_CLIENT_INSTANCE
+    if DYNAMODB_CLIENT_INSTANCE is None:
+        with _CLIENT_LOCK:
+            if DYNAMODB_CLIENT_INSTANCE is None and RAG_PROVIDER == 'local':
+                # Same key schema as the table and index in rag-cdk-infra.
+                DYNAMODB_CLIENT_INSTANCE = LocalDynamoDBClient(
+                    key_name='query_id', indexes={'queries_by_user_id': ('user_id', 'create_time')})
+            if DYNAMODB_CLIENT_INSTANCE is None:
+                config = Config(
+                    max_pool_connections=DYNAMODB_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=True,
+                    retries={'mode': 'adaptive', 'max_attempts': 5},
+                )
+                session = get_boto3_session()
+                if os.getenv('IS_OFFLINE') == 'true':
+                    DYNAMODB_CLIENT_INSTANCE = session.client(
+                        'dynamodb', endpoint_url='http://localhost:8000', config=config)
+                else:
+                    DYNAMODB_CLIENT_INSTANCE = session.client(
+                        'dynamodb', region_name=os.environ.get('AWS_DEFAULT_REGION'), config=config)
+    return DYNAMODB_CLIENT_INSTANCE
+
+
 def get_account_info():
     account_info_for_gcp_provision = None
     try:
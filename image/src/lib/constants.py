@@ -25,3 +25,7 @@ CLOSE_INCOMPLETE = "4"
 # You will also need to have Bedrock's model name enabled and granted for the region you are running this in.
 
 BEDROCK_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
+# "bedrock" (default) or "local": deterministic offline stand-ins for Bedrock,
+# DynamoDB and the worker Lambda, for load testing without AWS.
+RAG_PROVIDER = os.environ.get("RAG_PROVIDER", "bedrock")
@@ -0,0 +1,311 @@
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lib.common import get_lambda_client, get_sqs_client
+from lib.metrics import METRICS
+
+from loguru import logger as LOGGER
+
+# How submitted queries reach app_work_handler:
+#   "lambda" - one fire-and-forget Event invoke per submission (WORKER_LAMBDA_NAME); no limits.
+#   "sqs"    - SQS queues; the worker's event source mappings bound concurrency.
+#   "local"  - in-process SQLite queue drained by a fixed pool of worker threads.
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "lambda")
+WORKER_LAMBDA_NAME = os.environ.get("WORKER_LAMBDA_NAME", None)
+JOB_QUEUE_URL = os.environ.get("JOB_QUEUE_URL")  # Interactive jobs.
+JOB_QUEUE_BULK_URL = os.environ.get("JOB_QUEUE_BULK_URL") or JOB_QUEUE_URL
+# Backpressure: above JOB_QUEUE_MAX_DEPTH waiting jobs new work is rejected (0 = no limit);
+# above JOB_QUEUE_BULK_DEFER_DEPTH bulk jobs are accepted but delayed by JOB_QUEUE_DEFER_SECONDS.
+JOB_QUEUE_MAX_DEPTH = int(os.environ.get("JOB_QUEUE_MAX_DEPTH", 500))
+JOB_QUEUE_BULK_DEFER_DEPTH = int(os.environ.get("JOB_QUEUE_BULK_DEFER_DEPTH", 100))
+JOB_QUEUE_DEFER_SECONDS = int(os.environ.get("JOB_QUEUE_DEFER_SECONDS", 30))
+JOB_QUEUE_DEPTH_CACHE_SECONDS = float(os.environ.get("JOB_QUEUE_DEPTH_CACHE_SECONDS", 5))
+# Failed jobs are retried after a jittered exponential backoff, up to JOB_MAX_ATTEMPTS runs.
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", 2))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", 300))
+# Local backend: worker threads, jobs per handler call, and where the queue lives ("" = memory).
+JOB_QUEUE_CONCURRENCY = int(os.environ.get("JOB_QUEUE_CONCURRENCY", 4))
+JOB_QUEUE_BATCH_SIZE = int(os.environ.get("JOB_QUEUE_BATCH_SIZE", 10))
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "")
+JOB_VISIBILITY_SECONDS = 300  # A claimed local job reappears after this if its worker died.
+JOB_QUEUE_POLL_SECONDS = 0.5
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}  # Lower runs first.
+SQS_BATCH_LIMIT = 10
+SQS_MAX_DELAY_SECONDS = 900
+
+JOB_QUEUE_INSTANCE = None  # Reference to singleton instance of the job queue
+_JOB_QUEUE_LOCK = threading.Lock()
+
+
+class QueueFullError(Exception):
+    def __init__(self, depth: int, retry_after: int = JOB_QUEUE_DEFER_SECONDS):
+        super().__init__(f"Job queue is full ({depth} jobs waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class JobQueue(ABC):
+    """
+    Carries worker payloads (QueryModel dicts) from the API to app_work_handler.
+    Callers first admit() the jobs, which applies backpressure, then write the
+    QueryModel items, then submit() them, so a rejected job leaves no record.
+    """
+
+    def admit(self, priority: str, count: int = 1) -> int:
+        """Returns the delay in seconds to submit with, or raises QueueFullError."""
+        depth = self.depth()
+        if JOB_QUEUE_MAX_DEPTH and depth + count > JOB_QUEUE_MAX_DEPTH:
+            METRICS.increment("job_queue_admissions_total", count, priority=priority, result="rejected")
+            raise QueueFullError(depth)
+        if priority == BULK and JOB_QUEUE_BULK_DEFER_DEPTH and depth + count > JOB_QUEUE_BULK_DEFER_DEPTH:
+            METRICS.increment("job_queue_admissions_total", count, priority=priority, result="deferred")
+            return JOB_QUEUE_DEFER_SECONDS
+        METRICS.increment("job_queue_admissions_total", count, priority=priority, result="accepted")
+        return 0
+
+    @abstractmethod
+    def submit(self, payloads: List[dict], priority: str = INTERACTIVE, delay_seconds: int = 0):
+        """Queues payloads for the worker, to run no sooner than delay_seconds from now."""
+
+    def depth(self) -> int:
+        """Jobs waiting to run (approximate for SQS)."""
+        return 0
+
+
+class LambdaJobQueue(JobQueue):
+    """The original path: Event invokes of the worker Lambda, unbounded and unordered."""
+
+    def __init__(self, function_name: str = WORKER_LAMBDA_NAME):
+        self.function_name = function_name
+
+    def submit(self, payloads: List[dict], priority: str = INTERACTIVE, delay_seconds: int = 0):
+        # A single query is the QueryModel itself; several go as one batch invocation.
+        payload = payloads[0] if len(payloads) == 1 else {"queries": payloads}
+        response = get_lambda_client().invoke(
+            FunctionName=self.function_name,
+            InvocationType="Event",
+            Payload=json.dumps(payload),
+        )
+        LOGGER.info(f"Worker Lambda invoked: {response}")
+        METRICS.increment("job_queue_submitted_total", len(payloads), priority=priority)
+
+
+class SqsJobQueue(JobQueue):
+    """
+    One SQS queue per priority. Worker concurrency and priority are enforced by
+    the worker's event source mappings (maximum concurrency per queue, see
+    rag-cdk-infra); retries by handle_sqs_records() and schedule_sqs_retries().
+    """
+
+    def __init__(self, queue_urls: Dict[str, str]):
+        self.queue_urls = queue_urls
+        self._depth = (0.0, 0)  # (read at, depth)
+
+    def submit(self, payloads: List[dict], priority: str = INTERACTIVE, delay_seconds: int = 0):
+        queue_url = self.queue_urls[priority]
+        for start in range(0, len(payloads), SQS_BATCH_LIMIT):
+            batch = payloads[start:start + SQS_BATCH_LIMIT]
+            response = get_sqs_client().send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[
+                    {
+                        "Id": str(i),
+                        "MessageBody": json.dumps(payload),
+                        "DelaySeconds": min(delay_seconds, SQS_MAX_DELAY_SECONDS),
+                    }
+                    for i, payload in enumerate(batch)
+                ],
+            )
+            if response.get("Failed"):
+                raise RuntimeError(f"SQS rejected {len(response['Failed'])} jobs: {response['Failed']}")
+        METRICS.increment("job_queue_submitted_total", len(payloads), priority=priority)
+
+    def depth(self) -> int:
+        # Cached briefly, so admission does not cost an SQS call per request.
+        read_at, depth = self._depth
+        if time.monotonic() - read_at < JOB_QUEUE_DEPTH_CACHE_SECONDS:
+            return depth
+        depth = 0
+        for queue_url in set(self.queue_urls.values()):
+            attributes = get_sqs_client().get_queue_attributes(
+                QueueUrl=queue_url, AttributeNames=["ApproximateNumberOfMessages"]
+            )["Attributes"]
+            depth += int(attributes["ApproximateNumberOfMessages"])
+        self._depth = (time.monotonic(), depth)
+        return depth
+
+
+class LocalJobQueue(JobQueue):
+    """
+    SQLite-backed queue drained by `concurrency` worker threads, each passing up
+    to `batch_size` jobs (interactive before bulk, oldest first) to the worker
+    handler as an SQS-shaped event, so the same partial-failure reporting
+    applies. Failed jobs are retried with jittered backoff; after max_attempts
+    they are kept as dead and logged. With a file path, jobs survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_PATH,
+        concurrency: int = JOB_QUEUE_CONCURRENCY,
+        batch_size: int = JOB_QUEUE_BATCH_SIZE,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        handler: Optional[Callable] = None,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, priority INTEGER NOT NULL,"
+            " available_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " dead INTEGER NOT NULL DEFAULT 0, payload TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True) for i in range(concurrency)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, payloads: List[dict], priority: str = INTERACTIVE, delay_seconds: int = 0):
+        available_at = time.time() + delay_seconds
+        rows = [(uuid.uuid4().hex, PRIORITIES[priority], available_at, json.dumps(p)) for p in payloads]
+        with self._wakeup:
+            self._conn.executemany("INSERT INTO jobs (id, priority, available_at, payload) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._wakeup.notify(len(rows))
+        METRICS.increment("job_queue_submitted_total", len(payloads), priority=priority)
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE dead = 0").fetchone()[0]
+
+    def dead_jobs(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT payload FROM jobs WHERE dead = 1").fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def _work(self):
+        while True:
+            jobs = self._claim()
+            if jobs:
+                self._process(jobs)
+            else:
+                with self._wakeup:
+                    self._wakeup.wait(JOB_QUEUE_POLL_SECONDS)
+
+    def _claim(self) -> list:
+        now = time.time()
+        with self._lock:
+            jobs = self._conn.execute(
+                "SELECT id, attempts + 1, payload FROM jobs WHERE dead = 0 AND available_at <= ?"
+                " ORDER BY priority, available_at LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            # Leased, like an SQS visibility timeout, until deleted or rescheduled.
+            self._conn.executemany(
+                "UPDATE jobs SET attempts = ?, available_at = ? WHERE id = ?",
+                [(attempts, now + JOB_VISIBILITY_SECONDS, job_id) for job_id, attempts, _payload in jobs],
+            )
+            self._conn.commit()
+        return jobs
+
+    def _process(self, jobs: list):
+        records = [
+            {"messageId": job_id, "body": payload, "attributes": {"ApproximateReceiveCount": str(attempts)}}
+            for job_id, attempts, payload in jobs
+        ]
+        try:
+            response = self._handler()({"Records": records}, None) or {}
+            failed_ids = {failure["itemIdentifier"] for failure in response.get("batchItemFailures", [])}
+        except Exception as e:
+            LOGGER.exception(f"Local job batch failed: {e}")
+            failed_ids = {job_id for job_id, _attempts, _payload in jobs}
+
+        now = time.time()
+        with self._lock:
+            for job_id, attempts, payload in jobs:
+                if job_id not in failed_ids:
+                    self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                elif attempts >= self.max_attempts:
+                    LOGGER.error(f"Job {job_id} failed {attempts} times, giving up: {payload}")
+                    METRICS.increment("job_queue_dead_total")
+                    self._conn.execute("UPDATE jobs SET dead = 1 WHERE id = ?", (job_id,))
+                else:
+                    METRICS.increment("job_queue_retries_total")
+                    self._conn.execute(
+                        "UPDATE jobs SET available_at = ? WHERE id = ?", (now + backoff_seconds(attempts), job_id)
+                    )
+            self._conn.commit()
+
+    def _handler(self) -> Callable:
+        if self.handler is None:
+            from app_work_handler import handler
+
+            self.handler = handler
+        return self.handler
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^(attempt - 1))]."""
+    return random.uniform(0, min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+def schedule_sqs_retries(records: List[dict]):
+    """
+    Delays the redelivery of failed SQS records by a jittered backoff instead of
+    the queue's fixed visibility timeout. Records from other sources are skipped.
+    """
+    for record in records:
+        if record.get("eventSource") != "aws:sqs":
+            continue
+        attempt = int(record.get("attributes", {}).get("ApproximateReceiveCount", 1))
+        try:
+            get_sqs_client().change_message_visibility(
+                QueueUrl=sqs_queue_url(record["eventSourceARN"]),
+                ReceiptHandle=record["receiptHandle"],
+                VisibilityTimeout=int(backoff_seconds(attempt)),
+            )
+        except Exception as e:
+            # The message still comes back after the queue's visibility timeout.
+            LOGGER.warning(f"Could not reschedule SQS message {record.get('messageId')}: {e}")
+
+
+def sqs_queue_url(queue_arn: str) -> str:
+    # arn:aws:sqs:<region>:<account>:<name>
+    _arn, _partition, _service, region, account, name = queue_arn.split(":")
+    return f"https://sqs.{region}.amazonaws.com/{account}/{name}"
+
+
+def get_job_queue() -> JobQueue:
+    global JOB_QUEUE_INSTANCE
+    if JOB_QUEUE_INSTANCE is None:
+        with _JOB_QUEUE_LOCK:
+            if JOB_QUEUE_INSTANCE is None:
+                if JOB_QUEUE_BACKEND == "sqs":
+                    JOB_QUEUE_INSTANCE = SqsJobQueue({INTERACTIVE: JOB_QUEUE_URL, BULK: JOB_QUEUE_BULK_URL})
+                elif JOB_QUEUE_BACKEND == "local":
+                    JOB_QUEUE_INSTANCE = LocalJobQueue()
+                    METRICS.register_gauges("job_queue", lambda: {"depth": JOB_QUEUE_INSTANCE.depth()})
+                else:
+                    JOB_QUEUE_INSTANCE = LambdaJobQueue()
+                LOGGER.info(f"Init job queue: {type(JOB_QUEUE_INSTANCE).__name__}")
+    return JOB_QUEUE_INSTANCE
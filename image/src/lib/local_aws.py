@@ -0,0 +1,137 @@
+import copy
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger as LOGGER
+
+# Simulated round-trip time per DynamoDB call.
+LOCAL_DYNAMODB_LATENCY_MS = float(os.environ.get("LOCAL_DYNAMODB_LATENCY_MS", 5))
+# Worker invocations running at once in the local Lambda stand-in.
+LOCAL_WORKER_CONCURRENCY = int(os.environ.get("LOCAL_WORKER_CONCURRENCY", 8))
+
+_KEY_CONDITION_RE = re.compile(r"^\s*(\w+)\s*=\s*(:\w+)\s*$")
+
+
+class LocalDynamoDBClient:
+    """
+    In-memory stand-in for the low-level DynamoDB client, covering the calls
+    QueryModel makes: put_item, get_item, batch_write_item and query on a
+    global secondary index (equality key condition, Limit, ScanIndexForward,
+    ExclusiveStartKey, ProjectionExpression). Items keep the wire format
+    ({"S": ...}, {"N": ...}) and are copied in and out, as if serialized.
+    Thread-safe; data lives for the life of the process.
+    """
+
+    def __init__(self, key_name: str, indexes: dict, latency_ms: float = LOCAL_DYNAMODB_LATENCY_MS):
+        self.key_name = key_name
+        self.indexes = indexes  # index name -> (partition key, sort key)
+        self.latency_ms = latency_ms
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def put_item(self, TableName, Item, **kwargs):
+        self._wait()
+        with self._lock:
+            self._table(TableName)[self._key(Item)] = copy.deepcopy(Item)
+        return {}
+
+    def get_item(self, TableName, Key, **kwargs):
+        self._wait()
+        with self._lock:
+            item = self._table(TableName).get(self._key(Key))
+        return {"Item": copy.deepcopy(item)} if item is not None else {}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self._wait()
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                table = self._table(table_name)
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        table[self._key(item)] = copy.deepcopy(item)
+                    else:
+                        table.pop(self._key(request["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}}
+
+    def query(
+        self,
+        TableName,
+        IndexName,
+        KeyConditionExpression,
+        ExpressionAttributeValues,
+        Limit=None,
+        ScanIndexForward=True,
+        ExclusiveStartKey=None,
+        ProjectionExpression=None,
+        **kwargs,
+    ):
+        self._wait()
+        partition_key, sort_key = self.indexes[IndexName]
+        match = _KEY_CONDITION_RE.match(KeyConditionExpression)
+        if not match or match.group(1) != partition_key:
+            raise ValueError(f"Unsupported KeyConditionExpression: {KeyConditionExpression}")
+        partition_value = ExpressionAttributeValues[match.group(2)]
+
+        with self._lock:
+            items = [item for item in self._table(TableName).values() if item.get(partition_key) == partition_value]
+        items.sort(key=lambda item: (float(item[sort_key]["N"]), self._key(item)), reverse=not ScanIndexForward)
+
+        if ExclusiveStartKey:
+            start_key = self._key(ExclusiveStartKey)
+            position = next((i for i, item in enumerate(items) if self._key(item) == start_key), None)
+            items = items[position + 1:] if position is not None else []
+
+        page = items[:Limit] if Limit else items
+        response = {"Count": len(page), "ScannedCount": len(page)}
+        if Limit and len(items) > Limit:
+            last = page[-1]
+            response["LastEvaluatedKey"] = {
+                name: copy.deepcopy(last[name]) for name in (self.key_name, partition_key, sort_key)
+            }
+        if ProjectionExpression:
+            names = [name.strip() for name in ProjectionExpression.split(",")]
+            page = [{name: item[name] for name in names if name in item} for item in page]
+        response["Items"] = copy.deepcopy(page)
+        return response
+
+    def _table(self, table_name) -> dict:
+        return self.tables.setdefault(table_name, {})
+
+    def _key(self, item) -> str:
+        return json.dumps(item[self.key_name], sort_keys=True)
+
+    def _wait(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+
+class LocalLambdaClient:
+    """
+    Stand-in for the Lambda client used to invoke the worker: "Event"
+    invocations run app_work_handler.handler on a bounded thread pool in this
+    process, "RequestResponse" ones run inline.
+    """
+
+    def __init__(self, max_workers: int = LOCAL_WORKER_CONCURRENCY):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-worker")
+
+    def invoke(self, FunctionName, InvocationType="RequestResponse", Payload="{}", **kwargs):
+        from app_work_handler import handler
+
+        event = json.loads(Payload)
+        if InvocationType == "Event":
+            self.executor.submit(self._run, handler, event)
+            return {"StatusCode": 202}
+        return {"StatusCode": 200, "Payload": json.dumps(handler(event, None))}
+
+    @staticmethod
+    def _run(handler, event):
+        try:
+            handler(event, None)
+        except Exception as e:
+            LOGGER.exception(f"Local worker invocation failed: {e}")
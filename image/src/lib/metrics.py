@@ -0,0 +1,237 @@
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from loguru import logger as LOGGER
+
+# Histogram bucket upper bounds; values above the last one land in +Inf.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# CloudWatch Embedded Metric Format records go to stdout; on by default inside Lambda.
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "RagApp")
+METRICS_EMF = os.environ.get(
+    "METRICS_EMF", "true" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "false"
+).lower() == "true"
+# Fraction of prompts (with their responses) written to the log.
+PROMPT_LOG_SAMPLE_RATE = float(os.environ.get("PROMPT_LOG_SAMPLE_RATE", 0.01))
+PROMPT_LOG_QUEUE_SIZE = 256
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, histograms and gauge callbacks, rendered in the
+    Prometheus text format by render(). Recording is a dict lookup and an
+    increment under one lock, cheap enough for every request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.gauges: Dict[str, Callable[[], dict]] = {}
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS_MS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_gauges(self, prefix: str, callback: Callable[[], dict]):
+        """callback() is read at render time; each numeric item becomes gauge {prefix}_{key}."""
+        with self._lock:
+            self.gauges[prefix] = callback
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        """Times the block into the span_duration_ms histogram, labelled span=name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("span_duration_ms", (time.perf_counter() - start) * 1000, span=name, **labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {
+                name: {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+            gauges = dict(self.gauges)
+
+        lines = []
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_format_labels(key)} {value:g}" for key, value in sorted(series.items()))
+        for name, series in sorted(histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip([f"{b:g}" for b in buckets] + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        for prefix, callback in sorted(gauges.items()):
+            try:
+                values = callback()
+            except Exception as e:
+                LOGGER.warning(f"Gauge callback {prefix} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class SampledLogger:
+    """
+    Logs a random sample of messages from a background thread, so the request
+    path neither formats nor writes the unsampled ones and never waits on the
+    sink. Messages are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, sample_rate: float = PROMPT_LOG_SAMPLE_RATE, queue_size: int = PROMPT_LOG_QUEUE_SIZE):
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def submit(self, message: str):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sampled-logger", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            LOGGER.info(self._queue.get())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration_ms by method, route
+    template and status, through the end of the response body (so streamed
+    responses count in full). Also emits an EMF record per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # The router stores the matched route in the scope; the template keeps label cardinality bounded.
+            path = getattr(scope.get("route"), "path", "unmatched")
+            METRICS.observe(
+                "http_request_duration_ms", elapsed_ms, method=scope["method"], path=path, status=str(status["code"])
+            )
+            emit_emf({"RequestLatency": elapsed_ms}, {"Path": path}, properties={"status": status["code"]})
+
+
+def emit_emf(
+    metrics: Dict[str, float],
+    dimensions: Dict[str, str],
+    units: Optional[Dict[str, str]] = None,
+    properties: Optional[dict] = None,
+):
+    """Writes one CloudWatch EMF record to stdout; metrics default to Milliseconds."""
+    if not METRICS_EMF:
+        return
+    units = units or {}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": units.get(name, "Milliseconds")} for name in metrics],
+            }],
+        },
+        **(properties or {}),
+        **dimensions,
+        **metrics,
+    }
+    sys.stdout.write(json.dumps(record) + "\n")
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = MetricsRegistry()  # Process-wide registry, served by the API's /metrics endpoint
+PROMPT_LOG = SampledLogger()
+METRICS.register_gauges("prompt_log", lambda: {"dropped": PROMPT_LOG.dropped})
@@ -1,7 +1,8 @@
+import base64
+import json
 import os
 import time
 import uuid
-import boto3
 import logging
 import traceback
 import sys
@@ -11,13 +12,14 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from botocore.exceptions import ClientError
 
-from lib.common import get_boto3_session
+from lib.common import get_dynamodb_client
 
 db_region = os.environ.get('AWS_DEFAULT_REGION')
 TABLE_NAME = os.environ.get('TABLE_NAME')
 TTL_EXPIRE_MONTHS = 6  # Only keep queries for 6 months.
 TTL_EXPIRE_TIMESTAMP = 60 * 60 * 24 * 30 * TTL_EXPIRE_MONTHS
 GSI_INDEX_NAME = "queries_by_user_id"
+BATCH_WRITE_SIZE = 25  # DynamoDB's BatchWriteItem limit.
 
 from loguru import logger as LOGGER
 
@@ -31,47 +33,79 @@ class QueryModel(BaseModel):
     answer_text: Optional[str] = None
     sources: List[str] = Field(default_factory=list)
     is_complete: bool = False
-
-    @classmethod
-    def get_table(cls: "QueryModel") -> boto3.resource:
-        """
-        get_table() is the entry point to be invoked
-        :param cls:
-        """
-        if os.getenv('IS_OFFLINE') == 'true':
-            dynamodb = get_boto3_session().resource('dynamodb', endpoint_url='http://localhost:8000')
-        else:
-            dynamodb = get_boto3_session().resource('dynamodb', region_name=db_region)
-        return dynamodb.Table(TABLE_NAME)
+    source_filter: Optional[List[str]] = None  # Index shards to search; None searches all of them.
+    error: Optional[str] = None  # Why the query failed for good; it is complete, without an answer.
 
     def put_item(self):
         LOGGER.info(
             f"put_item invoked. db_region - {db_region} - TABLE_NAME - {TABLE_NAME}")  
 
-        item = self.as_ddb_item()
+        item = self.to_ddb_attributes()
 
         LOGGER.info(
-            f"put_item self.as_ddb_item(): item: {item}")  
+            f"put_item self.to_ddb_attributes(): item: {item}")  
 
         try:
-            response = QueryModel.get_table().put_item(Item=item)
+            response = get_dynamodb_client().put_item(TableName=TABLE_NAME, Item=item)
             LOGGER.info(response)
         except ClientError as e:
             traceback.print_exc()
             LOGGER.error(e)            
             raise e
 
-    def as_ddb_item(self):
-        item = {k: v for k, v in self.dict().items() if v is not None}
+    @classmethod
+    def put_items(cls: "QueryModel", query_items: list["QueryModel"]):
+        LOGGER.info(
+            f"put_items invoked. db_region - {db_region} - TABLE_NAME - {TABLE_NAME} - count - {len(query_items)}")
+
+        client = get_dynamodb_client()
+        try:
+            for start in range(0, len(query_items), BATCH_WRITE_SIZE):
+                requests = [
+                    {"PutRequest": {"Item": query_item.to_ddb_attributes()}}
+                    for query_item in query_items[start:start + BATCH_WRITE_SIZE]
+                ]
+                # Resubmit whatever DynamoDB could not process (throttling), as batch_writer() does.
+                for attempt in range(5):
+                    response = client.batch_write_item(RequestItems={TABLE_NAME: requests})
+                    requests = response.get("UnprocessedItems", {}).get(TABLE_NAME)
+                    if not requests:
+                        break
+                    time.sleep(0.05 * 2 ** attempt)
+                else:
+                    raise RuntimeError(f"put_items - {len(requests)} items still unprocessed")
+        except ClientError as e:
+            traceback.print_exc()
+            LOGGER.error(e)
+            raise e
+
+    def to_ddb_attributes(self) -> dict:
+        """Low-level DynamoDB item, built by the precomputed per-field encoders."""
+        values = self.__dict__
+        item = {}
+        for name, encode, _decode in _DDB_FIELD_CODECS:
+            value = values[name]
+            if value is not None:
+                item[name] = encode(value)
         return item
 
+    @classmethod
+    def from_ddb_attributes(cls: "QueryModel", item: dict) -> "QueryModel":
+        # Items come from our own table, so skip pydantic validation.
+        fields = {
+            name: decode(item[name]) for name, _encode, decode in _DDB_FIELD_CODECS if name in item
+        }
+        return cls.model_construct(**fields)
+
     @classmethod
     def get_item(cls: "QueryModel", query_id: str) -> "QueryModel":
         LOGGER.info(
             f"get_item invoked. db_region: {db_region} - TABLE_NAME: {TABLE_NAME} - query_id: {query_id}")  
               
         try:
-            response = cls.get_table().get_item(Key={"query_id": query_id})
+            response = get_dynamodb_client().get_item(
+                TableName=TABLE_NAME, Key={"query_id": {"S": query_id}}
+            )
         except ClientError as e:
             traceback.print_exc()
             LOGGER.error(e)            
@@ -79,27 +113,99 @@ class QueryModel(BaseModel):
 
         if "Item" in response:
             item = response["Item"]
-            return cls(**item)
+            return cls.from_ddb_attributes(item)
         else:
             return None
 
     @classmethod
     def list_items(cls: "QueryModel", user_id: str, count: int) -> list["QueryModel"]:
+        query_items, _next_cursor = cls.list_page(user_id=user_id, count=count)
+        return query_items
+
+    @classmethod
+    def list_page(
+        cls: "QueryModel",
+        user_id: str,
+        count: int,
+        cursor: Optional[str] = None,
+        summary: bool = False,
+    ) -> tuple[list, Optional[str]]:
+        """
+        Returns one page of the user's queries, newest first, and an opaque cursor
+        for the next page (None on the last page). With summary=True only the
+        QuerySummary attributes are read, so long answers don't cost read capacity.
+        Raises ValueError for a cursor that was not produced by this method.
+        """
         LOGGER.info(
-            f"list_items invoked. db_region: {db_region} - user_id: {user_id} - TABLE_NAME: {TABLE_NAME} - count: {count}")  
+            f"list_page invoked. db_region: {db_region} - user_id: {user_id} - TABLE_NAME: {TABLE_NAME} - count: {count} - summary: {summary}")  
+
+        kwargs = {}
+        if cursor:
+            kwargs["ExclusiveStartKey"] = decode_cursor(cursor)
+        if summary:
+            kwargs["ProjectionExpression"] = ", ".join(QuerySummary.model_fields)
 
         try:
-            response = cls.get_table().query(
+            response = get_dynamodb_client().query(
+                TableName=TABLE_NAME,
                 IndexName=GSI_INDEX_NAME,
                 KeyConditionExpression="user_id = :user_id",
-                ExpressionAttributeValues={":user_id": user_id},
+                ExpressionAttributeValues={":user_id": {"S": user_id}},
                 Limit=count,
                 ScanIndexForward=False,
+                **kwargs,
             )
         except ClientError as e:
             traceback.print_exc()
             LOGGER.error(e)             
-            return []
+            return [], None
 
         items = response.get("Items", [])
-        return [cls(**item) for item in items]
+        model = QuerySummary if summary else cls
+        next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+        return [model.from_ddb_attributes(item) for item in items], next_cursor
+
+
+class QuerySummary(BaseModel):
+    """The attributes a list view needs, without the answer and sources."""
+
+    query_id: str
+    create_time: int
+    query_text: str
+    is_complete: bool = False
+
+    @classmethod
+    def from_ddb_attributes(cls: "QuerySummary", item: dict) -> "QuerySummary":
+        fields = {
+            name: decode(item[name]) for name, _encode, decode in _DDB_FIELD_CODECS if name in item
+        }
+        return cls.model_construct(**fields)
+
+
+def encode_cursor(last_evaluated_key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(key, dict) or "query_id" not in key:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+
+# (field, encode, decode) for every QueryModel attribute, in low-level DynamoDB format.
+_DDB_FIELD_CODECS = [
+    ("query_id", lambda v: {"S": v}, lambda a: a["S"]),
+    ("user_id", lambda v: {"S": v}, lambda a: a["S"]),
+    ("create_time", lambda v: {"N": str(v)}, lambda a: int(a["N"])),
+    ("ttl", lambda v: {"N": str(v)}, lambda a: int(a["N"])),
+    ("query_text", lambda v: {"S": v}, lambda a: a["S"]),
+    ("answer_text", lambda v: {"S": v}, lambda a: a["S"]),
+    ("sources", lambda v: {"L": [{"S": s} for s in v]}, lambda a: [s["S"] for s in a["L"]]),
+    ("is_complete", lambda v: {"BOOL": v}, lambda a: a["BOOL"]),
+    ("source_filter", lambda v: {"L": [{"S": s} for s in v]}, lambda a: [s["S"] for s in a["L"]]),
+    ("error", lambda v: {"S": v}, lambda a: a["S"]),
+]
@@ -0,0 +1,127 @@
+import dataclasses
+import os
+import sys
+import threading
+from typing import Any, List, Optional
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from lib.lru_cache import LRUCache
+from rag_app.embedding_cache import normalize_text
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 256))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 60 * 60))
+# Cosine similarity above which two questions are treated as the same question. Off (0) by
+# default, so only exact repeats hit: with Titan embeddings, questions with different answers
+# ("landing page cost" vs "e-commerce cost") can be more than 0.95 similar.
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0)) or None
+
+
+@dataclasses.dataclass
+class _CacheEntry:
+    key: str
+    embedding: np.ndarray
+    response: Any
+
+
+class AnswerCache:
+    """
+    Caches QueryResponse objects for exact (normalized text) and, when
+    similarity_threshold is set, near-duplicate (query embedding cosine >=
+    similarity_threshold) questions. Entries are evicted by TTL/LRU and dropped
+    wholesale when the index version changes.
+    """
+
+    def __init__(
+        self,
+        max_size: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: Optional[float] = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.entries = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.similarity_threshold = similarity_threshold
+        self.index_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(query_text: str) -> str:
+        return normalize_text(query_text).casefold()
+
+    def lookup(self, query_text: str, query_embedding: List[float], index_version: str) -> Optional[Any]:
+        if self.entries.max_size <= 0:
+            return None
+        self._check_version(index_version)
+
+        key = self.cache_key(query_text)
+        entry = self.entries.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return self._response_for(entry, query_text)
+
+        entry = self._nearest(query_embedding) if self.similarity_threshold else None
+        if entry is not None:
+            with self._lock:
+                self.semantic_hits += 1
+            return self._response_for(entry, query_text)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, query_text: str, query_embedding: List[float], index_version: str, response: Any):
+        if self.entries.max_size <= 0:
+            return
+        self._check_version(index_version)
+        key = self.cache_key(query_text)
+        self.entries.put(key, _CacheEntry(key, _unit(query_embedding), response))
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "size": len(self.entries),
+            }
+
+    def _check_version(self, index_version: str):
+        with self._lock:
+            if index_version != self.index_version:
+                self.entries.clear()
+                self.index_version = index_version
+
+    def _nearest(self, query_embedding: List[float]) -> Optional[_CacheEntry]:
+        entries = self.entries.values()
+        if not entries:
+            return None
+        matrix = np.stack([entry.embedding for entry in entries])
+        similarities = matrix @ _unit(query_embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return entries[best]
+        return None
+
+    @staticmethod
+    def _response_for(entry: _CacheEntry, query_text: str) -> Any:
+        # Each caller gets its own copy, carrying its own query text.
+        return dataclasses.replace(
+            entry.response, query_text=query_text, sources=list(entry.response.sources)
+        )
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
@@ -0,0 +1,113 @@
+import math
+import os
+import re
+import sys
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from rag_app.section_file import read_section_file, write_section_file
+
+BM25_INDEX_FILE = "bm25.idx"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_MAGIC = b"BM25IDX1"
+# Keeps prices and counts like "$4,820" or "1.5" as single tokens.
+_TOKEN_RE = re.compile(r"\$?\d+(?:[.,]\d+)*|[a-z]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it of on or that the this to was what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def build_bm25_index(path: str, chunk_ids: List[str], texts: List[str]):
+    """
+    Writes a BM25 index over the chunks to a single section file: the vocabulary
+    in the header, postings as flat arrays in CSR layout (per-term posting
+    offsets, doc ids, term frequencies, idf, doc lengths).
+    """
+    term_counts = [Counter(tokenize(text)) for text in texts]
+    vocabulary = sorted({term for counts in term_counts for term in counts})
+    term_index = {term: i for i, term in enumerate(vocabulary)}
+
+    postings: List[List[Tuple[int, int]]] = [[] for _ in vocabulary]
+    for doc_id, counts in enumerate(term_counts):
+        for term, tf in counts.items():
+            postings[term_index[term]].append((doc_id, tf))
+
+    num_docs = len(texts)
+    doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.uint32)
+    term_offsets[1:] = np.cumsum([len(p) for p in postings])
+    doc_ids = np.array([doc_id for p in postings for doc_id, _ in p], dtype=np.uint32)
+    tfs = np.array([tf for p in postings for _, tf in p], dtype=np.float32)
+    idf = np.array(
+        [math.log(1 + (num_docs - len(p) + 0.5) / (len(p) + 0.5)) for p in postings], dtype=np.float32
+    )
+    chunk_id_blob = np.frombuffer("\n".join(chunk_ids).encode("utf-8"), dtype=np.uint8)
+
+    sections = {
+        "term_offsets": term_offsets,
+        "doc_ids": doc_ids,
+        "tfs": tfs,
+        "idf": idf,
+        "doc_lengths": doc_lengths,
+        "chunk_ids": chunk_id_blob,
+    }
+    header = {
+        "num_docs": num_docs,
+        "avgdl": float(doc_lengths.mean()) if num_docs else 0.0,
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "terms": vocabulary,
+    }
+    write_section_file(path, _MAGIC, header, sections)
+
+
+class BM25Index:
+    """Read side of build_bm25_index(). Arrays are zero-copy views over an mmap of the file."""
+
+    def __init__(self, path: str):
+        self._mmap, header, arrays = read_section_file(path, _MAGIC)
+
+        self.num_docs = header["num_docs"]
+        self.k1 = header["k1"]
+        self.b = header["b"]
+        self.term_index = {term: i for i, term in enumerate(header["terms"])}
+        self.term_offsets = arrays["term_offsets"]
+        self.doc_ids = arrays["doc_ids"]
+        self.tfs = arrays["tfs"]
+        self.idf = arrays["idf"]
+        self.chunk_ids = arrays["chunk_ids"].tobytes().decode("utf-8").split("\n") if self.num_docs else []
+        avgdl = header["avgdl"] or 1.0
+        # Per-document part of the BM25 denominator, computed once.
+        self.length_norm = self.k1 * (1 - self.b + self.b * arrays["doc_lengths"] / avgdl)
+
+    def search(self, query_text: str, k: int) -> List[Tuple[str, float]]:
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query_text)):
+            i = self.term_index.get(term)
+            if i is None:
+                continue
+            start, end = self.term_offsets[i], self.term_offsets[i + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            # Each doc appears once per term's postings, so fancy-index += is safe.
+            scores[docs] += self.idf[i] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[i], float(scores[i])) for i in top]
+
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+import zlib
+from typing import Dict, List, Optional
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_core.documents import Document
+
+from lib.lru_cache import LRUCache
+from rag_app.section_file import read_header, read_section_file, write_section_file
+from rag_app.vector_store import ScoredDocuments, VectorStore
+
+COMPACT_INDEX_FILE = "compact.idx"
+COMPACT_DTYPES = ("int8", "float16")
+# Chunks per zlib block in the text blob; bigger blocks compress better, smaller ones decode faster.
+TEXT_BLOCK_SIZE = 32
+# Rows dequantized at a time while searching, to bound the float32 scratch memory.
+SEARCH_ROW_BLOCK = 4096
+
+_MAGIC = b"RAGCMP01"
+_MISSING_CODE = np.iinfo(np.uint32).max
+_MISSING_INT = np.iinfo(np.int64).min
+
+
+def export_compact_index(
+    path: str,
+    ids: List[str],
+    embeddings,
+    documents: List[str],
+    metadatas: List[dict],
+    dtype: str = "int8",
+):
+    """
+    Writes the whole index (vectors, text, metadata) as one section file:
+    - vectors scalar-quantized to int8 (symmetric, one float32 scale per row)
+      or stored as float16, plus each row's squared norm for L2 search;
+    - chunk texts once, zlib-compressed in blocks of TEXT_BLOCK_SIZE, with
+      block offsets and per-chunk offsets into the uncompressed stream;
+    - metadata by column: int64 for integer fields, dictionary-encoded
+      uint32 codes for everything else.
+    """
+    if dtype not in COMPACT_DTYPES:
+        raise ValueError(f"Unsupported compact index dtype: {dtype}")
+
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), np.float32)
+    sections: Dict[str, np.ndarray] = {}
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1, initial=0.0) / 127
+        scales[scales == 0] = 1.0
+        sections["vectors"] = np.clip(np.rint(matrix / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        sections["scales"] = scales.astype(np.float32)
+        dequantized = sections["vectors"].astype(np.float32) * sections["scales"][:, np.newaxis]
+    else:
+        sections["vectors"] = matrix.astype(np.float16)
+        dequantized = sections["vectors"].astype(np.float32)
+    sections["squared_norms"] = np.einsum("ij,ij->i", dequantized, dequantized).astype(np.float32)
+
+    encoded_texts = [text.encode("utf-8") for text in documents]
+    text_offsets = np.zeros(len(ids) + 1, dtype=np.uint64)
+    text_offsets[1:] = np.cumsum([len(text) for text in encoded_texts])
+    blocks = [
+        zlib.compress(b"".join(encoded_texts[start:start + TEXT_BLOCK_SIZE]), 9)
+        for start in range(0, len(ids), TEXT_BLOCK_SIZE)
+    ]
+    block_offsets = np.zeros(len(blocks) + 1, dtype=np.uint64)
+    block_offsets[1:] = np.cumsum([len(block) for block in blocks])
+    sections["text_offsets"] = text_offsets
+    sections["text_block_offsets"] = block_offsets
+    sections["text_blob"] = np.frombuffer(b"".join(blocks), dtype=np.uint8)
+
+    columns = {}
+    for name in sorted({key for metadata in metadatas for key in metadata} | {"id"}):
+        values = [chunk_id if name == "id" else metadata.get(name) for chunk_id, metadata in zip(ids, metadatas)]
+        if all(value is None or (isinstance(value, int) and not isinstance(value, bool)) for value in values):
+            columns[name] = "int"
+            sections[f"meta.{name}"] = np.array(
+                [_MISSING_INT if value is None else value for value in values], dtype=np.int64
+            )
+        else:
+            columns[name] = "dict"
+            dictionary = sorted({json.dumps(value) for value in values if value is not None})
+            codes = {value: code for code, value in enumerate(dictionary)}
+            sections[f"meta.{name}"] = np.array(
+                [_MISSING_CODE if value is None else codes[json.dumps(value)] for value in values], dtype=np.uint32
+            )
+            encoded = [value.encode("utf-8") for value in dictionary]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+            offsets[1:] = np.cumsum([len(value) for value in encoded])
+            sections[f"meta.{name}.offsets"] = offsets
+            sections[f"meta.{name}.values"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    header = {
+        "count": len(ids),
+        "dimension": matrix.shape[1],
+        "dtype": dtype,
+        "text_block_size": TEXT_BLOCK_SIZE,
+        "columns": columns,
+    }
+    write_section_file(path, _MAGIC, header, sections)
+
+
+def read_compact_dtype(path: str) -> Optional[str]:
+    """The dtype an existing compact index was written with, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    return read_header(path, _MAGIC)["dtype"]
+
+
+class CompactVectorStore(VectorStore):
+    """
+    Read side of export_compact_index(). The file is mmapped and every array is
+    a zero-copy view; only the column dictionaries are decoded up front, and
+    text blocks are decompressed on demand (the most recent ones are cached).
+    Distances are squared L2 over the dequantized vectors, like the other stores.
+    """
+
+    def __init__(self, path: str):
+        self._mmap, header, self.arrays = read_section_file(path, _MAGIC)
+        self.count = header["count"]
+        self.dtype = header["dtype"]
+        self.text_block_size = header["text_block_size"]
+        self.vectors = self.arrays["vectors"].reshape(self.count, header["dimension"])
+        self.scales = self.arrays.get("scales")
+        self.squared_norms = self.arrays["squared_norms"]
+        self.columns = header["columns"]
+        self.dictionaries = {
+            name: self._decode_dictionary(name) for name, kind in self.columns.items() if kind == "dict"
+        }
+        self.ids: List[str] = [self.dictionaries["id"][code] for code in self.arrays["meta.id"]]
+        self.id_index = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self._text_blocks = LRUCache(max_size=64)
+
+    def search_batch(self, query_embeddings: List[List[float]], k: int) -> List[ScoredDocuments]:
+        k = min(k, self.count)
+        if k <= 0:
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        products = np.empty((len(queries), self.count), dtype=np.float32)
+        for start in range(0, self.count, SEARCH_ROW_BLOCK):
+            rows = slice(start, start + SEARCH_ROW_BLOCK)
+            products[:, rows] = queries @ self.vectors[rows].astype(np.float32).T
+            if self.scales is not None:
+                products[:, rows] *= self.scales[rows]
+        distances = (
+            self.squared_norms[np.newaxis, :]
+            - 2 * products
+            + np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+        )
+
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        return [
+            [(self._document(i), float(distance)) for i, distance in zip(row, row_distances)]
+            for row, row_distances in zip(top, top_distances)
+        ]
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        return {chunk_id: self._document(self.id_index[chunk_id]) for chunk_id in ids if chunk_id in self.id_index}
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        return {chunk_id: self._vector(self.id_index[chunk_id]) for chunk_id in ids if chunk_id in self.id_index}
+
+    def _vector(self, i: int) -> np.ndarray:
+        vector = self.vectors[i].astype(np.float32)
+        return vector * self.scales[i] if self.scales is not None else vector
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self._text(int(i)), metadata=self._metadata(int(i)))
+
+    def _text(self, i: int) -> str:
+        block = i // self.text_block_size
+        data = self._text_blocks.get(block)
+        if data is None:
+            offsets = self.arrays["text_block_offsets"]
+            compressed = self.arrays["text_blob"][int(offsets[block]):int(offsets[block + 1])]
+            data = zlib.decompress(compressed.tobytes())
+            self._text_blocks.put(block, data)
+        text_offsets = self.arrays["text_offsets"]
+        block_start = int(text_offsets[block * self.text_block_size])
+        return data[int(text_offsets[i]) - block_start:int(text_offsets[i + 1]) - block_start].decode("utf-8")
+
+    def _metadata(self, i: int) -> dict:
+        metadata = {}
+        for name, kind in self.columns.items():
+            value = self.arrays[f"meta.{name}"][i]
+            if kind == "int":
+                if value != _MISSING_INT:
+                    metadata[name] = int(value)
+            elif value != _MISSING_CODE:
+                metadata[name] = self.dictionaries[name][value]
+        return metadata
+
+    def _decode_dictionary(self, name: str) -> list:
+        offsets = self.arrays[f"meta.{name}.offsets"]
+        blob = self.arrays[f"meta.{name}.values"].tobytes()
+        return [
+            json.loads(blob[int(offsets[j]):int(offsets[j + 1])].decode("utf-8")) for j in range(len(offsets) - 1)
+        ]
@@ -0,0 +1,116 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Prompt context budget, in estimated tokens.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+# Longest overlap searched for between neighbouring chunks (the splitter uses 120 chars).
+MAX_OVERLAP_CHARS = 200
+MIN_OVERLAP_CHARS = 8
+# A truncated block shorter than this is not worth including.
+MIN_BLOCK_TOKENS = 32
+
+# Roughly one token per short word, per 4-char piece of a long word, and per symbol.
+_TOKEN_ESTIMATE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_ESTIMATE_RE.findall(text))
+
+
+def build_context(results: ScoredDocuments, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, ScoredDocuments]:
+    """
+    Assembles the prompt context from ranked chunks. Chunks from the same
+    source page with consecutive indices are merged into one block with their
+    shared overlap removed, and blocks repeating earlier text are dropped. Blocks are added in
+    rank order (of their best chunk) until the token budget is spent; the last
+    one may be cut at a sentence boundary. Returns the context text and the
+    chunks it actually contains.
+    """
+    blocks: List[Tuple[str, ScoredDocuments]] = []
+    seen_texts: List[str] = []
+    for group in group_by_page(results):
+        for text, members in merge_adjacent(group):
+            # Skip a block whose text is already contained in an earlier one.
+            key = " ".join(text.split())
+            if key and not any(key in seen for seen in seen_texts):
+                seen_texts.append(key)
+                blocks.append((text, members))
+
+    parts: List[str] = []
+    used: ScoredDocuments = []
+    remaining = token_budget
+    separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+    for text, members in blocks:
+        available = remaining - (separator_tokens if parts else 0)
+        tokens = estimate_tokens(text)
+        if tokens > available:
+            if parts and available < MIN_BLOCK_TOKENS:
+                break
+            text = truncate_to_tokens(text, available)
+            if not text:
+                break
+            tokens = available
+        parts.append(text)
+        used.extend(members)
+        remaining = available - tokens
+        if remaining <= 0:
+            break
+
+    return CONTEXT_SEPARATOR.join(parts), used
+
+
+def group_by_page(results: ScoredDocuments) -> List[ScoredDocuments]:
+    """Groups chunks by source page, ordered by each page's best rank, chunks by index within a page."""
+    groups: Dict[Tuple, ScoredDocuments] = {}
+    for doc, score in results:
+        groups.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), []).append((doc, score))
+    return [sorted(group, key=lambda item: chunk_index(item[0]) or 0) for group in groups.values()]
+
+
+def merge_adjacent(group: ScoredDocuments) -> List[Tuple[str, ScoredDocuments]]:
+    blocks: List[Tuple[str, ScoredDocuments]] = []
+    previous_index = None
+    for doc, score in group:
+        index = chunk_index(doc)
+        if blocks and index is not None and previous_index is not None and index == previous_index + 1:
+            text, members = blocks[-1]
+            blocks[-1] = (join_overlapping(text, doc.page_content), members + [(doc, score)])
+        else:
+            blocks.append((doc.page_content, [(doc, score)]))
+        previous_index = index
+    return blocks
+
+
+def join_overlapping(left: str, right: str) -> str:
+    """Joins two consecutive chunks, dropping the prefix of right that repeats the end of left."""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left}\n{right}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    pieces = list(_TOKEN_ESTIMATE_RE.finditer(text))
+    if len(pieces) <= max_tokens:
+        return text
+    cut = text[: pieces[max_tokens - 1].end()]
+    # Prefer ending on a full sentence if that keeps most of the text.
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if sentence_end > len(cut) // 2:
+        cut = cut[: sentence_end + 1]
+    return cut.rstrip()
+
+
+def chunk_index(doc: Document) -> Optional[int]:
+    # IDs look like "data/monopoly.pdf:6:2" - the last part is the chunk index on the page.
+    chunk_id = doc.metadata.get("id") or ""
+    index = chunk_id.rsplit(":", 1)[-1]
+    return int(index) if index.isdigit() else None
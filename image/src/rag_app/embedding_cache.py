@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import unicodedata
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables.config import run_in_executor
+
+from lib.lru_cache import LRUCache
+
+from loguru import logger as LOGGER
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 2048))
+# Set to an empty string to disable the on-disk layer. /tmp survives warm Lambda invocations.
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "/tmp/embedding_cache.sqlite3")
+EMBED_QUERY_MAX_WORKERS = int(os.environ.get("EMBED_QUERY_MAX_WORKERS", 8))
+
+
+def normalize_text(text: str) -> str:
+    # Collapse whitespace so trivially different inputs share one cache entry.
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class DiskEmbeddingStore:
+    """SQLite-backed key -> float32 vector store shared by every thread in the process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            found.update((key, array("f", blob).tolist()) for key, blob in rows)
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        rows = [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings implementation with an in-process LRU and an optional
+    on-disk store. Keys are a hash of the model id, the call kind (query or
+    document, since some providers embed them differently) and the normalized text.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_id: str,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        disk_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    ):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.memory = LRUCache(max_size=max_size)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskEmbeddingStore(disk_path)
+            except sqlite3.Error as e:
+                LOGGER.warning(f"Embedding disk cache disabled ({disk_path}): {e}")
+
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def cache_key(self, text: str, kind: str) -> str:
+        raw = f"{self.model_id}\x00{kind}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Query-kind embeddings for several texts in one call (misses are fetched concurrently)."""
+        return self._embed(texts, "query")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Serve memory hits on the event loop; only go to a thread for disk or network.
+        cached = self.memory.get(self.cache_key(text, "query"))
+        if cached is not None:
+            with self._stats_lock:
+                self.hits += 1
+            return cached
+        return await run_in_executor(None, self.embed_query, text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_in_executor(None, self.embed_documents, texts)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self.cache_key(text, kind) for text in texts]
+        results = [self.memory.get(key) for key in keys]
+        memory_hits = sum(1 for r in results if r is not None)
+
+        missing = {key for key, r in zip(keys, results) if r is None}
+        from_disk = {}
+        if missing and self.disk is not None:
+            try:
+                from_disk = self.disk.get_many(list(missing))
+            except sqlite3.Error as e:
+                LOGGER.warning(f"Embedding disk cache read failed: {e}")
+            for key, vector in from_disk.items():
+                self.memory.put(key, vector)
+            missing -= from_disk.keys()
+
+        # Embed each distinct missing text once, preserving input order.
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key in missing and key not in to_embed:
+                to_embed[key] = text
+        computed = {}
+        if to_embed:
+            if kind == "query" and len(to_embed) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(to_embed), EMBED_QUERY_MAX_WORKERS)) as executor:
+                    vectors = list(executor.map(self.embeddings.embed_query, to_embed.values()))
+            elif kind == "query":
+                vectors = [self.embeddings.embed_query(text) for text in to_embed.values()]
+            else:
+                vectors = self.embeddings.embed_documents(list(to_embed.values()))
+            computed = dict(zip(to_embed.keys(), vectors))
+            for key, vector in computed.items():
+                self.memory.put(key, vector)
+            if self.disk is not None:
+                try:
+                    self.disk.put_many(computed)
+                except sqlite3.Error as e:
+                    LOGGER.warning(f"Embedding disk cache write failed: {e}")
+
+        with self._stats_lock:
+            self.hits += memory_hits
+            self.disk_hits += sum(1 for r, key in zip(results, keys) if r is None and key in from_disk)
+            self.misses += sum(1 for r, key in zip(results, keys) if r is None and key in computed)
+
+        return [
+            r if r is not None else (from_disk[key] if key in from_disk else computed[key])
+            for r, key in zip(results, keys)
+        ]
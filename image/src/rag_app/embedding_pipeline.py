@@ -0,0 +1,152 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from botocore.exceptions import ClientError
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from loguru import logger as LOGGER
+
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 16))
+EMBED_MAX_WORKERS = int(os.environ.get("EMBED_MAX_WORKERS", 8))
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 500))
+# On top of the bedrock-runtime client's own adaptive retries (max_attempts=5, see
+# get_bedrock_runtime_client()), so a batch that stays throttled makes up to
+# 5 * (EMBED_MAX_RETRIES + 1) calls. The adaptive mode also slows every worker
+# down once it sees throttling, so these retries are mostly for sustained limits.
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", 6))
+EMBED_BACKOFF_BASE_SECONDS = 0.5
+EMBED_BACKOFF_MAX_SECONDS = 20.0
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    # Retries are counted from the embedding worker threads.
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+
+def is_throttling_error(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    # langchain_aws re-raises Bedrock errors as ValueError("Error raised by inference endpoint: ...").
+    message = str(error)
+    return any(code in message for code in THROTTLING_ERROR_CODES) or "Too many requests" in message
+
+
+def embed_with_retry(
+    embedding_function: Embeddings,
+    texts: List[str],
+    max_retries: int = EMBED_MAX_RETRIES,
+    stats: IngestStats = None,
+) -> List[List[float]]:
+    for attempt in range(max_retries + 1):
+        try:
+            return embedding_function.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries or not is_throttling_error(e):
+                raise
+            # Full jitter keeps the workers from retrying in lock-step.
+            delay = random.uniform(0, min(EMBED_BACKOFF_MAX_SECONDS, EMBED_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            LOGGER.warning(f"Embedding throttled (attempt {attempt + 1}/{max_retries}), retrying in {delay:.2f}s")
+            if stats is not None:
+                stats.add_retry()
+            time.sleep(delay)
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def embed_and_write(
+    db,
+    chunks: Iterable[Document],
+    embedding_function: Embeddings,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_MAX_WORKERS,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+) -> IngestStats:
+    """
+    Embeds chunks in batches on a bounded thread pool and upserts them into the
+    Chroma collection in bulk. Chunks must already carry metadata["id"]. The
+    input may be a generator; at most 2 * max_workers batches are in flight.
+    """
+    collection = db._collection
+    max_batch_size = getattr(collection._client, "max_batch_size", None)
+    if max_batch_size:
+        write_batch_size = min(write_batch_size, max_batch_size)
+
+    stats = IngestStats()
+    start = time.perf_counter()
+    pending_write: List[tuple] = []
+
+    def flush(min_size):
+        while pending_write and len(pending_write) >= min_size:
+            batch = pending_write[:write_batch_size]
+            del pending_write[:write_batch_size]
+            collection.upsert(
+                ids=[chunk.metadata["id"] for chunk, _ in batch],
+                embeddings=[vector for _, vector in batch],
+                metadatas=[chunk.metadata for chunk, _ in batch],
+                documents=[chunk.page_content for chunk, _ in batch],
+            )
+            stats.chunks += len(batch)
+            elapsed = time.perf_counter() - start
+            LOGGER.info(f"Wrote {stats.chunks} chunks ({stats.chunks / elapsed:.1f} chunks/sec)")
+
+    def collect(done):
+        for future in done:
+            batch, vectors = future.result()
+            pending_write.extend(zip(batch, vectors))
+            stats.batches += 1
+        flush(write_batch_size)
+
+    def embed_batch(batch):
+        return batch, embed_with_retry(embedding_function, [c.page_content for c in batch], stats=stats)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for batch in batched(chunks, batch_size):
+            if len(in_flight) >= 2 * max_workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(executor.submit(embed_batch, batch))
+        collect(in_flight)
+    flush(1)
+
+    stats.seconds = time.perf_counter() - start
+    LOGGER.info(
+        f"Embedded {stats.chunks} chunks in {stats.batches} batches ({stats.retries} retries) "
+        f"in {stats.seconds:.2f}s - {stats.chunks_per_second:.1f} chunks/sec"
+    )
+    return stats
@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import boto3
+from botocore.config import Config
+from langchain_aws import ChatBedrock
+
+from lib.constants import BEDROCK_MODEL_ID, RAG_PROVIDER
+from rag_app.local_providers import LocalChatModel
+
+from loguru import logger as LOGGER
+
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", 50))
+BEDROCK_TCP_KEEPALIVE = os.environ.get("BEDROCK_TCP_KEEPALIVE", "true").lower() == "true"
+BEDROCK_READ_TIMEOUT = int(os.environ.get("BEDROCK_READ_TIMEOUT", 120))
+
+# Singleton registries, keyed by region and by (model id, region).
+BEDROCK_CLIENT_INSTANCES = {}
+CHAT_MODEL_INSTANCES = {}
+_REGISTRY_LOCK = threading.RLock()
+
+
+def get_default_region():
+    return os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+
+
+def get_bedrock_runtime_client(region_name=None):
+    """
+    Returns a process-wide bedrock-runtime client for the region. boto3 clients
+    are thread-safe, so one pooled client is shared by every request and thread.
+    """
+    region_name = region_name or get_default_region()
+    client = BEDROCK_CLIENT_INSTANCES.get(region_name)
+    if client is None:
+        with _REGISTRY_LOCK:
+            client = BEDROCK_CLIENT_INSTANCES.get(region_name)
+            if client is None:
+                config = Config(
+                    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=BEDROCK_TCP_KEEPALIVE,
+                    read_timeout=BEDROCK_READ_TIMEOUT,
+                    retries={"mode": "adaptive", "max_attempts": 5},
+                )
+                client = boto3.session.Session().client(
+                    "bedrock-runtime", region_name=region_name, config=config
+                )
+                BEDROCK_CLIENT_INSTANCES[region_name] = client
+                LOGGER.info(f"Init bedrock-runtime client for region {region_name}")
+    return client
+
+
+def get_chat_model(model_id=BEDROCK_MODEL_ID, region_name=None):
+    region_name = region_name or get_default_region()
+    key = (model_id, region_name)
+    model = CHAT_MODEL_INSTANCES.get(key)
+    if model is None:
+        with _REGISTRY_LOCK:
+            model = CHAT_MODEL_INSTANCES.get(key)
+            if model is None and RAG_PROVIDER == "local":
+                model = LocalChatModel()
+                CHAT_MODEL_INSTANCES[key] = model
+                LOGGER.info(f"Init LocalChatModel in place of {model_id}")
+            if model is None:
+                model = ChatBedrock(
+                    model_id=model_id,
+                    region_name=region_name,
+                    client=get_bedrock_runtime_client(region_name),
+                )
+                CHAT_MODEL_INSTANCES[key] = model
+                LOGGER.info(f"Init ChatBedrock {model_id} for region {region_name}")
+    return model
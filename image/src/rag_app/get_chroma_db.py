@@ -6,36 +6,112 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from langchain_community.vectorstores import Chroma
+from lib.metrics import METRICS
 from rag_app.get_embedding_function import get_embedding_function
-from langchain_community.vectorstores import Chroma
+from rag_app.index_version import read_index_version
 
 from loguru import logger as LOGGER
 
 CHROMA_PATH = os.environ.get("CHROMA_PATH", "data/chroma")
 IS_USING_IMAGE_RUNTIME = bool(os.environ.get("IS_USING_IMAGE_RUNTIME", False))
+# "readonly" serves queries straight from the image path; "copy" always copies to /tmp first.
+CHROMA_OPEN_MODE = os.environ.get("CHROMA_OPEN_MODE", "readonly")
+# "chroma", "numpy" or "compact" (see rag_app/vector_store.py).
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
 CHROMA_DB_INSTANCE = None  # Reference to singleton instance of ChromaDB
+IS_CHROMA_READ_ONLY = False  # Whether CHROMA_DB_INSTANCE was opened in place, read-only
+
 
 def get_chroma_db():
-    global CHROMA_DB_INSTANCE
-    if not CHROMA_DB_INSTANCE:
-
-        # Hack needed for AWS Lambda's base Python image (to work with an updated version of SQLite).
-        # In Lambda runtime, we need to copy ChromaDB to /tmp so it can have write permissions.
-        if IS_USING_IMAGE_RUNTIME:
-            __import__("pysqlite3")
-            sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
-            copy_chroma_to_tmp()
-
-        # Prepare the DB.
-        CHROMA_DB_INSTANCE = Chroma(
-            persist_directory=get_runtime_chroma_path(),
-            embedding_function=get_embedding_function(),
-        )
-        LOGGER.info(f"Init ChromaDB {CHROMA_DB_INSTANCE} from {get_runtime_chroma_path()}")
+    global CHROMA_DB_INSTANCE, IS_CHROMA_READ_ONLY
+    # "is None", not "not": langchain's Chroma defines __len__, so an empty collection is falsy.
+    if CHROMA_DB_INSTANCE is None:
+        with METRICS.span("get_chroma_db.init"):
+            # Hack needed for AWS Lambda's base Python image (to work with an updated version of SQLite).
+            if IS_USING_IMAGE_RUNTIME:
+                __import__("pysqlite3")
+                sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+
+                # The image filesystem is read-only. Open the DB there as immutable, and only fall
+                # back to copying it to /tmp (so it has write permissions) if that fails.
+                if CHROMA_OPEN_MODE == "readonly":
+                    CHROMA_DB_INSTANCE = open_chroma_read_only(CHROMA_PATH)
+                    if CHROMA_DB_INSTANCE is not None:
+                        IS_CHROMA_READ_ONLY = True
+                if CHROMA_DB_INSTANCE is None:
+                    copy_chroma_to_tmp()
+
+            # Prepare the DB.
+            if CHROMA_DB_INSTANCE is None:
+                CHROMA_DB_INSTANCE = Chroma(
+                    persist_directory=get_runtime_chroma_path(),
+                    embedding_function=get_embedding_function(),
+                )
+            LOGGER.info(f"Init ChromaDB {CHROMA_DB_INSTANCE} from {get_runtime_chroma_path()}")
 
     return CHROMA_DB_INSTANCE
 
 
+def get_chroma_collection(collection_name: str):
+    """Another collection of the same DB (e.g. an index shard), opened through get_chroma_db()'s client."""
+    return Chroma(
+        client=get_chroma_db()._client,
+        collection_name=collection_name,
+        embedding_function=get_embedding_function(),
+    )
+
+
+class ImmutableSqliteModule:
+    """
+    Stands in for the sqlite3 module inside Chroma's connection pool. Connections
+    to db_file are opened as a read-only, immutable URI, so SQLite takes no locks
+    and never creates journal files next to it; everything else passes through.
+    """
+
+    def __init__(self, sqlite_module, db_file: str):
+        self._sqlite = sqlite_module
+        self._db_file = os.path.abspath(db_file)
+
+    def __getattr__(self, name):
+        return getattr(self._sqlite, name)
+
+    def connect(self, database, *args, **kwargs):
+        if not kwargs.get("uri") and os.path.abspath(database) == self._db_file:
+            database = f"file:{self._db_file}?mode=ro&immutable=1"
+            kwargs["uri"] = True
+        return self._sqlite.connect(database, *args, **kwargs)
+
+
+def open_chroma_read_only(chroma_path: str):
+    """Opens the persisted DB in place without writing to it. Returns None if that fails."""
+    from chromadb.config import Settings
+    from chromadb.db.impl import sqlite_pool
+
+    sqlite_module = sqlite_pool.sqlite3
+    sqlite_pool.sqlite3 = ImmutableSqliteModule(
+        sys.modules["sqlite3"], os.path.join(chroma_path, "chroma.sqlite3")
+    )
+    try:
+        # Migrations write to the DB, and the image's DB was fully migrated when it was built.
+        settings = Settings(
+            is_persistent=True,
+            persist_directory=chroma_path,
+            migrations="none",
+            anonymized_telemetry=False,
+        )
+        db = Chroma(
+            persist_directory=chroma_path,
+            embedding_function=get_embedding_function(),
+            client_settings=settings,
+        )
+        db._collection.count()  # Fail here rather than on the first query.
+        return db
+    except Exception as e:
+        LOGGER.warning(f"Read-only open of ChromaDB at {chroma_path} failed, falling back to copy: {e}")
+        sqlite_pool.sqlite3 = sqlite_module
+        return None
+
+
 def copy_chroma_to_tmp():
     dst_chroma_path = get_runtime_chroma_path()
 
@@ -52,7 +128,16 @@ def copy_chroma_to_tmp():
 
 
 def get_runtime_chroma_path():
-    if IS_USING_IMAGE_RUNTIME:
+    # The other backends only read their files, so they never need the /tmp copy either.
+    if IS_CHROMA_READ_ONLY or (IS_USING_IMAGE_RUNTIME and VECTOR_BACKEND != "chroma"):
+        return CHROMA_PATH
+    elif IS_USING_IMAGE_RUNTIME:
         return f"/tmp/{CHROMA_PATH}"
     else:
-        return f"image/src/{CHROMA_PATH}"
+        # An absolute CHROMA_PATH is used as is.
+        return os.path.join("image/src", CHROMA_PATH)
+
+
+def get_index_version():
+    # Changes whenever populate_database.py modifies the collection.
+    return read_index_version(get_runtime_chroma_path())
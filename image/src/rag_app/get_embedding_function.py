@@ -1,6 +1,32 @@
+import os
+import sys
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 from langchain_aws import BedrockEmbeddings
+from lib.constants import RAG_PROVIDER
+from lib.metrics import METRICS
+from rag_app.embedding_cache import CachedEmbeddings
+from rag_app.get_chat_model import get_bedrock_runtime_client
+from rag_app.local_providers import HashingEmbeddings
+
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v1")
+EMBEDDING_FUNCTION_INSTANCE = None  # Reference to singleton instance of the cached embeddings
 
 
 def get_embedding_function():
-    embeddings = BedrockEmbeddings()
-    return embeddings
+    global EMBEDDING_FUNCTION_INSTANCE
+    if not EMBEDDING_FUNCTION_INSTANCE:
+        if RAG_PROVIDER == "local":
+            embeddings = HashingEmbeddings()
+            # Distinct cache keys, so local vectors never mix with Bedrock ones.
+            model_id = f"local-hashing-{embeddings.dimension}"
+        else:
+            embeddings = BedrockEmbeddings(
+                model_id=EMBEDDING_MODEL_ID, client=get_bedrock_runtime_client()
+            )
+            model_id = EMBEDDING_MODEL_ID
+        EMBEDDING_FUNCTION_INSTANCE = CachedEmbeddings(embeddings, model_id=model_id)
+        METRICS.register_gauges("rag_embedding_cache", EMBEDDING_FUNCTION_INSTANCE.stats)
+    return EMBEDDING_FUNCTION_INSTANCE
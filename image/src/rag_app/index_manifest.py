@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict
+
+MANIFEST_FILE = "index_manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FileEntry:
+    sha256: str
+    chunks: Dict[str, str] = field(default_factory=dict)  # chunk id -> text hash
+
+
+@dataclass
+class IndexManifest:
+    """
+    Records, per source file, the file content hash and the text hash of every
+    chunk written for it. populate_database.py uses it to skip unchanged files,
+    re-embed only edited chunks and delete chunks that no longer exist.
+    """
+
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, chroma_path: str) -> "IndexManifest":
+        path = os.path.join(chroma_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            raw = json.load(f)
+        return cls(files={source: FileEntry(**entry) for source, entry in raw["files"].items()})
+
+    def save(self, chroma_path: str):
+        os.makedirs(chroma_path, exist_ok=True)
+        path = os.path.join(chroma_path, MANIFEST_FILE)
+        raw = {"files": {source: entry.__dict__ for source, entry in sorted(self.files.items())}}
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(raw, f, indent=1)
+        os.replace(f"{path}.tmp", path)
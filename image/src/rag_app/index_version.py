@@ -0,0 +1,37 @@
+import os
+import uuid
+
+INDEX_VERSION_FILE = "index_version"
+
+_VERSION_CACHE = {}  # path -> (mtime_ns, version)
+
+
+def read_index_version(chroma_path: str) -> str:
+    """
+    Returns the version marker written by populate_database.py, or "" if the
+    index has never been stamped. The file is only re-read when its mtime changes.
+    """
+    path = os.path.join(chroma_path, INDEX_VERSION_FILE)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return ""
+
+    cached = _VERSION_CACHE.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    with open(path) as f:
+        version = f.read().strip()
+    _VERSION_CACHE[path] = (mtime_ns, version)
+    return version
+
+
+def bump_index_version(chroma_path: str) -> str:
+    version = uuid.uuid4().hex
+    os.makedirs(chroma_path, exist_ok=True)
+    tmp_path = os.path.join(chroma_path, f"{INDEX_VERSION_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(chroma_path, INDEX_VERSION_FILE))
+    return version
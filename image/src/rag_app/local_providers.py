@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from rag_app.context_builder import estimate_tokens
+
+# Stand-ins for Bedrock, selected with RAG_PROVIDER=local. Deterministic, offline,
+# with configurable latency so load tests see realistic timings.
+LOCAL_EMBEDDING_DIMENSION = int(os.environ.get("LOCAL_EMBEDDING_DIMENSION", 1536))
+LOCAL_EMBEDDING_LATENCY_MS = float(os.environ.get("LOCAL_EMBEDDING_LATENCY_MS", 0))
+LOCAL_CHAT_FIRST_TOKEN_MS = float(os.environ.get("LOCAL_CHAT_FIRST_TOKEN_MS", 300))
+LOCAL_CHAT_INPUT_TOKEN_MS = float(os.environ.get("LOCAL_CHAT_INPUT_TOKEN_MS", 0.05))
+LOCAL_CHAT_TOKEN_DELAY_MS = float(os.environ.get("LOCAL_CHAT_TOKEN_DELAY_MS", 20))
+LOCAL_CHAT_MAX_TOKENS = int(os.environ.get("LOCAL_CHAT_MAX_TOKENS", 64))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Feature-hashing embedder: each lowercased word and word bigram is hashed to a
+    signed bucket, and the vector is L2-normalized. Texts sharing words get
+    similar vectors, so retrieval over a locally built index still behaves sensibly.
+    """
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIMENSION, latency_ms: float = LOCAL_EMBEDDING_LATENCY_MS):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # One simulated round trip per call, like a batched request.
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self.hash_text(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def hash_text(self, text: str) -> List[float]:
+        words = _WORD_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Echo chat model. The answer repeats the prompt's last line (the question)
+    followed by the start of the prompt, up to max_tokens words. It waits
+    first_token_ms plus input_token_ms per estimated prompt token before the
+    first word, then token_delay_ms per word. Async calls use asyncio.sleep,
+    so concurrent requests overlap as they would against a remote model.
+    """
+
+    first_token_ms: float = LOCAL_CHAT_FIRST_TOKEN_MS
+    input_token_ms: float = LOCAL_CHAT_INPUT_TOKEN_MS
+    token_delay_ms: float = LOCAL_CHAT_TOKEN_DELAY_MS
+    max_tokens: int = LOCAL_CHAT_MAX_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-echo"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        text = "".join(chunk.message.content for chunk in self._stream(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        text = "".join([chunk.message.content async for chunk in self._astream(messages)])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        time.sleep(self._first_token_seconds(prompt))
+        for i, token in enumerate(self._answer_tokens(prompt)):
+            if i:
+                time.sleep(self.token_delay_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        await asyncio.sleep(self._first_token_seconds(prompt))
+        for i, token in enumerate(self._answer_tokens(prompt)):
+            if i:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def _first_token_seconds(self, prompt: str) -> float:
+        return (self.first_token_ms + self.input_token_ms * estimate_tokens(prompt)) / 1000
+
+    def _answer_tokens(self, prompt: str) -> List[str]:
+        lines = [line for line in prompt.strip().splitlines() if line.strip()]
+        words = (lines[-1].split() if lines else []) + prompt.split()
+        words = words[: self.max_tokens]
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
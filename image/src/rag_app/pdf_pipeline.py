@@ -0,0 +1,99 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
+
+import pypdf
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+PDF_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 16))
+
+# (path, first page, last page exclusive)
+PageRange = Tuple[str, int, int]
+
+
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=600,
+        chunk_overlap=120,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+def calculate_chunk_ids(chunks):
+
+    # This will create IDs like "data/monopoly.pdf:6:2"
+    # Page Source : Page Number : Chunk Index
+
+    last_page_id = None
+    current_chunk_index = 0
+
+    for chunk in chunks:
+        source = chunk.metadata.get("source")
+        page = chunk.metadata.get("page")
+        current_page_id = f"{source}:{page}"
+
+        # If the page ID is the same as the last one, increment the index.
+        if current_page_id == last_page_id:
+            current_chunk_index += 1
+        else:
+            current_chunk_index = 0
+
+        # Calculate the chunk ID.
+        chunk_id = f"{current_page_id}:{current_chunk_index}"
+        last_page_id = current_page_id
+
+        # Add it to the chunk meta-data.
+        chunk.metadata["id"] = chunk_id
+
+    return chunks
+
+
+def plan_page_ranges(paths: Iterable[str], pages_per_task: int = PDF_PAGES_PER_TASK) -> List[PageRange]:
+    tasks = []
+    for path in paths:
+        page_count = len(pypdf.PdfReader(path).pages)
+        # Keep one task for an empty PDF so the file still shows up (with no chunks).
+        for start in range(0, max(page_count, 1), pages_per_task):
+            tasks.append((path, start, min(start + pages_per_task, page_count)))
+    return tasks
+
+
+def load_and_split_pages(task: PageRange) -> List[Document]:
+    """
+    Parses one page range and splits it into chunks with IDs. Produces the same
+    text and metadata as PyPDFLoader + the splitter + calculate_chunk_ids,
+    since chunk indices never cross a page boundary. Runs in a worker process.
+    """
+    path, start, end = task
+    reader = pypdf.PdfReader(path)
+    pages = [
+        Document(page_content=reader.pages[page_number].extract_text(), metadata={"source": path, "page": page_number})
+        for page_number in range(start, end)
+    ]
+    return calculate_chunk_ids(get_text_splitter().split_documents(pages))
+
+
+def iter_pdf_chunks(
+    paths: Iterable[str],
+    max_workers: int = PDF_MAX_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Iterator[Document]:
+    """
+    Yields chunks for the given PDFs in file/page order while a process pool
+    parses page ranges ahead of the consumer. At most 2 * max_workers page
+    ranges are parsed but not yet consumed, which bounds peak memory.
+    """
+    tasks = deque(plan_page_ranges(paths, pages_per_task))
+    if not tasks:
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        while tasks or in_flight:
+            while tasks and len(in_flight) < 2 * max_workers:
+                in_flight.append(executor.submit(load_and_split_pages, tasks.popleft()))
+            yield from in_flight.popleft().result()
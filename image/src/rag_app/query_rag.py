@@ -1,24 +1,31 @@
 import sys
 import os
 import argparse
+import asyncio
+import dataclasses
 
 # Add Parent Directory Programmatically
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from langchain.prompts import ChatPromptTemplate
-from langchain_aws import ChatBedrock
 
-from rag_app.get_chroma_db import get_chroma_db
+from lib.constants import BEDROCK_MODEL_ID
+from lib.metrics import METRICS, PROMPT_LOG, TOKEN_BUCKETS
+from rag_app.answer_cache import AnswerCache
+from rag_app.context_builder import build_context, estimate_tokens
+from rag_app.get_chat_model import get_chat_model
+from rag_app.get_chroma_db import get_index_version
+from rag_app.get_embedding_function import get_embedding_function
+from rag_app.rerank import RERANK_TOP_K, get_candidate_count, is_rerank_enabled, rerank
+from rag_app.retrieval import retrieve, retrieve_batch
+from rag_app.single_flight import SingleFlight
+from rag_app.stage_timer import StageTimer
+from rag_app.vector_store import VectorStore, get_vector_store
 
 from loguru import logger as LOGGER
 
-# You will also need to have Bedrock's model name enabled and granted for the region you are running this in.
-
-BEDROCK_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
-
-
 PROMPT_TEMPLATE = """
 Answer the question based only on the following context:
 
@@ -29,42 +36,320 @@ Answer the question based only on the following context:
 Answer the question based on the above context: {question}
 """
 
+# Parsed once per process rather than on every request.
+PROMPT = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+
+# Concurrent LLM calls per query_rag_batch() call.
+LLM_BATCH_MAX_CONCURRENCY = int(os.environ.get("LLM_BATCH_MAX_CONCURRENCY", 8))
+
 
 @dataclass
 class QueryResponse:
     query_text: str
     response_text: str
     sources: List[str]
+    # Milliseconds per pipeline stage for the request that produced this response.
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+ANSWER_CACHE = AnswerCache()
+METRICS.register_gauges("rag_answer_cache", ANSWER_CACHE.stats)
 
+# Concurrent identical questions (same normalized text and index version) share one
+# pipeline run, so a burst makes one retrieval and one LLM call instead of many.
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+QUERY_FLIGHTS = SingleFlight()
+METRICS.register_gauges("rag_single_flight", QUERY_FLIGHTS.stats)
 
-def query_rag(query_text: str) -> QueryResponse:
-    db = get_chroma_db()
+# Chunks put into the prompt.
+CONTEXT_K = RERANK_TOP_K if is_rerank_enabled() else 3
+
+
+def query_rag(query_text: str, source_filter: Optional[List[str]] = None) -> QueryResponse:
+    """
+    source_filter names the index shards to search (see populate_database.py
+    --shard-by); by default all shards are searched in parallel and merged.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return _query_rag(query_text, source_filter)
+    response, shared = QUERY_FLIGHTS.do(
+        flight_key(query_text, source_filter), lambda: _query_rag(query_text, source_filter)
+    )
+    return coalesced_response(response, query_text, shared)
+
+
+def _query_rag(query_text: str, source_filter: Optional[List[str]] = None) -> QueryResponse:
+    timer = StageTimer()
+    store = get_vector_store().select_shards(source_filter)
+
+    # Embed once; the vector serves both the answer cache and the DB search.
+    with timer.stage("embed"):
+        query_embedding = get_embedding_function().embed_query(query_text)
+    index_version = get_index_version()
+    cached_response = get_cached_response(query_text, query_embedding, index_version, timer, source_filter)
+    if cached_response:
+        return cached_response
 
     # Search the DB.
-    results = db.similarity_search_with_score(query_text, k=3)
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt = prompt_template.format(context=context_text, question=query_text)
-    LOGGER.info(prompt)
+    results = search(store, query_text, query_embedding, timer)
+    prompt, results = build_prompt(query_text, results)
+
+    model = get_chat_model(BEDROCK_MODEL_ID)
+    with timer.stage("llm"):
+        response = model.invoke(prompt)
+
+    return make_response(
+        query_text, prompt, response.content, results, query_embedding, index_version, timer.report(), source_filter
+    )
+
+
+async def query_rag_async(query_text: str, source_filter: Optional[List[str]] = None) -> QueryResponse:
+    """
+    Same pipeline as query_rag(), without blocking the event loop: the blocking
+    vector search runs in the loop's default executor and the LLM call uses ainvoke().
+    Coalesced with concurrent query_rag() and query_rag_async() calls for the same question.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await _query_rag_async(query_text, source_filter)
+    response, shared = await QUERY_FLIGHTS.ado(
+        flight_key(query_text, source_filter), lambda: _query_rag_async(query_text, source_filter)
+    )
+    return coalesced_response(response, query_text, shared)
+
+
+async def _query_rag_async(query_text: str, source_filter: Optional[List[str]] = None) -> QueryResponse:
+    timer = StageTimer("query_rag_async")
+    store = (await asyncio.to_thread(get_vector_store)).select_shards(source_filter)
+
+    with timer.stage("embed"):
+        query_embedding = await get_embedding_function().aembed_query(query_text)
+    index_version = get_index_version()
+    cached_response = get_cached_response(query_text, query_embedding, index_version, timer, source_filter)
+    if cached_response:
+        return cached_response
+
+    results = await asyncio.to_thread(search, store, query_text, query_embedding, timer)
+    prompt, results = build_prompt(query_text, results)
+
+    model = get_chat_model(BEDROCK_MODEL_ID)
+    with timer.stage("llm"):
+        response = await model.ainvoke(prompt)
+
+    return make_response(
+        query_text, prompt, response.content, results, query_embedding, index_version, timer.report(), source_filter
+    )
+
+
+async def query_rag_stream(
+    query_text: str, source_filter: Optional[List[str]] = None
+) -> AsyncIterator[Union[str, QueryResponse]]:
+    """
+    Streaming variant of query_rag_async(): yields answer text chunks as the
+    model generates them, then the final QueryResponse as the last item.
+    Not coalesced, since each caller consumes its own token stream.
+    """
+    timer = StageTimer("query_rag_stream")
+    store = (await asyncio.to_thread(get_vector_store)).select_shards(source_filter)
 
-    model = ChatBedrock(model_id=BEDROCK_MODEL_ID)
-    response = model.invoke(prompt)
-    response_text = response.content
+    with timer.stage("embed"):
+        query_embedding = await get_embedding_function().aembed_query(query_text)
+    index_version = get_index_version()
+    cached_response = get_cached_response(query_text, query_embedding, index_version, timer, source_filter)
+    if cached_response:
+        yield cached_response.response_text
+        yield cached_response
+        return
 
+    results = await asyncio.to_thread(search, store, query_text, query_embedding, timer)
+    prompt, results = build_prompt(query_text, results)
+
+    model = get_chat_model(BEDROCK_MODEL_ID)
+    response_parts = []
+    stream = model.astream(prompt)
+    while True:
+        # Time only the model: the consumer runs between yields.
+        with timer.stage("llm"):
+            chunk = await anext(stream, None)
+        if chunk is None:
+            break
+        if chunk.content:
+            response_parts.append(chunk.content)
+            yield chunk.content
+
+    yield make_response(
+        query_text,
+        prompt,
+        "".join(response_parts),
+        results,
+        query_embedding,
+        index_version,
+        timer.report(),
+        source_filter,
+    )
+
+
+def query_rag_batch(
+    query_texts: List[str],
+    return_exceptions: bool = False,
+    source_filters: Optional[List[Optional[List[str]]]] = None,
+) -> List[QueryResponse]:
+    """
+    Answers several queries together: one embedding call for all texts, one
+    multi-query retrieval, then the LLM calls fanned out concurrently.
+    With return_exceptions=True a failed query yields its exception in place.
+    Timings are for the batch as a whole. source_filters gives each query's
+    source filter (as in query_rag()); queries sharing a filter are batched together.
+    """
+    if not source_filters or not any(source_filters):
+        return _query_rag_batch(query_texts, return_exceptions)
+
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for i, source_filter in enumerate(source_filters):
+        groups.setdefault(tuple(sorted(source_filter or ())), []).append(i)
+    responses = [None] * len(query_texts)
+    for source_filter, indexes in groups.items():
+        try:
+            group_responses = _query_rag_batch(
+                [query_texts[i] for i in indexes], return_exceptions, list(source_filter) or None
+            )
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            group_responses = [e] * len(indexes)
+        for i, response in zip(indexes, group_responses):
+            responses[i] = response
+    return responses
+
+
+def _query_rag_batch(
+    query_texts: List[str], return_exceptions: bool = False, source_filter: Optional[List[str]] = None
+) -> List[QueryResponse]:
+    timer = StageTimer("query_rag_batch")
+    store = get_vector_store().select_shards(source_filter)
+
+    with timer.stage("embed"):
+        query_embeddings = get_embedding_function().embed_queries(query_texts)
+    index_version = get_index_version()
+    responses = [
+        get_cached_response(query_text, query_embedding, index_version, timer, source_filter)
+        for query_text, query_embedding in zip(query_texts, query_embeddings)
+    ]
+    pending = [i for i, response in enumerate(responses) if response is None]
+    if not pending:
+        return responses
+
+    pending_texts = [query_texts[i] for i in pending]
+    pending_embeddings = [query_embeddings[i] for i in pending]
+    with timer.stage("retrieve"):
+        results = retrieve_batch(store, pending_texts, pending_embeddings, k=get_candidate_count(CONTEXT_K))
+    if is_rerank_enabled():
+        with timer.stage("rerank"):
+            results = [
+                rerank(store, query_text, query_embedding, result)
+                for query_text, query_embedding, result in zip(pending_texts, pending_embeddings, results)
+            ]
+    prompts, results = zip(
+        *[build_prompt(query_text, result) for query_text, result in zip(pending_texts, results)]
+    )
+
+    model = get_chat_model(BEDROCK_MODEL_ID)
+    with timer.stage("llm"):
+        answers = model.batch(
+            list(prompts), config={"max_concurrency": LLM_BATCH_MAX_CONCURRENCY}, return_exceptions=True
+        )
+
+    timings = timer.report()
+    for i, prompt, result, answer in zip(pending, prompts, results, answers):
+        if isinstance(answer, Exception):
+            if not return_exceptions:
+                raise answer
+            responses[i] = answer
+        else:
+            responses[i] = make_response(
+                query_texts[i],
+                prompt,
+                answer.content,
+                result,
+                query_embeddings[i],
+                index_version,
+                timings,
+                source_filter,
+            )
+    return responses
+
+
+def flight_key(query_text: str, source_filter: Optional[List[str]] = None):
+    return AnswerCache.cache_key(query_text), get_index_version(), tuple(sorted(source_filter or ()))
+
+
+def coalesced_response(response: QueryResponse, query_text: str, shared: bool) -> QueryResponse:
+    METRICS.increment("rag_single_flight_calls_total", role="follower" if shared else "leader")
+    if not shared:
+        return response
+    # Each waiter gets its own copy, carrying its own query text.
+    return dataclasses.replace(
+        response, query_text=query_text, sources=list(response.sources), timings=dict(response.timings)
+    )
+
+
+def search(store: VectorStore, query_text: str, query_embedding: List[float], timer: StageTimer):
+    """Retrieves candidates and, when enabled, reranks them down to the prompt context."""
+    with timer.stage("retrieve"):
+        results = retrieve(store, query_text, query_embedding, k=get_candidate_count(CONTEXT_K))
+    if is_rerank_enabled():
+        with timer.stage("rerank"):
+            results = rerank(store, query_text, query_embedding, results)
+    return results
+
+
+def get_cached_response(
+    query_text, query_embedding, index_version, timer: StageTimer, source_filter=None
+) -> Optional[QueryResponse]:
+    # One cache serves every query, so answers drawn from a subset of the shards bypass it.
+    if source_filter:
+        return None
+    cached_response = ANSWER_CACHE.lookup(query_text, query_embedding, index_version)
+    METRICS.increment("rag_answer_cache_lookups_total", result="hit" if cached_response else "miss")
+    if cached_response:
+        LOGGER.info(f"Answer cache hit: {ANSWER_CACHE.stats()}")
+        cached_response.timings = timer.report()
+    return cached_response
+
+
+def build_prompt(query_text: str, results):
+    """Returns the prompt and the chunks that made it into the context (the response sources)."""
+    context_text, used_results = build_context(results)
+    prompt = PROMPT.format(context=context_text, question=query_text)
+    return prompt, used_results
+
+
+def make_response(
+    query_text, prompt, response_text, results, query_embedding, index_version, timings, source_filter=None
+) -> QueryResponse:
     sources = [doc.metadata.get("id", None) for doc, _score in results]
-    LOGGER.info(f"Response: {response_text}\nSources: {sources}")
+    # Estimated with the context builder's tokenizer, so the numbers match its budget.
+    METRICS.observe("rag_prompt_tokens", estimate_tokens(prompt), buckets=TOKEN_BUCKETS)
+    METRICS.observe("rag_answer_tokens", estimate_tokens(response_text), buckets=TOKEN_BUCKETS)
+    if PROMPT_LOG.sample():
+        PROMPT_LOG.submit(f"Sampled prompt:\n{prompt}\nResponse: {response_text}\nSources: {sources}")
 
-    return QueryResponse(
-        query_text=query_text, response_text=response_text, sources=sources
+    query_response = QueryResponse(
+        query_text=query_text, response_text=response_text, sources=sources, timings=timings
     )
+    if not source_filter:
+        ANSWER_CACHE.store(query_text, query_embedding, index_version, query_response)
+    return query_response
+
 
 def main():
     # Create CLI.
     parser = argparse.ArgumentParser()
     parser.add_argument("query_text", type=str, help="The query text.")
+    parser.add_argument("--shard", action="append", help="Only search this index shard (repeatable).")
     args = parser.parse_args()
     query_text = args.query_text
-    query_rag(query_text)
+    query_response = query_rag(query_text, source_filter=args.shard)
+    LOGGER.info(f"Response: {query_response.response_text}\nSources: {query_response.sources}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+import os
+import sys
+from typing import List, Tuple
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_app.bm25_index import tokenize
+from rag_app.vector_store import VectorStore
+
+# Candidates retrieved for the reranker to choose from. Off (0) by default, so the
+# retrieved context is unchanged unless a deployment opts in (e.g. 10).
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 0))
+# Chunks passed to the LLM after reranking (at most).
+RERANK_TOP_K = int(os.environ.get("RERANK_TOP_K", 3))
+# Chunks scoring below this are dropped, but the best chunk is always kept.
+RERANK_MIN_SCORE = float(os.environ.get("RERANK_MIN_SCORE", 0.25))
+# Weight of embedding similarity vs. query-term coverage in the rerank score.
+RERANK_SEMANTIC_WEIGHT = float(os.environ.get("RERANK_SEMANTIC_WEIGHT", 0.7))
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+def is_rerank_enabled() -> bool:
+    return RERANK_CANDIDATES > 0
+
+
+def get_candidate_count(k: int) -> int:
+    return max(k, RERANK_CANDIDATES) if is_rerank_enabled() else k
+
+
+def rerank(
+    store: VectorStore,
+    query_text: str,
+    query_embedding: List[float],
+    candidates: ScoredDocuments,
+    top_k: int = RERANK_TOP_K,
+    min_score: float = RERANK_MIN_SCORE,
+) -> ScoredDocuments:
+    """
+    Rescores retrieved chunks on the CPU and keeps the best top_k above min_score.
+    The score mixes cosine similarity between the query and chunk embeddings
+    (read back from the store, not recomputed) with the fraction of query
+    terms the chunk contains. Returned scores are rerank scores, higher is better.
+    """
+    if not candidates:
+        return candidates
+
+    chunk_ids = [doc.metadata.get("id") for doc, _score in candidates]
+    scores = RERANK_SEMANTIC_WEIGHT * cosine_similarities(
+        query_embedding, get_chunk_embeddings(store, chunk_ids)
+    ) + (1 - RERANK_SEMANTIC_WEIGHT) * term_coverage(query_text, [doc.page_content for doc, _score in candidates])
+
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    keep = [i for i in order if scores[i] >= min_score] or [order[0]]
+    return [(candidates[i][0], float(scores[i])) for i in keep]
+
+
+def get_chunk_embeddings(store: VectorStore, chunk_ids: List[str]) -> np.ndarray:
+    by_id = store.get_embeddings([chunk_id for chunk_id in chunk_ids if chunk_id])
+    dimension = len(next(iter(by_id.values()))) if by_id else 1
+    # Chunks missing from the store score 0 on the semantic part.
+    missing = np.zeros(dimension, dtype=np.float32)
+    return np.stack([np.asarray(by_id.get(chunk_id, missing), dtype=np.float32) for chunk_id in chunk_ids])
+
+
+def cosine_similarities(query_embedding: List[float], matrix: np.ndarray) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    if matrix.shape[1] != query.shape[0]:
+        return np.zeros(matrix.shape[0], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    return (matrix @ query) / np.where(norms == 0, 1.0, norms)
+
+
+def term_coverage(query_text: str, texts: List[str]) -> np.ndarray:
+    query_terms = set(tokenize(query_text))
+    if not query_terms:
+        return np.zeros(len(texts), dtype=np.float32)
+    return np.array(
+        [len(query_terms.intersection(tokenize(text))) / len(query_terms) for text in texts], dtype=np.float32
+    )
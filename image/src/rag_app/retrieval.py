@@ -0,0 +1,142 @@
+import heapq
+import os
+import sys
+import threading
+from itertools import chain
+from typing import Dict, List, Optional, Tuple, Union
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+
+from rag_app.bm25_index import BM25_INDEX_FILE, BM25Index
+from rag_app.get_chroma_db import get_index_version, get_runtime_chroma_path
+from rag_app.shards import map_shards, read_shard_map, shard_dir
+from rag_app.vector_store import VectorStore
+
+from loguru import logger as LOGGER
+
+# "hybrid" fuses BM25 and vector candidates; "vector" is plain similarity search.
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each retriever before fusion.
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 10))
+RRF_K = 60  # Standard reciprocal-rank-fusion damping constant.
+
+BM25_INDEX_INSTANCE = None  # Reference to singleton instance of the BM25 index
+BM25_INDEX_VERSION = None
+_BM25_LOCK = threading.Lock()
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+class ShardedBM25Index:
+    """
+    BM25 over an index built with --shard-by: one BM25Index per shard, searched
+    in parallel with the per-shard top-k lists merged by score. Each shard's IDF
+    comes from its own documents only, so scores across shards are approximate;
+    they only feed rank fusion, where ranks matter more than raw scores.
+    """
+
+    def __init__(self, indexes: Dict[str, BM25Index]):
+        self.indexes = indexes
+
+    def select_shards(self, shards: List[str]) -> "ShardedBM25Index":
+        # Shards without a BM25 file (no chunks) are simply absent.
+        return ShardedBM25Index({shard: self.indexes[shard] for shard in shards if shard in self.indexes})
+
+    def search(self, query_text: str, k: int) -> List[Tuple[str, float]]:
+        per_shard = map_shards(lambda index: index.search(query_text, k), list(self.indexes.values()))
+        return heapq.nlargest(k, chain.from_iterable(per_shard), key=lambda item: item[1])
+
+
+def get_bm25_index(shards: Optional[List[str]] = None) -> Optional[Union[BM25Index, ShardedBM25Index]]:
+    """
+    Opens the BM25 index next to the Chroma data, reopening it when the index
+    version changes. For a sharded index, shards restricts it to those shards.
+    """
+    global BM25_INDEX_INSTANCE, BM25_INDEX_VERSION
+    index_version = get_index_version()
+    if BM25_INDEX_VERSION != index_version:
+        with _BM25_LOCK:
+            if BM25_INDEX_VERSION != index_version:
+                BM25_INDEX_INSTANCE = open_bm25_index(get_runtime_chroma_path())
+                BM25_INDEX_VERSION = index_version
+    if shards and isinstance(BM25_INDEX_INSTANCE, ShardedBM25Index):
+        return BM25_INDEX_INSTANCE.select_shards(shards)
+    return BM25_INDEX_INSTANCE
+
+
+def open_bm25_index(chroma_path: str) -> Optional[Union[BM25Index, ShardedBM25Index]]:
+    shard_map = read_shard_map(chroma_path)
+    if not shard_map:
+        path = os.path.join(chroma_path, BM25_INDEX_FILE)
+        index = BM25Index(path) if os.path.exists(path) else None
+        LOGGER.info(f"Init BM25 index from {path}: {index is not None}")
+        return index
+
+    indexes = {}
+    for shard in shard_map["shards"]:
+        path = os.path.join(shard_dir(chroma_path, shard), BM25_INDEX_FILE)
+        if os.path.exists(path):
+            indexes[shard] = BM25Index(path)
+    LOGGER.info(f"Init sharded BM25 index from {chroma_path}: {len(indexes)} shards")
+    return ShardedBM25Index(indexes) if indexes else None
+
+
+def retrieve(store: VectorStore, query_text: str, query_embedding: List[float], k: int) -> ScoredDocuments:
+    """
+    Top-k chunks for the query. In hybrid mode the scores are RRF scores (higher
+    is better); in vector mode they are the store's distances, as before.
+    A store restricted with select_shards() restricts the lexical side too.
+    """
+    bm25_index = get_bm25_index(store.shards) if RETRIEVAL_MODE == "hybrid" else None
+    if bm25_index is None:
+        return store.search(query_embedding, k)
+
+    vector_results = store.search(query_embedding, max(k, HYBRID_CANDIDATES))
+    return fuse_with_lexical(store, bm25_index, query_text, vector_results, k)
+
+
+def retrieve_batch(
+    store: VectorStore, query_texts: List[str], query_embeddings: List[List[float]], k: int
+) -> List[ScoredDocuments]:
+    """retrieve() for several queries, with a single multi-query vector search."""
+    bm25_index = get_bm25_index(store.shards) if RETRIEVAL_MODE == "hybrid" else None
+    if bm25_index is None:
+        return store.search_batch(query_embeddings, k)
+
+    vector_results = store.search_batch(query_embeddings, max(k, HYBRID_CANDIDATES))
+    return [
+        fuse_with_lexical(store, bm25_index, query_text, results, k)
+        for query_text, results in zip(query_texts, vector_results)
+    ]
+
+
+def fuse_with_lexical(
+    store: VectorStore,
+    bm25_index: Union[BM25Index, ShardedBM25Index],
+    query_text: str,
+    vector_results: ScoredDocuments,
+    k: int,
+) -> ScoredDocuments:
+    lexical_results = bm25_index.search(query_text, max(k, HYBRID_CANDIDATES))
+    fused = reciprocal_rank_fusion(
+        [[doc.metadata.get("id") for doc, _score in vector_results], [chunk_id for chunk_id, _score in lexical_results]]
+    )[:k]
+
+    documents: Dict[str, Document] = {doc.metadata.get("id"): doc for doc, _score in vector_results}
+    missing_ids = [chunk_id for chunk_id, _score in fused if chunk_id not in documents]
+    if missing_ids:
+        # Lexical-only hits: fetch their text and metadata from the store by ID.
+        documents.update(store.get_documents(missing_ids))
+
+    return [(documents[chunk_id], score) for chunk_id, score in fused if chunk_id in documents]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]]) -> List[Tuple[str, float]]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
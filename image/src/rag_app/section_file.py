@@ -0,0 +1,64 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Tuple
+
+import numpy as np
+
+_ALIGN = 8
+
+
+def write_section_file(path: str, magic: bytes, header: dict, sections: Dict[str, np.ndarray]):
+    """
+    Writes one file: magic, a length-prefixed JSON header, then each array as
+    flat little-endian bytes, 8-byte aligned so readers can map them in place.
+    Section offsets, dtypes and sizes go into header["sections"]. Atomic.
+    """
+    header = dict(header, sections={})
+    offset = 0
+    for name, array in sections.items():
+        header["sections"][name] = [offset, array.dtype.str, int(array.size)]
+        offset += _aligned(array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(magic) + 4 + len(header_bytes))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(magic + struct.pack("<I", len(header_bytes)) + header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for array in sections.values():
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.write(b"\0" * (_aligned(array.nbytes) - array.nbytes))
+    os.replace(tmp_path, path)
+
+
+def read_section_file(path: str, magic: bytes) -> Tuple[mmap.mmap, dict, Dict[str, np.ndarray]]:
+    """Maps a write_section_file() file. Arrays are zero-copy, read-only views over the returned mmap."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[: len(magic)] != magic:
+        raise ValueError(f"Unexpected file format (expected {magic!r}): {path}")
+    (header_length,) = struct.unpack_from("<I", mapped, len(magic))
+    header_start = len(magic) + 4
+    header = json.loads(mapped[header_start:header_start + header_length])
+    data_start = _aligned(header_start + header_length)
+
+    arrays = {
+        name: np.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + offset)
+        for name, (offset, dtype, count) in header["sections"].items()
+    }
+    return mapped, header, arrays
+
+
+def read_header(path: str, magic: bytes) -> dict:
+    with open(path, "rb") as f:
+        prefix = f.read(len(magic) + 4)
+        if prefix[: len(magic)] != magic:
+            raise ValueError(f"Unexpected file format (expected {magic!r}): {path}")
+        (header_length,) = struct.unpack_from("<I", prefix, len(magic))
+        return json.loads(f.read(header_length))
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
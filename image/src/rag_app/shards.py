@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar
+
+# Written by populate_database.py --shard-by; its presence is what makes an index sharded.
+SHARDS_FILE = "shards.json"
+# Per-shard manifest and search indexes live in <chroma path>/shards/<name>/.
+SHARDS_DIR = "shards"
+# "source": one shard per source file; "directory": one per top-level directory (e.g. a tenant).
+SHARD_BY_CHOICES = ("source", "directory")
+DEFAULT_SHARD = "default"  # Files directly in the source root, when sharding by directory.
+# Threads searching shards concurrently, shared by all queries in the process.
+SHARD_SEARCH_MAX_WORKERS = int(os.environ.get("SHARD_SEARCH_MAX_WORKERS", 8))
+
+SHARD_EXECUTOR = None  # Reference to singleton instance of the shard search pool
+_SHARD_EXECUTOR_LOCK = threading.Lock()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ShardFilterError(ValueError):
+    """A source_filter that names unknown shards, or any source_filter on an unsharded index."""
+
+
+def check_source_filter(source_filter: Optional[List[str]], shards: Optional[List[str]]):
+    """Raises ShardFilterError unless every shard in source_filter is one of shards (None: unsharded)."""
+    if not source_filter:
+        return
+    if shards is None:
+        raise ShardFilterError("The index is not sharded; build it with populate_database.py --shard-by to filter")
+    unknown = [shard for shard in source_filter if shard not in shards]
+    if unknown:
+        raise ShardFilterError(f"Unknown index shards {unknown}; available: {sorted(shards)}")
+
+
+def shard_name(source: str, shard_by: str, source_root: str) -> str:
+    if shard_by == "directory":
+        parts = os.path.relpath(source, source_root).split(os.sep)
+        name = parts[0] if len(parts) > 1 else DEFAULT_SHARD
+    else:
+        name = os.path.splitext(os.path.basename(source))[0]
+    # Shard names end up in Chroma collection names: [a-z0-9_-], at most 63 characters.
+    name = re.sub(r"[^a-z0-9_-]+", "-", name.lower()).strip("-_")
+    return name[:50] or DEFAULT_SHARD
+
+
+def shard_collection_name(shard: str) -> str:
+    return f"shard-{shard}"
+
+
+def shard_dir(chroma_path: str, shard: str) -> str:
+    return os.path.join(chroma_path, SHARDS_DIR, shard)
+
+
+def chunk_source(chunk_id: str) -> str:
+    # Chunk IDs are "<source>:<page>:<chunk index>" (see calculate_chunk_ids()).
+    return chunk_id.rsplit(":", 2)[0]
+
+
+def read_shard_map(chroma_path: str) -> Optional[dict]:
+    """{"shard_by": ..., "shards": {name: [source, ...]}}, or None for an unsharded index."""
+    path = os.path.join(chroma_path, SHARDS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_shard_map(chroma_path: str, shard_by: str, shards: Dict[str, List[str]]):
+    os.makedirs(chroma_path, exist_ok=True)
+    tmp_path = os.path.join(chroma_path, f"{SHARDS_FILE}.tmp")
+    shard_map = {"shard_by": shard_by, "shards": {name: sorted(shards[name]) for name in sorted(shards)}}
+    with open(tmp_path, "w") as f:
+        json.dump(shard_map, f, indent=2)
+    os.replace(tmp_path, os.path.join(chroma_path, SHARDS_FILE))
+
+
+def map_shards(fn: Callable[[T], R], shards: List[T]) -> List[R]:
+    """fn over every shard, in parallel when there is more than one. Results keep the order of shards."""
+    global SHARD_EXECUTOR
+    if len(shards) <= 1:
+        return [fn(shard) for shard in shards]
+    if not SHARD_EXECUTOR:
+        with _SHARD_EXECUTOR_LOCK:
+            if not SHARD_EXECUTOR:
+                SHARD_EXECUTOR = ThreadPoolExecutor(
+                    max_workers=SHARD_SEARCH_MAX_WORKERS, thread_name_prefix="shard-search"
+                )
+    return list(SHARD_EXECUTOR.map(fn, shards))
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from loguru import logger as LOGGER
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader)
+    runs the work, and callers arriving while it is in flight wait for its
+    result (or exception) instead of repeating it. Nothing is kept once the
+    call completes; later callers start a new flight.
+
+    Sync (do) and async (ado) callers share one table of concurrent.futures
+    Futures, so a worker thread and an event loop asking the same question at
+    the same time still make one call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True when another caller's result was reused."""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return future.result(), True
+        self._run(key, future, fn)
+        return future.result(), False
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        future, is_leader = self._join(key)
+        if not is_leader:
+            # shield(): a cancelled follower must not cancel the shared call.
+            return await asyncio.shield(asyncio.wrap_future(future)), True
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # The leader's own request went away; its followers get an error, not a cancellation.
+            self._finish(key, future, exception=RuntimeError(f"Coalesced call {key} was cancelled"))
+            raise
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+            raise
+        self._finish(key, future, result=result)
+        return result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls)}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, fn: Callable[[], Any]):
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+        else:
+            self._finish(key, future, result=result)
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, exception: BaseException = None):
+        # Remove the key before resolving, so a caller arriving after this point starts a new flight.
+        with self._lock:
+            self._calls.pop(key, None)
+        if exception is not None:
+            LOGGER.debug(f"Single-flight call {key} failed for all waiters: {exception}")
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
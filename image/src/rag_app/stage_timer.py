@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lib.metrics import METRICS, emit_emf
+
+from loguru import logger as LOGGER
+
+
+class StageTimer:
+    """
+    Wall-clock time per pipeline stage, in milliseconds:
+
+        timer = StageTimer()
+        with timer.stage("embed"):
+            ...
+        timer.report()  # {"embed": 41.2, "total": 41.3}
+
+    report() also records each stage in the span_duration_ms histogram as
+    span="{pipeline}.{stage}" and emits one EMF record for the request.
+    """
+
+    def __init__(self, pipeline: str = "query_rag"):
+        self.pipeline = pipeline
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # A stage entered more than once (e.g. per streamed chunk) accumulates.
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def report(self) -> Dict[str, float]:
+        timings = {name: round(ms, 1) for name, ms in self.timings.items()}
+        timings["total"] = round((time.perf_counter() - self._start) * 1000, 1)
+        LOGGER.info("Stage timings (ms): " + " ".join(f"{name}={ms}" for name, ms in timings.items()))
+        for name, ms in timings.items():
+            METRICS.observe("span_duration_ms", ms, span=f"{self.pipeline}.{name}")
+        emit_emf(timings, {"Pipeline": self.pipeline})
+        return timings
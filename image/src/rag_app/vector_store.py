@@ -0,0 +1,265 @@
+import heapq
+import json
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+# Add Parent Directory Programmatically
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_core.documents import Document
+
+from lib.metrics import METRICS
+from rag_app.get_chroma_db import VECTOR_BACKEND, get_chroma_collection, get_chroma_db, get_runtime_chroma_path
+from rag_app.shards import (
+    check_source_filter,
+    chunk_source,
+    map_shards,
+    read_shard_map,
+    shard_collection_name,
+    shard_dir,
+)
+
+from loguru import logger as LOGGER
+
+# Kept inside the Chroma directory, like the BM25 index, so it ships with it.
+NUMPY_STORE_DIR = "numpy_store"
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+VECTOR_STORE_INSTANCE = None  # Reference to singleton instance of the vector store
+_VECTOR_STORE_LOCK = threading.Lock()
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+class VectorStore(ABC):
+    """
+    What the query path needs from a vector backend. Scores are distances
+    (squared L2, lower is better), as Chroma returns them.
+    """
+
+    # Names of the index shards the store covers; None when the index is not sharded.
+    shards: Optional[List[str]] = None
+
+    def select_shards(self, shards: Optional[List[str]]) -> "VectorStore":
+        """
+        The store restricted to the given shards; the whole store when shards is empty.
+        Raises ShardFilterError (a ValueError) for shards the index does not have.
+        """
+        check_source_filter(shards, self.shards)
+        return self
+
+    def search(self, query_embedding: List[float], k: int) -> ScoredDocuments:
+        return self.search_batch([query_embedding], k)[0]
+
+    @abstractmethod
+    def search_batch(self, query_embeddings: List[List[float]], k: int) -> List[ScoredDocuments]:
+        """Top-k (document, distance) pairs for each query embedding, nearest first."""
+
+    @abstractmethod
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        """The documents with these chunk IDs; IDs not in the store are left out."""
+
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """The stored embeddings for these chunk IDs; IDs not in the store are left out."""
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, db):
+        self.db = db
+
+    def search(self, query_embedding: List[float], k: int) -> ScoredDocuments:
+        return self.db.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+
+    def search_batch(self, query_embeddings: List[List[float]], k: int) -> List[ScoredDocuments]:
+        # One multi-query Chroma call instead of one per vector.
+        results = self.db._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [
+                (Document(page_content=document, metadata=metadata or {}), distance)
+                for document, metadata, distance in zip(documents, metadatas, distances)
+            ]
+            for documents, metadatas, distances in zip(
+                results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        items = self.db.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(page_content=document, metadata=metadata or {})
+            for chunk_id, document, metadata in zip(items["ids"], items["documents"], items["metadatas"])
+        }
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        items = self.db._collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(items["ids"], items["embeddings"]))
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact search over all embeddings held in one float32 matrix, memory-mapped
+    from the .npy file written by export_numpy_store(). A batch of queries is a
+    single matmul followed by argpartition, with no HNSW index or SQLite behind it.
+    """
+
+    def __init__(self, path: str):
+        self.embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(path, CHUNKS_FILE)) as f:
+            chunks = json.load(f)
+        self.ids: List[str] = chunks["ids"]
+        self.documents: List[str] = chunks["documents"]
+        self.metadatas: List[dict] = chunks["metadatas"]
+        self.id_index = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        # ||x||^2 per row, so that ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2 needs one matmul.
+        self.squared_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+    def search_batch(self, query_embeddings: List[List[float]], k: int) -> List[ScoredDocuments]:
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        distances = (
+            self.squared_norms[np.newaxis, :]
+            - 2 * (queries @ self.embeddings.T)
+            + np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+        )
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        return [
+            [(self._document(i), float(distance)) for i, distance in zip(row, row_distances)]
+            for row, row_distances in zip(top, top_distances)
+        ]
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        return {chunk_id: self._document(self.id_index[chunk_id]) for chunk_id in ids if chunk_id in self.id_index}
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        return {chunk_id: self.embeddings[self.id_index[chunk_id]] for chunk_id in ids if chunk_id in self.id_index}
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self.documents[i], metadata=dict(self.metadatas[i]))
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    One store per index shard (see rag_app/shards.py). Searches fan out to the
+    shards in parallel and their top-k lists are merged by distance, which is
+    the same top-k a single store over all chunks returns. Lookups by ID go
+    only to the shard that holds the chunk's source file.
+    """
+
+    def __init__(self, stores: Dict[str, VectorStore], source_shards: Dict[str, str]):
+        self.stores = stores
+        self.shards = list(stores)
+        self.source_shards = source_shards  # Source file -> shard name
+
+    def select_shards(self, shards: Optional[List[str]]) -> VectorStore:
+        if not shards:
+            return self
+        check_source_filter(shards, self.shards)
+        return ShardedVectorStore({shard: self.stores[shard] for shard in shards}, self.source_shards)
+
+    def search_batch(self, query_embeddings: List[List[float]], k: int) -> List[ScoredDocuments]:
+        per_shard = map_shards(lambda store: store.search_batch(query_embeddings, k), list(self.stores.values()))
+        return [
+            heapq.nsmallest(k, chain.from_iterable(shard_results), key=lambda item: item[1])
+            for shard_results in zip(*per_shard)
+        ] or [[] for _ in query_embeddings]
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        documents = {}
+        for store, shard_ids in self._route(ids):
+            documents.update(store.get_documents(shard_ids))
+        return documents
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        embeddings = {}
+        for store, shard_ids in self._route(ids):
+            embeddings.update(store.get_embeddings(shard_ids))
+        return embeddings
+
+    def _route(self, ids: List[str]) -> List[Tuple[VectorStore, List[str]]]:
+        grouped: Dict[str, List[str]] = {}
+        for chunk_id in ids:
+            shard = self.source_shards.get(chunk_source(chunk_id))
+            if shard in self.stores:
+                grouped.setdefault(shard, []).append(chunk_id)
+        return [(self.stores[shard], shard_ids) for shard, shard_ids in grouped.items()]
+
+
+def get_vector_store() -> VectorStore:
+    global VECTOR_STORE_INSTANCE
+    if not VECTOR_STORE_INSTANCE:
+        with _VECTOR_STORE_LOCK:
+            if not VECTOR_STORE_INSTANCE:
+                with METRICS.span("get_vector_store.init"):
+                    if VECTOR_BACKEND == "chroma":
+                        # Opening the DB first finishes any copy to /tmp, which decides the runtime path.
+                        get_chroma_db()
+                    shard_map = read_shard_map(get_runtime_chroma_path())
+                    if shard_map:
+                        VECTOR_STORE_INSTANCE = open_sharded_vector_store(shard_map)
+                    else:
+                        VECTOR_STORE_INSTANCE = open_vector_store(get_runtime_chroma_path())
+    return VECTOR_STORE_INSTANCE
+
+
+def open_vector_store(path: str, collection_name: str = None) -> VectorStore:
+    """The VECTOR_BACKEND store over the index files in path, i.e. the whole index's or one shard's."""
+    if VECTOR_BACKEND == "compact":
+        from rag_app.compact_index import COMPACT_INDEX_FILE, CompactVectorStore
+
+        path = os.path.join(path, COMPACT_INDEX_FILE)
+        store = CompactVectorStore(path)
+        LOGGER.info(f"Init CompactVectorStore from {path}: {store.count} chunks")
+        return store
+    elif VECTOR_BACKEND == "numpy":
+        path = os.path.join(path, NUMPY_STORE_DIR)
+        store = NumpyVectorStore(path)
+        LOGGER.info(f"Init NumpyVectorStore from {path}: {len(store.ids)} chunks")
+        return store
+    elif collection_name:
+        return ChromaVectorStore(get_chroma_collection(collection_name))
+    return ChromaVectorStore(get_chroma_db())
+
+
+def open_sharded_vector_store(shard_map: dict) -> ShardedVectorStore:
+    chroma_path = get_runtime_chroma_path()
+    stores = {
+        shard: open_vector_store(shard_dir(chroma_path, shard), shard_collection_name(shard))
+        for shard in shard_map["shards"]
+    }
+    source_shards = {source: shard for shard, sources in shard_map["shards"].items() for source in sources}
+    LOGGER.info(f"Init ShardedVectorStore ({shard_map['shard_by']}): {len(stores)} shards")
+    return ShardedVectorStore(stores, source_shards)
+
+
+def export_numpy_store(path: str, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+    """Writes the files NumpyVectorStore loads. Each file is replaced atomically."""
+    os.makedirs(path, exist_ok=True)
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), np.float32)
+
+    tmp_path = os.path.join(path, f"{EMBEDDINGS_FILE}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, os.path.join(path, EMBEDDINGS_FILE))
+
+    tmp_path = os.path.join(path, f"{CHUNKS_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+    os.replace(tmp_path, os.path.join(path, CHUNKS_FILE))
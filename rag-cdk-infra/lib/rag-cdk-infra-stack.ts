@@ -8,7 +8,9 @@ import {
   FunctionUrlAuthType,
   Architecture,
 } from "aws-cdk-lib/aws-lambda";
+import { SqsEventSource } from "aws-cdk-lib/aws-lambda-event-sources";
 import { ManagedPolicy } from "aws-cdk-lib/aws-iam";
+import { Queue } from "aws-cdk-lib/aws-sqs";
 
 export class RagCdkInfraStack extends cdk.Stack {
   constructor(scope: Construct, id: string, props?: cdk.StackProps) {
@@ -46,6 +48,36 @@ export class RagCdkInfraStack extends cdk.Stack {
       },
     });
 
+    // Queries reach the worker through SQS (see image/src/lib/job_queue.py). Interactive
+    // and bulk jobs get separate queues, each with a cap on concurrent worker invocations,
+    // so bursts queue up instead of fanning out into Bedrock throttling, and bulk work
+    // cannot take the capacity interactive queries need.
+    const jobDeadLetterQueue = new Queue(this, "RagJobDeadLetterQueue", {
+      retentionPeriod: cdk.Duration.days(14),
+    });
+    const jobQueueProps = {
+      visibilityTimeout: cdk.Duration.seconds(360), // 6x the worker timeout.
+      deadLetterQueue: { queue: jobDeadLetterQueue, maxReceiveCount: 5 }, // JOB_MAX_ATTEMPTS.
+    };
+    const interactiveJobQueue = new Queue(this, "RagInteractiveJobQueue", jobQueueProps);
+    const bulkJobQueue = new Queue(this, "RagBulkJobQueue", jobQueueProps);
+
+    workerFunction.addEventSource(
+      new SqsEventSource(interactiveJobQueue, {
+        batchSize: 5,
+        maxConcurrency: 8,
+        reportBatchItemFailures: true,
+      })
+    );
+    workerFunction.addEventSource(
+      new SqsEventSource(bulkJobQueue, {
+        batchSize: 10,
+        maxBatchingWindow: cdk.Duration.seconds(5),
+        maxConcurrency: 2,
+        reportBatchItemFailures: true,
+      })
+    );
+
     // Function to handle the API requests. Uses same base image, but different handler.
     const apiImageCode = DockerImageCode.fromImageAsset("../image", {
       cmd: ["app_api_handler.handler"],
@@ -62,6 +94,9 @@ export class RagCdkInfraStack extends cdk.Stack {
       environment: {
         TABLE_NAME: ragQueryTable.tableName,
         WORKER_LAMBDA_NAME: workerFunction.functionName,
+        JOB_QUEUE_BACKEND: "sqs",
+        JOB_QUEUE_URL: interactiveJobQueue.queueUrl,
+        JOB_QUEUE_BULK_URL: bulkJobQueue.queueUrl,
       },
     });
 
@@ -74,6 +109,8 @@ export class RagCdkInfraStack extends cdk.Stack {
     ragQueryTable.grantReadWriteData(workerFunction);
     ragQueryTable.grantReadWriteData(apiFunction);
     workerFunction.grantInvoke(apiFunction);
+    interactiveJobQueue.grantSendMessages(apiFunction);
+    bulkJobQueue.grantSendMessages(apiFunction);
     workerFunction.role?.addManagedPolicy(
       ManagedPolicy.fromAwsManagedPolicyName("AmazonBedrockFullAccess")
     );
@@ -0,0 +1,38 @@
+from image.src.rag_app.answer_cache import AnswerCache
+from image.src.rag_app.query_rag import QueryResponse
+
+
+def make_response(text="$4,820"):
+    return QueryResponse(query_text="how much does a landing page cost?", response_text=text, sources=["a:1:0"])
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = AnswerCache(max_size=8, ttl_seconds=60, similarity_threshold=0.95)
+    cache.store("how much does a landing page cost?", [1.0, 0.0, 0.0], "v1", make_response())
+
+    exact = cache.lookup("How much does a  landing page cost?", [0.0, 1.0, 0.0], "v1")
+    near = cache.lookup("landing page price?", [0.99, 0.05, 0.0], "v1")
+    far = cache.lookup("monopoly starting money?", [0.0, 0.0, 1.0], "v1")
+
+    assert exact.response_text == "$4,820"
+    assert exact.query_text == "How much does a  landing page cost?"
+    assert near.response_text == "$4,820"
+    assert far is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_only_exact_repeats_hit_without_a_similarity_threshold():
+    cache = AnswerCache(max_size=8, ttl_seconds=60, similarity_threshold=None)
+    cache.store("how much does a landing page cost?", [1.0, 0.0, 0.0], "v1", make_response())
+
+    assert cache.lookup("How much does a landing page cost?", [0.0, 1.0, 0.0], "v1").response_text == "$4,820"
+    assert cache.lookup("how much does an e-commerce site cost?", [1.0, 0.0, 0.0], "v1") is None
+    assert cache.stats()["semantic_hits"] == 0
+
+
+def test_index_version_change_invalidates():
+    cache = AnswerCache(max_size=8, ttl_seconds=60, similarity_threshold=0.95)
+    cache.store("question", [1.0, 0.0], "v1", make_response())
+
+    assert cache.lookup("question", [1.0, 0.0], "v2") is None
+    assert cache.lookup("question", [1.0, 0.0], "v1") is None
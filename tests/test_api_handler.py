@@ -0,0 +1,401 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from image.src.lib import common  # noqa: F401 - puts image/src on sys.path for app_api_handler's imports.
+from image.src import app_api_handler
+from image.src.lib.local_aws import LocalDynamoDBClient
+
+os.environ.setdefault("WORKER_PRELOAD", "false")  # Nothing to preload against in tests.
+import app_work_handler  # noqa: E402
+from lib import job_queue  # noqa: E402
+import query_model  # noqa: E402 - the module app_api_handler uses, imported through that path.
+from query_model import QueryModel  # noqa: E402
+from rag_app import query_rag  # noqa: E402
+from rag_app.shards import ShardFilterError, write_shard_map  # noqa: E402
+
+
+class CountingDynamoDBClient(LocalDynamoDBClient):
+    def __init__(self):
+        # Same key schema as the table and index in rag-cdk-infra.
+        super().__init__("query_id", {"queries_by_user_id": ("user_id", "create_time")}, latency_ms=0)
+        self.get_item_calls = 0
+
+    def get_item(self, **kwargs):
+        self.get_item_calls += 1
+        return super().get_item(**kwargs)
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    client = CountingDynamoDBClient()
+    monkeypatch.setattr(query_model, "get_dynamodb_client", lambda: client)
+    app_api_handler.COMPLETED_QUERY_CACHE.clear()
+    return client
+
+
+@pytest.fixture
+def api(dynamodb):
+    with TestClient(app_api_handler.app) as client:
+        yield client
+
+
+def test_get_query_not_found(api):
+    assert api.get("/get_query", params={"query_id": "missing"}).status_code == 404
+
+
+def test_get_query_etag_and_304(api):
+    QueryModel(query_id="q1", query_text="Q?").put_item()
+
+    first = api.get("/get_query", params={"query_id": "q1"})
+    assert first.status_code == 200
+    assert first.json()["query_id"] == "q1"
+    etag = first.headers["ETag"]
+
+    revalidated = api.get("/get_query", params={"query_id": "q1"}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+    QueryModel(query_id="q1", query_text="Q?", answer_text="A.", is_complete=True).put_item()
+    changed = api.get("/get_query", params={"query_id": "q1"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_only_completed_queries_are_cached(api, dynamodb):
+    QueryModel(query_id="pending", query_text="Q?").put_item()
+    QueryModel(query_id="done", query_text="Q?", answer_text="A.", is_complete=True).put_item()
+
+    for _ in range(3):
+        api.get("/get_query", params={"query_id": "pending"})
+    assert dynamodb.get_item_calls == 3
+
+    for _ in range(3):
+        assert api.get("/get_query", params={"query_id": "done"}).json()["answer_text"] == "A."
+    assert dynamodb.get_item_calls == 4
+
+
+def test_long_poll_returns_when_the_query_completes(api):
+    QueryModel(query_id="q1", query_text="Q?").put_item()
+    completer = threading.Timer(
+        0.3, lambda: QueryModel(query_id="q1", query_text="Q?", answer_text="A.", is_complete=True).put_item()
+    )
+    completer.start()
+
+    start = time.monotonic()
+    response = api.get("/get_query", params={"query_id": "q1", "wait_seconds": 10})
+    completer.join()
+
+    assert response.json()["is_complete"]
+    assert time.monotonic() - start < 5
+
+
+def test_long_poll_is_capped(api, monkeypatch):
+    monkeypatch.setattr(app_api_handler, "LONG_POLL_MAX_SECONDS", 0.5)
+    QueryModel(query_id="q1", query_text="Q?").put_item()
+
+    start = time.monotonic()
+    response = api.get("/get_query", params={"query_id": "q1", "wait_seconds": 60})
+
+    assert not response.json()["is_complete"]
+    assert time.monotonic() - start < 2
+
+
+def test_long_poll_survives_a_failed_reread(api, dynamodb, monkeypatch):
+    from botocore.exceptions import ClientError
+
+    QueryModel(query_id="q1", query_text="Q?").put_item()
+    get_item = dynamodb.get_item
+    reads = []
+
+    def flaky_get_item(**kwargs):
+        # The first re-read fails; the query completes before the second.
+        reads.append(kwargs)
+        if len(reads) == 2:
+            raise ClientError({"Error": {"Code": "InternalServerError", "Message": "boom"}}, "GetItem")
+        if len(reads) == 3:
+            QueryModel(query_id="q1", query_text="Q?", answer_text="A.", is_complete=True).put_item()
+        return get_item(**kwargs)
+
+    monkeypatch.setattr(dynamodb, "get_item", flaky_get_item)
+    response = api.get("/get_query", params={"query_id": "q1", "wait_seconds": 10})
+
+    assert response.status_code == 200
+    assert response.json()["answer_text"] == "A."
+    assert len(reads) == 3
+
+
+def put_user_queries(user_id: str, count: int):
+    for i in range(count):
+        QueryModel(
+            query_id=f"{user_id}-{i}", user_id=user_id, create_time=100 + i, query_text=f"Q{i}?", answer_text="A."
+        ).put_item()
+
+
+def test_list_query_follows_the_cursor_to_the_last_page(api):
+    put_user_queries("u1", 5)
+    put_user_queries("u2", 2)
+
+    pages = []
+    params = {"user_id": "u1", "limit": 2}
+    while True:
+        response = api.get("/list_query", params=params)
+        assert response.status_code == 200
+        pages.append([item["query_id"] for item in response.json()])
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert pages == [["u1-4", "u1-3"], ["u1-2", "u1-1"], ["u1-0"]]
+
+
+def test_list_query_summary_projection(api):
+    put_user_queries("u1", 1)
+
+    full = api.get("/list_query", params={"user_id": "u1"}).json()
+    summary = api.get("/list_query", params={"user_id": "u1", "summary": "true"}).json()
+
+    assert full[0]["answer_text"] == "A."
+    assert summary == [{"query_id": "u1-0", "create_time": 100, "query_text": "Q0?", "is_complete": False}]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "WzFd", "eyJ1c2VyX2lkIjogInUxIn0="])
+def test_list_query_rejects_a_malformed_cursor(api, cursor):
+    # Garbage, a JSON list, and a JSON object without the table key.
+    response = api.get("/list_query", params={"user_id": "u1", "cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, 101])
+def test_list_query_limit_bounds(api, limit):
+    assert api.get("/list_query", params={"user_id": "u1", "limit": limit}).status_code == 422
+
+
+def test_stream_stores_the_pending_query_before_streaming(api, dynamodb, monkeypatch):
+    seen_while_streaming = []
+
+    async def fake_query_rag_stream(query_text, source_filter=None):
+        [stored] = [item for table in dynamodb.tables.values() for item in table.values()]
+        seen_while_streaming.append(QueryModel.from_ddb_attributes(stored))
+        yield "Two "
+        yield "weeks."
+        yield query_rag.QueryResponse(
+            query_text=query_text, response_text="Two weeks.", sources=["a.pdf:0:0"], timings={}
+        )
+
+    monkeypatch.setattr(query_rag, "query_rag_stream", fake_query_rag_stream)
+
+    response = api.post("/submit_query_stream", json={"query_text": "How long?"})
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+
+    assert [event for event, _data in events] == ["query", "token", "token", "done"]
+    query_id = events[0][1]["query_id"]
+    assert [(query.query_id, query.is_complete) for query in seen_while_streaming] == [(query_id, False)]
+    stored = api.get("/get_query", params={"query_id": query_id}).json()
+    assert stored["is_complete"] and stored["answer_text"] == "Two weeks."
+
+
+def test_stream_stores_a_failed_query_as_complete(api, dynamodb, monkeypatch):
+    async def failing_query_rag_stream(query_text, source_filter=None):
+        yield "Two "
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(query_rag, "query_rag_stream", failing_query_rag_stream)
+
+    response = api.post("/submit_query_stream", json={"query_text": "How long?"})
+    events = [block.split("\n")[0].removeprefix("event: ") for block in response.text.strip().split("\n\n")]
+
+    assert events == ["query", "token", "error"]
+    [stored] = stored_queries(dynamodb)
+    assert stored.is_complete and stored.answer_text is None
+    assert stored.error == "model unavailable"
+
+
+def stored_queries(dynamodb) -> list[QueryModel]:
+    return [QueryModel.from_ddb_attributes(item) for table in dynamodb.tables.values() for item in table.values()]
+
+
+def test_source_filter_on_an_unsharded_index_is_rejected(api, dynamodb, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_api_handler, "CHROMA_PATH", str(tmp_path))
+
+    response = api.post("/submit_query", json={"query_text": "Q?", "source_filter": ["a"]})
+
+    assert response.status_code == 400
+    assert "not sharded" in response.json()["detail"]
+    assert stored_queries(dynamodb) == []
+
+
+def test_source_filter_is_checked_against_the_shard_map(api, dynamodb, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_api_handler, "CHROMA_PATH", str(tmp_path))
+    write_shard_map(str(tmp_path), "source", {"a": ["a.pdf"], "b": ["b.pdf"]})
+
+    async def fake_query_rag_async(query_text, source_filter=None):
+        return query_rag.QueryResponse(
+            query_text=query_text, response_text=f"From {source_filter}.", sources=[], timings={}
+        )
+
+    monkeypatch.setattr(query_rag, "query_rag_async", fake_query_rag_async)
+
+    queries = [{"query_text": "Q1?", "source_filter": ["a"]}, {"query_text": "Q2?", "source_filter": ["a", "c"]}]
+    rejected = api.post("/submit_queries", json={"queries": queries})
+    assert rejected.status_code == 400
+    assert "['c']" in rejected.json()["detail"]
+    assert stored_queries(dynamodb) == []
+
+    accepted = api.post("/submit_query", json={"query_text": "Q?", "source_filter": ["b"]})
+    assert accepted.status_code == 200
+    assert accepted.json()["answer_text"] == "From ['b']."
+
+
+def sqs_record(query: QueryModel) -> dict:
+    return {"messageId": f"m-{query.query_id}", "body": query.model_dump_json()}
+
+
+def test_shard_filter_errors_complete_the_query_instead_of_retrying(dynamodb, monkeypatch):
+    def fake_query_rag_batch(query_texts, return_exceptions=False, source_filters=None):
+        return [
+            ShardFilterError(f"Unknown index shards {source_filter}") if source_filter == ["gone"]
+            else query_rag.QueryResponse(query_text=text, response_text="A.", sources=[], timings={})
+            for text, source_filter in zip(query_texts, source_filters)
+        ]
+
+    monkeypatch.setattr(app_work_handler, "query_rag_batch", fake_query_rag_batch)
+    good = QueryModel(query_id="good", query_text="Q?")
+    gone = QueryModel(query_id="gone", query_text="Q?", source_filter=["gone"])
+
+    assert app_work_handler.handle_sqs_records([sqs_record(good), sqs_record(gone)]) == {"batchItemFailures": []}
+
+    stored = {query.query_id: query for query in stored_queries(dynamodb)}
+    assert stored["good"].is_complete and stored["good"].answer_text == "A."
+    assert stored["gone"].is_complete and stored["gone"].answer_text is None
+    assert "gone" in stored["gone"].error
+
+
+def fake_query_rag_batch(calls: list, failing: str = None):
+    """A query_rag_batch() that answers each query with its text and filter, or raises for failing."""
+
+    def query_rag_batch(query_texts, return_exceptions=False, source_filters=None):
+        calls.append((list(query_texts), source_filters))
+        responses = []
+        for text, source_filter in zip(query_texts, source_filters or [None] * len(query_texts)):
+            if text == failing:
+                error = RuntimeError(f"failed: {text}")
+                if not return_exceptions:
+                    raise error
+                responses.append(error)
+            else:
+                responses.append(
+                    query_rag.QueryResponse(
+                        query_text=text, response_text=f"{text} {source_filter}", sources=[], timings={}
+                    )
+                )
+        return responses
+
+    return query_rag_batch
+
+
+def test_submit_queries_answers_the_batch_in_one_call(api, dynamodb, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_api_handler, "CHROMA_PATH", str(tmp_path))
+    write_shard_map(str(tmp_path), "source", {"a": ["a.pdf"]})
+    calls = []
+    monkeypatch.setattr(query_rag, "query_rag_batch", fake_query_rag_batch(calls))
+
+    queries = [{"query_text": "Q1", "user_id": "u1"}, {"query_text": "Q2", "source_filter": ["a"]}]
+    response = api.post("/submit_queries", json={"queries": queries})
+
+    assert response.status_code == 200
+    assert calls == [(["Q1", "Q2"], [None, ["a"]])]
+    answers = [(query["query_text"], query["answer_text"], query["is_complete"]) for query in response.json()]
+    assert answers == [("Q1", "Q1 None", True), ("Q2", "Q2 ['a']", True)]
+    assert sorted((query.query_id, query.answer_text) for query in stored_queries(dynamodb)) == sorted(
+        (query["query_id"], query["answer_text"]) for query in response.json()
+    )
+
+
+def test_submit_queries_rejects_a_batch_over_the_limit(api, dynamodb):
+    queries = [{"query_text": f"Q{i}"} for i in range(app_api_handler.BATCH_LIMIT + 1)]
+    assert api.post("/submit_queries", json={"queries": queries}).status_code == 400
+    assert stored_queries(dynamodb) == []
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.payloads = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.payloads.append(json.loads(Payload))
+        return {"StatusCode": 202}
+
+
+def test_submit_queries_with_a_worker_sends_one_batch_payload(api, dynamodb, monkeypatch):
+    lambda_client = FakeLambdaClient()
+    monkeypatch.setattr(job_queue, "get_lambda_client", lambda: lambda_client)
+    monkeypatch.setattr(app_api_handler, "USE_WORKER", True)
+    monkeypatch.setattr(app_api_handler, "get_job_queue", lambda: job_queue.LambdaJobQueue("worker"))
+    calls = []
+    monkeypatch.setattr(app_work_handler, "query_rag_batch", fake_query_rag_batch(calls))
+
+    response = api.post("/submit_queries", json={"queries": [{"query_text": "Q1"}, {"query_text": "Q2"}]})
+    assert response.status_code == 200
+    assert all(not query.is_complete for query in stored_queries(dynamodb))
+
+    # The worker Lambda gets the whole batch in one {"queries": [...]} event.
+    [payload] = lambda_client.payloads
+    assert [query["query_text"] for query in payload["queries"]] == ["Q1", "Q2"]
+    app_work_handler.handler(payload, None)
+
+    assert calls == [(["Q1", "Q2"], [None, None])]
+    assert sorted((query.answer_text, query.is_complete) for query in stored_queries(dynamodb)) == [
+        ("Q1 None", True), ("Q2 None", True),
+    ]
+
+
+def test_sqs_batch_reports_only_the_failed_query(dynamodb, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_work_handler, "query_rag_batch", fake_query_rag_batch(calls, failing="Q2"))
+    queries = [QueryModel(query_id=f"q{i}", query_text=f"Q{i}") for i in (1, 2, 3)]
+    QueryModel.put_items(queries)
+
+    result = app_work_handler.handle_sqs_records([sqs_record(query) for query in queries])
+
+    assert len(calls) == 1
+    assert result == {"batchItemFailures": [{"itemIdentifier": "m-q2"}]}
+    stored = {query.query_id: query for query in stored_queries(dynamodb)}
+    assert stored["q1"].is_complete and stored["q3"].is_complete
+    # Left pending, for the retry.
+    assert not stored["q2"].is_complete and stored["q2"].answer_text is None
+
+
+def test_query_rag_batch_groups_queries_by_source_filter(monkeypatch):
+    calls = []
+
+    def fake_batch(query_texts, return_exceptions=False, source_filter=None):
+        calls.append((query_texts, source_filter))
+        if source_filter == ["bad"]:
+            raise ShardFilterError("Unknown index shards ['bad']")
+        return [f"{text} {source_filter}" for text in query_texts]
+
+    monkeypatch.setattr(query_rag, "_query_rag_batch", fake_batch)
+    texts = ["Q1", "Q2", "Q3", "Q4", "Q5"]
+
+    responses = query_rag.query_rag_batch(
+        texts, return_exceptions=True, source_filters=[None, ["b", "a"], ["bad"], ["a", "b"], None]
+    )
+
+    # One call per distinct filter (in any order), and the answers back in query order.
+    assert sorted(calls, key=str) == sorted(
+        [(["Q1", "Q5"], None), (["Q2", "Q4"], ["a", "b"]), (["Q3"], ["bad"])], key=str
+    )
+    assert responses[:2] == ["Q1 None", "Q2 ['a', 'b']"]
+    assert isinstance(responses[2], ShardFilterError)
+    assert responses[3:] == ["Q4 ['a', 'b']", "Q5 None"]
+    with pytest.raises(ShardFilterError):
+        query_rag.query_rag_batch(texts, source_filters=[None, None, ["bad"], None, None])
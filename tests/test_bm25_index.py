@@ -0,0 +1,26 @@
+from image.src.rag_app.bm25_index import BM25Index, build_bm25_index
+from image.src.rag_app.retrieval import reciprocal_rank_fusion
+
+
+def test_search_ranks_exact_terms(tmp_path):
+    path = str(tmp_path / "bm25.idx")
+    build_bm25_index(
+        path,
+        ["a:0:0", "a:0:1", "b:3:0"],
+        [
+            "A landing page costs $4,820 and takes two weeks.",
+            "An e-commerce system takes twelve weeks to build.",
+            "Each player starts the game with $1,500 in Monopoly money.",
+        ],
+    )
+    index = BM25Index(path)
+
+    assert index.search("how much is $4,820?", 3) == [("a:0:0", index.search("$4,820", 1)[0][1])]
+    assert [chunk_id for chunk_id, _ in index.search("monopoly money", 3)] == ["b:3:0"]
+    assert index.search("unrelated words", 3) == []
+
+
+def test_reciprocal_rank_fusion_prefers_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]])
+
+    assert [chunk_id for chunk_id, _ in fused] == ["y", "x", "w", "z"]
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from image.src.rag_app.compact_index import CompactVectorStore, export_compact_index
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_round_trip_and_search(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(40, 16)).astype(np.float32)
+    ids = [f"data/a.pdf:{i // 4}:{i % 4}" for i in range(40)]
+    documents = [f"chunk {i} – ünïcode text " * (i % 3 + 1) for i in range(40)]
+    metadatas = [{"source": "data/a.pdf", "page": i // 4, "id": ids[i]} for i in range(40)]
+    path = str(tmp_path / "compact.idx")
+    export_compact_index(path, ids, embeddings, documents, metadatas, dtype=dtype)
+
+    store = CompactVectorStore(path)
+    results = store.search_batch(embeddings[[5, 33]].tolist(), 3)
+
+    assert [doc.metadata["id"] for doc, _ in results[0]][0] == ids[5]
+    assert [doc.metadata["id"] for doc, _ in results[1]][0] == ids[33]
+    assert store.get_documents([ids[37]])[ids[37]].page_content == documents[37]
+    assert store.get_documents([ids[37]])[ids[37]].metadata == metadatas[37]
+    np.testing.assert_allclose(store.get_embeddings([ids[2]])[ids[2]], embeddings[2], atol=0.05)
@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from image.src.rag_app.context_builder import build_context, estimate_tokens
+
+
+def chunk(chunk_id, text):
+    source, page, _index = chunk_id.rsplit(":", 2)
+    return Document(page_content=text, metadata={"id": chunk_id, "source": source, "page": int(page)}), 0.0
+
+
+def test_merges_adjacent_chunks_and_drops_overlap():
+    results = [
+        chunk("a.pdf:1:1", "Bank pays salaries. The Bank collects all taxes and fines."),
+        chunk("a.pdf:1:0", "Each player is given $1,500. The Bank pays salaries."),
+        chunk("b.pdf:0:0", "Each player is given $1,500. The Bank pays salaries."),
+    ]
+
+    context, used = build_context(results, token_budget=1000)
+
+    assert context == "Each player is given $1,500. The Bank pays salaries. The Bank collects all taxes and fines."
+    assert [doc.metadata["id"] for doc, _score in used] == ["a.pdf:1:0", "a.pdf:1:1"]
+
+
+def test_enforces_token_budget():
+    results = [chunk(f"a.pdf:{page}:0", f"page {page} " + "word " * 200) for page in range(5)]
+
+    context, used = build_context(results, token_budget=300)
+
+    assert estimate_tokens(context) <= 300
+    assert len(used) == 2
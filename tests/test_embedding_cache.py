@@ -0,0 +1,53 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from image.src.rag_app.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return [float(len(text)), 0.0]
+
+
+def test_memory_cache_hits_on_normalized_text():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, model_id="test-model", disk_path=None)
+
+    first = cached.embed_query("how much does a landing page cost?")
+    second = cached.embed_query("  how much  does a landing page cost? ")
+
+    assert first == second
+    assert inner.calls == 1
+    assert cached.stats()["hits"] == 1
+    assert cached.stats()["misses"] == 1
+
+
+def test_query_and_document_embeddings_are_cached_separately():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, model_id="test-model", disk_path=None)
+
+    assert cached.embed_query("monopoly") != cached.embed_documents(["monopoly"])[0]
+    assert inner.calls == 2
+
+
+def test_disk_cache_survives_new_instance(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, model_id="test-model", disk_path=path).embed_documents(["a", "bb", "a"])
+    assert inner.calls == 2
+
+    warm = CachedEmbeddings(inner, model_id="test-model", disk_path=path)
+    vectors = warm.embed_documents(["bb", "a"])
+
+    assert vectors == [[2.0, 1.0], [1.0, 1.0]]
+    assert inner.calls == 2
+    assert warm.stats()["disk_hits"] == 2
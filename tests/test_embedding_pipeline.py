@@ -0,0 +1,163 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+from langchain_core.documents import Document
+
+from image.src.rag_app import embedding_pipeline
+from image.src.rag_app.embedding_pipeline import (
+    EMBED_BACKOFF_BASE_SECONDS,
+    IngestStats,
+    embed_and_write,
+    embed_with_retry,
+    is_throttling_error,
+)
+
+
+def throttling_error():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeModel")
+
+
+class FlakyEmbeddings:
+    def __init__(self, failures: int, error=None):
+        self.failures = failures
+        self.error = error or throttling_error()
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(embedding_pipeline.time, "sleep", delays.append)
+    return delays
+
+
+def test_retries_throttling_with_jittered_backoff(sleeps):
+    embeddings = FlakyEmbeddings(failures=3)
+    stats = IngestStats()
+
+    assert embed_with_retry(embeddings, ["ab", "c"], max_retries=5, stats=stats) == [[2.0], [1.0]]
+    assert embeddings.calls == 4
+    assert stats.retries == 3
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= EMBED_BACKOFF_BASE_SECONDS * 2 ** attempt
+
+
+def test_reraises_after_the_retry_limit(sleeps):
+    embeddings = FlakyEmbeddings(failures=100)
+
+    with pytest.raises(ClientError):
+        embed_with_retry(embeddings, ["a"], max_retries=2)
+    assert embeddings.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_other_errors_are_not_retried(sleeps):
+    embeddings = FlakyEmbeddings(failures=1, error=ValueError("Malformed input request"))
+
+    with pytest.raises(ValueError):
+        embed_with_retry(embeddings, ["a"], max_retries=5)
+    assert embeddings.calls == 1
+    assert sleeps == []
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(throttling_error())
+    assert is_throttling_error(ValueError("Error raised by inference endpoint: ThrottlingException: slow down"))
+    assert is_throttling_error(ValueError("Too many requests, please wait before trying again."))
+    assert not is_throttling_error(
+        ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "InvokeModel")
+    )
+    assert not is_throttling_error(RuntimeError("connection reset"))
+
+
+class FakeCollection:
+    def __init__(self, max_batch_size=None):
+        self._client = SimpleNamespace(max_batch_size=max_batch_size)
+        self.upserts = []
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.upserts.append(ids)
+
+
+class BlockingEmbeddings:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.started += 1
+        self.release.wait(5)
+        return [[0.0] for _ in texts]
+
+
+def test_embed_and_write_bounds_batches_in_flight():
+    batch_size, max_workers = 2, 2
+    consumed = []
+
+    def chunks():
+        for i in range(40):
+            consumed.append(i)
+            yield Document(page_content=f"chunk {i}", metadata={"id": f"a.pdf:0:{i}"})
+
+    collection = FakeCollection(max_batch_size=5)
+    embeddings = BlockingEmbeddings()
+    worker = threading.Thread(
+        target=embed_and_write,
+        args=(SimpleNamespace(_collection=collection), chunks(), embeddings),
+        kwargs=dict(batch_size=batch_size, max_workers=max_workers, write_batch_size=100),
+    )
+    worker.start()
+    deadline = time.monotonic() + 5
+    while embeddings.started < max_workers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+
+    # 2 * max_workers batches submitted, plus the one waiting for a slot.
+    assert len(consumed) <= (2 * max_workers + 1) * batch_size
+    embeddings.release.set()
+    worker.join(5)
+
+    written = [chunk_id for ids in collection.upserts for chunk_id in ids]
+    assert sorted(written) == sorted(f"a.pdf:0:{i}" for i in range(40))
+    # Writes are capped at the client's max_batch_size.
+    assert max(len(ids) for ids in collection.upserts) <= 5
+
+
+class FailOnceEmbeddings:
+    """Throttles the first call for every batch, from any number of threads."""
+
+    def __init__(self):
+        self.seen = set()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            first_call = tuple(texts) not in self.seen
+            self.seen.add(tuple(texts))
+        if first_call:
+            raise throttling_error()
+        return [[0.0] for _ in texts]
+
+
+def test_embed_and_write_counts_retries_from_every_worker(sleeps):
+    chunks = [Document(page_content=f"chunk {i}", metadata={"id": f"a.pdf:0:{i}"}) for i in range(64)]
+
+    stats = embed_and_write(
+        SimpleNamespace(_collection=FakeCollection()), chunks, FailOnceEmbeddings(), batch_size=2, max_workers=8
+    )
+
+    assert stats.batches == 32
+    assert stats.retries == 32
+    assert stats.chunks == 64
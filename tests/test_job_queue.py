@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+
+import pytest
+
+from image.src.lib import job_queue
+from image.src.lib.job_queue import BULK, INTERACTIVE, LocalJobQueue, QueueFullError
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_interactive_jobs_run_before_bulk():
+    batches = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(event, context):
+        started.set()
+        release.wait()
+        batches.append([json.loads(record["body"])["id"] for record in event["Records"]])
+        return {"batchItemFailures": []}
+
+    queue = LocalJobQueue(concurrency=1, batch_size=2, handler=handler)
+    queue.submit([{"id": "first"}], INTERACTIVE)
+    started.wait(5)  # The only worker is now busy with "first".
+    queue.submit([{"id": "bulk-1"}, {"id": "bulk-2"}], BULK)
+    queue.submit([{"id": "interactive"}], INTERACTIVE)
+    release.set()
+
+    wait_for(lambda: queue.depth() == 0)
+    assert batches[0] == ["first"]
+    assert batches[1][0] == "interactive"
+    assert sorted(sum(batches, [])) == ["bulk-1", "bulk-2", "first", "interactive"]
+
+
+def test_failed_jobs_retry_then_go_dead(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_SECONDS", 0.01)
+    attempts = []
+
+    def handler(event, context):
+        attempts.extend(record["attributes"]["ApproximateReceiveCount"] for record in event["Records"])
+        return {"batchItemFailures": [{"itemIdentifier": record["messageId"]} for record in event["Records"]]}
+
+    queue = LocalJobQueue(concurrency=1, max_attempts=3, handler=handler)
+    queue.submit([{"id": "q"}], INTERACTIVE)
+
+    wait_for(lambda: queue.depth() == 0)
+    assert attempts == ["1", "2", "3"]
+    assert queue.dead_jobs() == [{"id": "q"}]
+
+
+def test_admission_defers_bulk_then_rejects(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_MAX_DEPTH", 4)
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_BULK_DEFER_DEPTH", 2)
+    queue = LocalJobQueue(concurrency=0)
+    queue.submit([{"id": "a"}, {"id": "b"}], INTERACTIVE)
+
+    assert queue.admit(INTERACTIVE, 1) == 0
+    assert queue.admit(BULK, 1) == job_queue.JOB_QUEUE_DEFER_SECONDS
+    with pytest.raises(QueueFullError):
+        queue.admit(INTERACTIVE, 3)
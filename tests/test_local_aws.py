@@ -0,0 +1,34 @@
+from image.src.lib.local_aws import LocalDynamoDBClient
+
+
+def item(query_id, create_time, user_id="u1"):
+    return {
+        "query_id": {"S": query_id},
+        "user_id": {"S": user_id},
+        "create_time": {"N": str(create_time)},
+        "query_text": {"S": f"question {query_id}"},
+    }
+
+
+def test_query_pages_newest_first():
+    client = LocalDynamoDBClient("query_id", {"by_user": ("user_id", "create_time")}, latency_ms=0)
+    client.batch_write_item(
+        RequestItems={"t": [{"PutRequest": {"Item": item(f"q{i}", 100 + i)}} for i in range(5)]}
+    )
+    client.put_item(TableName="t", Item=item("other", 200, user_id="u2"))
+    kwargs = dict(
+        TableName="t",
+        IndexName="by_user",
+        KeyConditionExpression="user_id = :user_id",
+        ExpressionAttributeValues={":user_id": {"S": "u1"}},
+        Limit=3,
+        ScanIndexForward=False,
+    )
+
+    first = client.query(**kwargs)
+    second = client.query(**kwargs, ExclusiveStartKey=first["LastEvaluatedKey"], ProjectionExpression="query_id")
+
+    assert [i["query_id"]["S"] for i in first["Items"]] == ["q4", "q3", "q2"]
+    assert second["Items"] == [{"query_id": {"S": "q1"}}, {"query_id": {"S": "q0"}}]
+    assert "LastEvaluatedKey" not in second
+    assert client.get_item(TableName="t", Key={"query_id": {"S": "q2"}})["Item"] == item("q2", 102)
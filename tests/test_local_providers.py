@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from image.src.rag_app.local_providers import HashingEmbeddings, LocalChatModel
+
+PROMPT = "Context: trains and tickets.\n\nHow many train cars does each player get?"
+
+
+def test_hashing_embeddings_are_deterministic_unit_vectors():
+    embeddings = HashingEmbeddings(dimension=64, latency_ms=0)
+
+    [doc, other] = embeddings.embed_documents(["Claim a route with train cars", "Buy a hotel"])
+
+    assert len(doc) == 64
+    assert doc == HashingEmbeddings(dimension=64, latency_ms=0).embed_query("Claim a route with train cars")
+    assert abs(np.linalg.norm(doc) - 1.0) < 1e-6
+    assert abs(np.linalg.norm(other) - 1.0) < 1e-6
+    assert embeddings.embed_query("") == [0.0] * 64
+
+
+def test_hashing_embeddings_score_shared_words_higher():
+    embeddings = HashingEmbeddings(dimension=256, latency_ms=0)
+    query, related, unrelated = embeddings.embed_documents(
+        ["train cars per player", "each player starts with 45 train cars", "collect rent from hotels"]
+    )
+
+    assert np.dot(query, related) > np.dot(query, unrelated)
+
+
+def make_model(**kwargs):
+    return LocalChatModel(first_token_ms=0, input_token_ms=0, token_delay_ms=0, **kwargs)
+
+
+def test_chat_model_echoes_the_question_first():
+    answer = make_model().invoke(PROMPT).content
+
+    assert answer.startswith("How many train cars does each player get? Context:")
+
+
+def test_chat_model_sync_async_and_stream_agree():
+    model = make_model()
+
+    streamed = [chunk.content for chunk in model.stream(PROMPT)]
+
+    assert len(streamed) > 1
+    assert "".join(streamed) == model.invoke(PROMPT).content
+    assert asyncio.run(model.ainvoke(PROMPT)).content == model.invoke(PROMPT).content
+
+
+def test_chat_model_stops_at_max_tokens():
+    model = make_model(max_tokens=3)
+
+    assert model.invoke(PROMPT).content == "How many train"
+    assert [chunk.content for chunk in model.stream(PROMPT)] == ["How", " many", " train"]
@@ -0,0 +1,40 @@
+from image.src.lib.metrics import MetricsRegistry, SampledLogger
+
+
+def test_render_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for value in (3, 7, 7, 40):
+        registry.observe("latency_ms", value, buckets=(5, 10, 25), stage="embed")
+    registry.increment("lookups_total", result="hit")
+    registry.register_gauges("cache", lambda: {"hit_rate": 0.5, "enabled": True})
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_ms_bucket{stage="embed",le="5"} 1' in lines
+    assert 'latency_ms_bucket{stage="embed",le="10"} 3' in lines
+    assert 'latency_ms_bucket{stage="embed",le="25"} 3' in lines
+    assert 'latency_ms_bucket{stage="embed",le="+Inf"} 4' in lines
+    assert 'latency_ms_sum{stage="embed"} 57' in lines
+    assert 'lookups_total{result="hit"} 1' in lines
+    assert "cache_hit_rate 0.5" in lines
+    assert not any(line.startswith("cache_enabled") for line in lines)
+
+
+def test_span_records_duration():
+    registry = MetricsRegistry()
+    with registry.span("worker.put_item"):
+        pass
+
+    series = registry.histograms["span_duration_ms"]
+    assert list(series) == [(("span", "worker.put_item"),)]
+    assert series[(("span", "worker.put_item"),)].count == 1
+
+
+def test_sampled_logger_drops_when_full():
+    logger = SampledLogger(sample_rate=0.0, queue_size=1)
+    assert not logger.sample()
+
+    logger._thread = object()  # No consumer, so the queue stays full.
+    logger.submit("first")
+    logger.submit("second")
+    assert logger.dropped == 1
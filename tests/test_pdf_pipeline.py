@@ -0,0 +1,27 @@
+import os
+
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+
+from image.src.rag_app.pdf_pipeline import calculate_chunk_ids, get_text_splitter, iter_pdf_chunks
+
+SOURCE_DIR = os.path.join(os.path.dirname(__file__), "..", "image", "src", "data", "source")
+SOURCES = [os.path.join(SOURCE_DIR, "ticket_to_ride.pdf"), os.path.join(SOURCE_DIR, "monopoly.pdf")]
+
+
+@pytest.mark.parametrize("pages_per_task", [1, 3])
+def test_matches_pypdfloader_and_splitter(pages_per_task):
+    # The path populate_database.py used before it parsed page ranges in parallel.
+    expected = calculate_chunk_ids(
+        get_text_splitter().split_documents([page for path in SOURCES for page in PyPDFLoader(path).load()])
+    )
+
+    chunks = list(iter_pdf_chunks(SOURCES, max_workers=2, pages_per_task=pages_per_task))
+
+    assert chunks
+    assert [(chunk.metadata["id"], chunk.page_content) for chunk in chunks] == [
+        (chunk.metadata["id"], chunk.page_content) for chunk in expected
+    ]
+    assert [(chunk.metadata["source"], chunk.metadata["page"]) for chunk in chunks] == [
+        (chunk.metadata["source"], chunk.metadata["page"]) for chunk in expected
+    ]
@@ -0,0 +1,146 @@
+import os
+import sys
+from argparse import Namespace
+
+import pytest
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from image.src.rag_app.local_providers import HashingEmbeddings
+
+# populate_database.py imports its modules as src.rag_app..., relative to image/.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "image"))
+import populate_database  # noqa: E402
+from src.rag_app.index_manifest import IndexManifest  # noqa: E402
+
+ARGS = Namespace(
+    pdf_workers=1,
+    pages_per_task=1,
+    batch_size=2,
+    workers=2,
+    write_batch_size=100,
+    compact_index=None,
+    numpy_store=False,
+)
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """
+    Source "PDFs" are text files with one page per line, parsed into one chunk
+    per page, so tests can edit pages without real PDFs. Returns a writer.
+    """
+    embeddings = CountingEmbeddings()
+    parsed = []
+
+    def iter_pdf_chunks(paths, **kwargs):
+        for path in paths:
+            parsed.append(path)
+            with open(path) as f:
+                for page, text in enumerate(f.read().splitlines()):
+                    yield Document(page_content=text, metadata={"source": path, "page": page})
+
+    monkeypatch.setattr(populate_database, "CHROMA_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setattr(populate_database, "get_embedding_function", lambda: embeddings)
+    monkeypatch.setattr(populate_database, "iter_pdf_chunks", iter_pdf_chunks)
+
+    def write(name, *pages):
+        path = str(tmp_path / name)
+        with open(path, "w") as f:
+            f.write("\n".join(pages))
+        return path
+
+    write.embeddings = embeddings
+    write.parsed = parsed
+    return write
+
+
+def update(source, *paths, args=ARGS):
+    source.embeddings.embedded.clear()
+    source.parsed.clear()
+    populate_database.update_index(args, list(paths))
+
+
+def stored(source):
+    db = Chroma(persist_directory=populate_database.CHROMA_PATH, embedding_function=source.embeddings)
+    items = db.get(include=["documents"])
+    return dict(zip(items["ids"], items["documents"]))
+
+
+def test_unchanged_files_are_skipped(source):
+    a = source("a.pdf", "alpha", "beta")
+    update(source, a)
+    assert source.embeddings.embedded == ["alpha", "beta"]
+
+    update(source, a)
+    assert source.parsed == []
+    assert source.embeddings.embedded == []
+
+
+def test_only_edited_chunks_are_reembedded(source):
+    a = source("a.pdf", "alpha", "beta", "gamma")
+    update(source, a)
+
+    source("a.pdf", "alpha", "BETA", "gamma")
+    update(source, a)
+
+    assert source.parsed == [a]
+    assert source.embeddings.embedded == ["BETA"]
+    assert stored(source) == {f"{a}:0:0": "alpha", f"{a}:1:0": "BETA", f"{a}:2:0": "gamma"}
+
+
+def test_orphaned_chunks_and_deleted_files_are_removed(source):
+    a = source("a.pdf", "alpha", "beta", "gamma")
+    b = source("b.pdf", "delta")
+    update(source, a, b)
+
+    source("a.pdf", "alpha", "beta")
+    update(source, a)
+
+    assert stored(source) == {f"{a}:0:0": "alpha", f"{a}:1:0": "beta"}
+    manifest = IndexManifest.load(populate_database.CHROMA_PATH)
+    assert list(manifest.files) == [a]
+    assert list(manifest.files[a].chunks) == [f"{a}:0:0", f"{a}:1:0"]
+
+
+def test_bootstraps_from_a_db_without_manifest(source):
+    a = source("a.pdf", "alpha", "beta", "gamma")
+    # As written before the manifest existed: same IDs and metadata, no manifest file.
+    Chroma(persist_directory=populate_database.CHROMA_PATH, embedding_function=source.embeddings).add_texts(
+        ["alpha", "old beta", "gamma", "stale"],
+        metadatas=[{"source": a, "page": page} for page in range(4)],
+        ids=[f"{a}:{page}:0" for page in range(4)],
+    )
+
+    update(source, a)
+
+    assert source.embeddings.embedded == ["beta"]
+    assert stored(source) == {f"{a}:0:0": "alpha", f"{a}:1:0": "beta", f"{a}:2:0": "gamma"}
+    assert IndexManifest.load(populate_database.CHROMA_PATH).files[a].chunks.keys() == stored(source).keys()
+
+
+def test_numpy_store_is_only_exported_when_enabled(source):
+    numpy_store = os.path.join(populate_database.CHROMA_PATH, populate_database.NUMPY_STORE_DIR)
+    a = source("a.pdf", "alpha", "beta")
+    update(source, a)
+    assert not os.path.exists(numpy_store)
+
+    update(source, a, args=Namespace(**{**vars(ARGS), "numpy_store": True}))
+    assert os.path.exists(numpy_store)
+    assert source.embeddings.embedded == []
+
+    # Once exported, it is kept up to date without the flag.
+    source("a.pdf", "alpha", "beta", "gamma")
+    update(source, a)
+    with open(os.path.join(numpy_store, "chunks.json")) as f:
+        assert "gamma" in f.read()
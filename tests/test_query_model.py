@@ -0,0 +1,42 @@
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from image.src.lib import common  # noqa: F401 - puts image/src on sys.path for query_model's imports.
+from image.src.query_model import _DDB_FIELD_CODECS, QueryModel, QuerySummary
+
+
+def test_codecs_cover_every_field():
+    assert [name for name, _, _ in _DDB_FIELD_CODECS] == list(QueryModel.model_fields)
+
+
+def test_round_trip():
+    query = QueryModel(
+        query_text="How long does it take?",
+        answer_text="Two weeks.",
+        sources=["a.pdf:1:0", "b.pdf:2:1"],
+        is_complete=True,
+        source_filter=["a"],
+    )
+    assert QueryModel.from_ddb_attributes(query.to_ddb_attributes()) == query
+
+
+def test_matches_items_written_with_the_resource_api():
+    # The resource API ran every non-None attribute through boto3's TypeSerializer.
+    query = QueryModel(query_id="q1", user_id="u1", create_time=1700000000, ttl=1715552000, query_text="Q?")
+    serializer = TypeSerializer()
+    legacy_item = {k: serializer.serialize(v) for k, v in query.__dict__.items() if v is not None}
+
+    assert query.to_ddb_attributes() == legacy_item
+    decoded = QueryModel.from_ddb_attributes(legacy_item)
+    assert decoded == query
+    assert decoded.answer_text is None and decoded.source_filter is None
+    # Numbers came back from the resource API as Decimal; the low-level ones are plain ints.
+    assert TypeDeserializer().deserialize(legacy_item["create_time"]) == decoded.create_time
+    assert type(decoded.create_time) is int
+
+
+def test_summary_reads_a_projected_item():
+    item = QueryModel(query_id="q1", query_text="Q?", create_time=5).to_ddb_attributes()
+    projected = {name: item[name] for name in QuerySummary.model_fields}
+    assert QuerySummary.from_ddb_attributes(projected) == QuerySummary(
+        query_id="q1", create_time=5, query_text="Q?", is_complete=False
+    )
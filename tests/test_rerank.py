@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from image.src.rag_app.rerank import rerank
+
+
+class FakeStore:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def get_embeddings(self, ids):
+        return {chunk_id: self.embeddings[chunk_id] for chunk_id in ids}
+
+
+def candidate(chunk_id, text):
+    return Document(page_content=text, metadata={"id": chunk_id}), 0.0
+
+
+def test_rerank_orders_and_drops_low_scores():
+    store = FakeStore({"a": [0.0, 1.0], "b": [1.0, 0.0], "c": [0.7, 0.7]})
+    candidates = [
+        candidate("a", "Monopoly money"),
+        candidate("b", "A landing page costs $4,820."),
+        candidate("c", "Landing page design."),
+    ]
+
+    results = rerank(store, "landing page cost", [1.0, 0.0], candidates, top_k=3, min_score=0.5)
+
+    assert [doc.metadata["id"] for doc, _score in results] == ["b", "c"]
+    assert results[0][1] > results[1][1]
+
+
+def test_rerank_keeps_best_chunk_below_threshold():
+    store = FakeStore({"a": [0.0, 1.0]})
+
+    results = rerank(store, "landing page", [1.0, 0.0], [candidate("a", "Monopoly")], top_k=3, min_score=0.5)
+
+    assert [doc.metadata["id"] for doc, _score in results] == ["a"]
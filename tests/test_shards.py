@@ -0,0 +1,134 @@
+import pytest
+from langchain_core.documents import Document
+
+from image.src.rag_app.retrieval import ShardedBM25Index
+from image.src.rag_app.shards import chunk_source, shard_name
+from image.src.rag_app.vector_store import ShardedVectorStore, VectorStore
+
+
+class FakeStore(VectorStore):
+    def __init__(self, distances: dict):
+        self.distances = distances  # chunk id -> distance, for every query
+
+    def search_batch(self, query_embeddings, k):
+        ranked = sorted(self.distances.items(), key=lambda item: item[1])[:k]
+        return [[(Document(page_content="", metadata={"id": i}), d) for i, d in ranked] for _ in query_embeddings]
+
+    def get_documents(self, ids):
+        return {i: Document(page_content="", metadata={"id": i}) for i in ids if i in self.distances}
+
+    def get_embeddings(self, ids):
+        return {i: [self.distances[i]] for i in ids if i in self.distances}
+
+
+class FakeBM25:
+    def __init__(self, scores: dict):
+        self.scores = scores
+
+    def search(self, query_text, k):
+        return sorted(self.scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def make_store():
+    return ShardedVectorStore(
+        {
+            "a": FakeStore({"data/a.pdf:0:0": 0.3, "data/a.pdf:0:1": 0.9}),
+            "b": FakeStore({"data/b.pdf:0:0": 0.1, "data/b.pdf:1:0": 0.5}),
+        },
+        {"data/a.pdf": "a", "data/b.pdf": "b"},
+    )
+
+
+def test_search_merges_shards_by_distance():
+    results = make_store().search_batch([[0.0], [1.0]], k=3)
+
+    assert len(results) == 2
+    assert [(doc.metadata["id"], d) for doc, d in results[0]] == [
+        ("data/b.pdf:0:0", 0.1),
+        ("data/a.pdf:0:0", 0.3),
+        ("data/b.pdf:1:0", 0.5),
+    ]
+
+
+def test_select_shards_restricts_search_and_rejects_unknown_shards():
+    store = make_store().select_shards(["a"])
+
+    assert store.shards == ["a"]
+    assert [doc.metadata["id"] for doc, _d in store.search([0.0], k=3)] == ["data/a.pdf:0:0", "data/a.pdf:0:1"]
+    with pytest.raises(ValueError):
+        make_store().select_shards(["c"])
+    with pytest.raises(ValueError):
+        FakeStore({}).select_shards(["a"])
+
+
+def test_get_documents_routes_ids_to_their_shard():
+    documents = make_store().get_documents(["data/a.pdf:0:1", "data/b.pdf:1:0", "data/c.pdf:0:0"])
+    assert sorted(documents) == ["data/a.pdf:0:1", "data/b.pdf:1:0"]
+
+
+def test_sharded_bm25_merges_by_score():
+    index = ShardedBM25Index({"a": FakeBM25({"x": 1.0, "y": 3.0}), "b": FakeBM25({"z": 2.0})})
+
+    assert index.search("query", k=2) == [("y", 3.0), ("z", 2.0)]
+    assert index.select_shards(["b"]).search("query", k=2) == [("z", 2.0)]
+
+
+def test_shard_names():
+    assert shard_name("data/source/Ticket To Ride.pdf", "source", "data/source") == "ticket-to-ride"
+    assert shard_name("data/source/acme/manual.pdf", "directory", "data/source") == "acme"
+    assert shard_name("data/source/manual.pdf", "directory", "data/source") == "default"
+    assert chunk_source("data/source/a:b.pdf:3:1") == "data/source/a:b.pdf"
+
+
+@pytest.fixture
+def sharded_chroma(tmp_path, monkeypatch):
+    """A two-shard Chroma index, opened the way the Lambda image opens it."""
+    import importlib
+    import shutil
+    import sqlite3
+    import sys
+
+    from chromadb.api.client import SharedSystemClient
+    from langchain_community.vectorstores import Chroma
+
+    from image.src.rag_app import vector_store
+    from image.src.rag_app.local_providers import HashingEmbeddings
+    from image.src.rag_app.shards import shard_collection_name, write_shard_map
+
+    chroma_path = str(tmp_path / "chroma")
+    embeddings = HashingEmbeddings()
+    for shard in ("a", "b"):
+        Chroma(
+            persist_directory=chroma_path,
+            collection_name=shard_collection_name(shard),
+            embedding_function=embeddings,
+        ).add_texts([f"text in {shard}"], metadatas=[{"id": f"{shard}.pdf:0:0"}], ids=[f"{shard}.pdf:0:0"])
+    Chroma(persist_directory=chroma_path, embedding_function=embeddings)  # Empty, as populate_database leaves it.
+    write_shard_map(chroma_path, "source", {"a": ["a.pdf"], "b": ["b.pdf"]})
+    SharedSystemClient.clear_system_cache()  # As in a fresh Lambda process.
+
+    chroma_module = importlib.import_module(vector_store.get_chroma_db.__module__)
+    monkeypatch.setitem(sys.modules, "pysqlite3", sqlite3)
+    monkeypatch.setattr(chroma_module, "IS_USING_IMAGE_RUNTIME", True)
+    monkeypatch.setattr(chroma_module, "CHROMA_PATH", chroma_path)
+    monkeypatch.setattr(chroma_module, "CHROMA_DB_INSTANCE", None)
+    monkeypatch.setattr(chroma_module, "IS_CHROMA_READ_ONLY", False)
+    monkeypatch.setattr(chroma_module, "get_embedding_function", lambda: embeddings)
+    monkeypatch.setattr(vector_store, "VECTOR_STORE_INSTANCE", None)
+    yield chroma_module, embeddings.embed_query("text")
+    SharedSystemClient.clear_system_cache()
+    shutil.rmtree(f"/tmp/{chroma_path}", ignore_errors=True)
+
+
+@pytest.mark.parametrize("open_mode", ["readonly", "copy"])
+def test_image_runtime_opens_sharded_index(sharded_chroma, monkeypatch, open_mode):
+    from image.src.rag_app import vector_store
+
+    chroma_module, query_embedding = sharded_chroma
+    monkeypatch.setattr(chroma_module, "CHROMA_OPEN_MODE", open_mode)
+
+    store = vector_store.get_vector_store()
+
+    assert chroma_module.IS_CHROMA_READ_ONLY == (open_mode == "readonly")
+    assert isinstance(store, ShardedVectorStore)
+    assert sorted(doc.metadata["id"] for doc, _d in store.search(query_embedding, k=4)) == ["a.pdf:0:0", "b.pdf:0:0"]
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from image.src.rag_app.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, "q", work)
+        started.wait()
+        followers = [executor.submit(flights.do, "q", work) for _ in range(3)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert results == [("answer", False)] + [("answer", True)] * 3
+    assert flights.stats() == {"leaders": 1, "followers": 3, "in_flight": 0}
+
+    # Completed flights are not cached.
+    assert flights.do("q", work) == ("answer", False)
+    assert len(calls) == 2
+
+
+def test_async_followers_get_the_leader_exception():
+    flights = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("throttled")
+
+    async def main():
+        return await asyncio.gather(*(flights.ado("q", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats()["in_flight"] == 0